@@ -1,12 +1,11 @@
 # app/core/services/order_service.py
 from typing import Optional, List
 from datetime import datetime, timedelta
-import random
-import string
 
 from ..entities.order import Order, OrderStatus
 from ..repositories.order_repository import OrderRepository
 from ..repositories.user_repository import UserRepository
+from ...shared.utils import generate_order_id
 
 
 class OrderService:
@@ -72,7 +71,5 @@ class OrderService:
     
     @staticmethod
     def _generate_order_id() -> str:
-        """Сгенерировать ID заказа"""
-        timestamp = datetime.now().strftime("%y%m%d%H%M")
-        random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-        return f"ORD-{timestamp}-{random_str}"
\ No newline at end of file
+        """Сгенерировать ID заказа (тот же генератор, что и у старого слоя)"""
+        return generate_order_id()
\ No newline at end of file
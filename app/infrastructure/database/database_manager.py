@@ -3,11 +3,12 @@
 """
 
 import asyncio
-from sqlalchemy import text
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 from app.shared.config import config
 from app.infrastructure.database.models import Base
+from app.infrastructure.database.sqlite_pragmas import apply_pragmas, REPORTED_PRAGMAS
 
 
 class DatabaseManager:
@@ -22,6 +23,8 @@ class DatabaseManager:
                 echo=config.DATABASE_ECHO,
                 connect_args={"check_same_thread": False}  # Для SQLite
             )
+            # Профиль PRAGMA применяем к каждому новому соединению пула
+            event.listen(self.engine.sync_engine, "connect", self._apply_sqlite_pragmas)
         else:
             # Для других БД (PostgreSQL, MySQL)
             self.engine = create_async_engine(
@@ -36,6 +39,23 @@ class DatabaseManager:
             expire_on_commit=False
         )
     
+    @staticmethod
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        """Применение профиля PRAGMA при подключении к SQLite"""
+        apply_pragmas(dbapi_connection, config.DATABASE_PRAGMA_PROFILE)
+    
+    async def get_pragmas(self) -> dict:
+        """Активные значения PRAGMA (только для SQLite)"""
+        if "sqlite" not in config.DATABASE_URL:
+            return {}
+        
+        values = {}
+        async with self.engine.connect() as conn:
+            for name in REPORTED_PRAGMAS:
+                result = await conn.execute(text(f"PRAGMA {name}"))
+                values[name] = result.scalar()
+        return values
+    
     async def create_tables(self):
         """Создание всех таблиц в базе данных"""
         print("🔄 Создание таблиц в базе данных...")
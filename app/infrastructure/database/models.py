@@ -51,6 +51,9 @@ class User(Base):
     role = Column(Enum(UserRole), default=UserRole.CUSTOMER)
     balance = Column(Float, default=0.0)
     rating = Column(Float, default=0.0)
+    # Агрегат отзывов: rating = rating_sum / rating_count
+    rating_sum = Column(Integer, default=0, nullable=False)
+    rating_count = Column(Integer, default=0, nullable=False)
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -64,6 +67,12 @@ class User(Base):
     def __repr__(self):
         return f"<User {self.telegram_id} ({self.role.value})>"
     
+    def apply_rating(self, rating):
+        """Учесть оценку нового отзыва (в той же сессии, что и Review)"""
+        self.rating_sum = (self.rating_sum or 0) + rating
+        self.rating_count = (self.rating_count or 0) + 1
+        self.rating = round(self.rating_sum / self.rating_count, 2)
+    
     def get_role_display(self):
         """Получить читаемое название роли"""
         role_display = {
@@ -0,0 +1,69 @@
+# app/infrastructure/database/sqlite_pragmas.py
+"""
+Профили настроек SQLite (PRAGMA), применяемые при каждом подключении.
+
+Используется и старым слоем (database.Database), и DatabaseManager,
+поэтому модуль зависит только от стандартной библиотеки.
+"""
+
+from typing import Dict, Optional, Union
+
+PragmaValue = Union[int, str]
+
+# Порядок важен: busy_timeout ставим первым, чтобы смена journal_mode
+# дождалась освобождения БД другим процессом
+PRAGMA_PROFILES: Dict[str, Dict[str, PragmaValue]] = {
+    # Максимальная надежность: fsync на каждый commit
+    "safe": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+    },
+    # Боевой профиль: в WAL режиме NORMAL не теряет целостность,
+    # а fsync делается только при checkpoint
+    "production": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,  # 256 МБ
+        "cache_size": -65536,    # 64 МБ (отрицательное значение - в КиБ)
+        "temp_store": "MEMORY",
+    },
+}
+
+DEFAULT_PROFILE = "production"
+
+# PRAGMA, которые показываем в отчете `python run.py check`
+REPORTED_PRAGMAS = (
+    "journal_mode",
+    "synchronous",
+    "mmap_size",
+    "cache_size",
+    "temp_store",
+    "busy_timeout",
+)
+
+
+def get_profile(name: Optional[str]) -> Dict[str, PragmaValue]:
+    """Профиль по имени (неизвестное имя - профиль по умолчанию)"""
+    if name not in PRAGMA_PROFILES:
+        if name:
+            print(f"⚠️ Неизвестный профиль SQLite '{name}', используем '{DEFAULT_PROFILE}'")
+        name = DEFAULT_PROFILE
+    return PRAGMA_PROFILES[name]
+
+
+def apply_pragmas(connection, profile_name: Optional[str] = None) -> None:
+    """
+    Применить профиль к DB-API соединению
+
+    Args:
+        connection: sqlite3.Connection или DB-API адаптер SQLAlchemy
+        profile_name: Имя профиля из PRAGMA_PROFILES
+    """
+    cursor = connection.cursor()
+    try:
+        for name, value in get_profile(profile_name).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
@@ -93,6 +93,11 @@ class Config:
         except ValueError:
             return 10
     
+    @property
+    def DATABASE_PRAGMA_PROFILE(self) -> str:
+        """Профиль PRAGMA для SQLite (production или safe)"""
+        return os.getenv("DB_PRAGMA_PROFILE", "production")
+    
     # === ЛОГИРОВАНИЕ ===
     @property
     def LOG_LEVEL(self) -> Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
@@ -152,6 +157,7 @@ class Config:
         print(f"\n🗄️  БАЗА ДАННЫХ:")
         print(f"   URL: {self.DATABASE_URL}")
         print(f"   Echo: {self.DATABASE_ECHO}")
+        print(f"   Профиль SQLite: {self.DATABASE_PRAGMA_PROFILE}")
         
         print(f"\n📊 ПРИЛОЖЕНИЕ:")
         print(f"   Режим: {self.ENVIRONMENT}")
@@ -0,0 +1,113 @@
+# app/shared/utils.py
+"""
+Общие утилиты, не зависящие от слоя приложения.
+
+ID заказов (ULID) и запросы к полнотекстовому индексу orders_fts.
+Их вызывают и database.py, и сервисы с репозиториями app; импорт
+модуля не подтягивает ни aiogram, ни SQLAlchemy.
+"""
+
+import os
+import re
+import threading
+import time
+
+# Base32 Крокфорда: без I, L, O, U, сортировка строк совпадает с числовой
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+ORDER_ID_PREFIX = "ORD"
+
+_TIME_BITS = 48
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+
+def _encode(value, length):
+    """Число в base32 Крокфорда фиксированной длины"""
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class MonotonicIdGenerator:
+    """
+    Генератор ULID: 48 бит времени в миллисекундах + 80 случайных бит.
+
+    Строки упорядочены по времени создания, поэтому новые ключи
+    добавляются в конец индекса. В пределах одной миллисекунды
+    (и при откате системных часов) случайная часть увеличивается на 1,
+    так что ID строго возрастают внутри процесса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def new(self):
+        """Новый ULID (26 символов)"""
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            elif self._last_random < _RANDOM_MAX:
+                self._last_random += 1
+            else:
+                # Случайная часть исчерпана - занимаем следующую миллисекунду
+                self._last_ms += 1
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+
+            value = (self._last_ms << _RANDOM_BITS) | self._last_random
+
+        return _encode(value, 26)
+
+
+_order_ids = MonotonicIdGenerator()
+
+
+def generate_order_id():
+    """ID заказа: 'ORD' + ULID (29 символов, помещается в callback_data)"""
+    return ORDER_ID_PREFIX + _order_ids.new()
+
+
+# Окончания для грубого стемминга русских слов (длинные первыми)
+_RU_ENDINGS = (
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ах", "ях", "ов", "ев", "ей", "ой", "ий", "ый", "ая", "яя", "ое", "ее",
+    "ые", "ие", "ую", "юю", "ом", "ем", "ам", "ям",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+)
+_FTS_TOKEN = re.compile(r"\w+")
+_CYRILLIC = re.compile(r"[а-яё]")
+
+
+def _stem(word):
+    """Основа слова: отбросить одно окончание, оставив не меньше 3 букв"""
+    if not _CYRILLIC.search(word):
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def fts_match_query(text, max_terms=8):
+    """
+    Выражение MATCH для FTS5 из пользовательского запроса.
+
+    Каждое слово ищется по префиксу основы ("краны" -> "кран"*),
+    числа - точно; предлоги из одной буквы отбрасываются, остальные
+    слова объединяются через AND. Спецсимволы FTS5 в запрос
+    не попадают. Пустой запрос -> None.
+    """
+    terms = []
+    for word in _FTS_TOKEN.findall(text.lower())[:max_terms]:
+        word = word.replace("_", "")
+        # Однобуквенные слова ("в", "к") как префикс совпали бы почти со всем
+        if not word or (len(word) < 2 and not word.isdigit()):
+            continue
+        terms.append(f'"{word}"' if word.isdigit() else f'"{_stem(word)}"*')
+    return " ".join(terms) or None
@@ -0,0 +1,33 @@
+# bot_provider.py
+"""
+Единственный экземпляр Bot на процесс.
+
+Все исходящие запросы к Telegram идут через одну aiohttp-сессию,
+поэтому соединения переиспользуются (keep-alive), а не открываются
+заново в каждом модуле. В обработчиках бот доступен как аргумент
+`bot: Bot` - aiogram передает его сам.
+"""
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+
+from config import BOT_TOKEN, BOT_HTTP_POOL_SIZE
+
+_bot = None
+
+
+def get_bot() -> Bot:
+    """Общий бот (создается при первом обращении)"""
+    global _bot
+    if _bot is None:
+        session = AiohttpSession(limit=BOT_HTTP_POOL_SIZE)
+        _bot = Bot(token=BOT_TOKEN, session=session)
+    return _bot
+
+
+async def close_bot():
+    """Закрыть HTTP-сессию бота (при остановке)"""
+    global _bot
+    if _bot is not None:
+        await _bot.session.close()
+        _bot = None
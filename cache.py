@@ -0,0 +1,88 @@
+# cache.py
+"""
+Кэш в памяти процесса для редко меняющихся данных (пользователи, профили).
+
+Записи вытесняются по LRU при переполнении и устаревают по TTL.
+Запись в БД должна вызывать invalidate() для затронутых ключей.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с временем жизни записей"""
+
+    def __init__(self, name, maxsize=10000, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Меняется при каждой инвалидации: значение, прочитанное из БД
+        # до инвалидации, в кэш уже не попадет
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_load(self, key, loader):
+        """
+        Значение из кэша или loader() с сохранением результата.
+
+        Возвращает копию dict, чтобы вызывающий код не менял кэш.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                metrics.inc(f'cache_{self.name}_hits')
+                return self._copy(entry[1])
+
+            self.misses += 1
+            generation = self._generation
+
+        metrics.inc(f'cache_{self.name}_misses')
+        value = loader()
+
+        with self._lock:
+            if generation == self._generation:
+                self._data[key] = (time.monotonic() + self.ttl, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+        return self._copy(value)
+
+    def invalidate(self, key):
+        """Удалить запись (после изменения данных в БД)"""
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Очистить кэш полностью"""
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    @staticmethod
+    def _copy(value):
+        return dict(value) if isinstance(value, dict) else value
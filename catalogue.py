@@ -0,0 +1,62 @@
+# catalogue.py
+"""
+Справочник категорий услуг в памяти процесса.
+
+Таблица service_categories заполняется при старте и почти не меняется,
+поэтому экраны фильтров и профилей берут категории отсюда, а не из БД.
+Справочник неизменяемый: при изменении категорий Database строит
+новый объект и подменяет ссылку целиком.
+"""
+
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional, Tuple
+
+Category = Mapping[str, object]
+
+
+class CategoryCatalogue:
+    """Неизменяемый справочник: поиск по коду и id, дерево parent -> children"""
+
+    __slots__ = ('_by_id', '_by_code', '_children')
+
+    def __init__(self, rows: Iterable[dict]):
+        categories = sorted(
+            (MappingProxyType(dict(row)) for row in rows),
+            key=lambda category: category['name']
+        )
+
+        self._by_id = MappingProxyType({category['id']: category for category in categories})
+        self._by_code = MappingProxyType({category['code']: category for category in categories})
+
+        children = {}
+        for category in categories:
+            children.setdefault(category['parent_id'], []).append(category)
+        self._children = MappingProxyType({
+            parent_id: tuple(items) for parent_id, items in children.items()
+        })
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __contains__(self, code):
+        return code in self._by_code
+
+    def get(self, category_id) -> Optional[Category]:
+        """Категория по id"""
+        return self._by_id.get(category_id)
+
+    def by_code(self, code) -> Optional[Category]:
+        """Категория по коду (например, 'crane')"""
+        return self._by_code.get(code)
+
+    def children(self, parent_id=None) -> Tuple[Category, ...]:
+        """Дочерние категории (parent_id=None - корневые), по имени"""
+        return self._children.get(parent_id, ())
+
+    def name_of(self, code):
+        """Название категории по коду (или сам код, если категории нет)"""
+        category = self._by_code.get(code)
+        return category['name'] if category else code
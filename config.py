@@ -6,6 +6,37 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID")) if os.getenv("ADMIN_ID") else None
 
+# Размер пула HTTP-соединений к Telegram API (bot_provider.py)
+BOT_HTTP_POOL_SIZE = int(os.getenv("BOT_HTTP_POOL_SIZE", "100"))
+
+# База данных (database.py)
+DB_PATH = os.getenv("DB_PATH", "marketplace.db")
+# Соединения для чтения (плюс одно соединение для записи)
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+# Потоки для асинхронного доступа к БД: по одному на соединение
+DB_WORKERS = int(os.getenv("DB_WORKERS", str(DB_READERS + 1)))
+# Профиль PRAGMA для SQLite: production или safe
+DB_PRAGMA_PROFILE = os.getenv("DB_PRAGMA_PROFILE", "production")
+# Кэш пользователей и профилей исполнителей: число записей и время жизни (сек)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+# Фоновая обработка просроченных заказов
+ORDER_SWEEP_INTERVAL = int(os.getenv("ORDER_SWEEP_INTERVAL", "60"))
+ORDER_SWEEP_CHUNK = int(os.getenv("ORDER_SWEEP_CHUNK", "500"))
+
+# Очередь уведомлений (notifications.py)
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "10000"))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+# Лимиты Telegram: сообщений в секунду всего и интервал (сек) между сообщениями в один чат
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "30"))
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1.0"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+
+# Отложенная запись частых обновлений (write_behind.py): задержка (сек) и размер пачки
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "1.0"))
+WRITE_BEHIND_MAX_ITEMS = int(os.getenv("WRITE_BEHIND_MAX_ITEMS", "1000"))
+
 SERVICES = {
     'truck': '🚚 Грузоперевозки',
     'excavator': '🏗️ Экскаватор',
@@ -1,22 +1,220 @@
 import sqlite3
 import json
-import math
-from datetime import datetime, timedelta
+import queue
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial, wraps
 import random
 import string
 
+from config import DB_PATH, DB_READERS, DB_WORKERS, DB_PRAGMA_PROFILE, USER_CACHE_SIZE, USER_CACHE_TTL
+from app.infrastructure.database.sqlite_pragmas import apply_pragmas
+from app.shared.utils import fts_match_query
+from geo import haversine_distance, haversine_matrix, bounding_box
+from matching import ExecutorMatchIndex, MATCH_FIELDS
+from cache import TTLCache
+from catalogue import CategoryCatalogue
+
+# Срок жизни заказа
+ORDER_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+class ConnectionPool:
+    """
+    Пул соединений SQLite: один писатель и несколько читателей (WAL).
+    
+    Записи сериализуются через блокировку писателя, чтения идут
+    параллельно на отдельных соединениях. Курсор создается на каждый
+    запрос, поэтому результаты разных вызовов не перемешиваются.
+    К каждому соединению применяется профиль PRAGMA (см. sqlite_pragmas).
+    
+    Вложенные writer() в том же потоке продолжают внешнюю транзакцию:
+    commit (и fsync) выполняется один раз при выходе из внешнего блока.
+    """
+    
+    def __init__(self, db_path, readers=4, pragma_profile=None):
+        self.db_path = db_path
+        self.pragma_profile = pragma_profile
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        # Глубина вложенности writer() и действия после commit
+        # (меняются только потоком, который держит _write_lock)
+        self._depth = 0
+        self._owner = None
+        self._after_commit = []
+        self._readers = queue.LifoQueue()
+        # После close() возвращаемые читатели закрываются, а не кладутся в пул
+        self._closed = False
+        self._readers_lock = threading.Lock()
+        
+        # У каждого соединения с ":memory:" своя БД - читаем через писателя
+        if db_path != ":memory:":
+            for _ in range(readers):
+                self._readers.put(self._connect())
+        self.readers_count = self._readers.qsize()
+    
+    def _connect(self):
+        """Новое соединение с нужными настройками"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragma_profile)
+        # Расстояние в км для сортировки ленты по удаленности
+        conn.create_function("haversine_km", 4, haversine_distance, deterministic=True)
+        return conn
+    
+    @contextmanager
+    def writer(self):
+        """Соединение для записи: commit при выходе, rollback при ошибке"""
+        with self._write_lock:
+            if self._depth:
+                with self._savepoint() as conn:
+                    yield conn
+                return
+            
+            self._depth, self._owner = 1, threading.get_ident()
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                self._after_commit.clear()
+                raise
+            finally:
+                self._depth, self._owner = 0, None
+            
+            callbacks, self._after_commit = self._after_commit, []
+        
+        for callback in callbacks:
+            callback()
+    
+    @contextmanager
+    def _savepoint(self):
+        """Вложенный блок: ошибка откатывает только его изменения"""
+        conn = self._writer
+        name = f"nested_{self._depth}"
+        
+        # SAVEPOINT вне транзакции сам стал бы транзакцией и RELEASE закоммитил бы ее
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute(f"SAVEPOINT {name}")
+        self._depth += 1
+        try:
+            yield conn
+            conn.execute(f"RELEASE {name}")
+        except Exception:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        finally:
+            self._depth -= 1
+    
+    def in_transaction(self):
+        """Выполняется ли текущий поток внутри writer()"""
+        return self._owner == threading.get_ident()
+    
+    def after_commit(self, callback):
+        """
+        Выполнить callback после commit внешней транзакции
+        (сразу, если поток не внутри writer(); при rollback - не выполнять)
+        """
+        if self.in_transaction():
+            self._after_commit.append(callback)
+        else:
+            callback()
+    
+    @contextmanager
+    def reader(self):
+        """Соединение для чтения из пула"""
+        if not self.readers_count:
+            with self._write_lock:
+                yield self._writer
+            return
+        
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._readers.put(conn)
+    
+    def close(self):
+        """
+        Закрытие всех соединений.
+        
+        Свободные читатели закрываются сразу, выданные - при возврате
+        в пул; писатель - после завершения текущей транзакции.
+        """
+        with self._readers_lock:
+            self._closed = True
+            while not self._readers.empty():
+                self._readers.get_nowait().close()
+        with self._write_lock:
+            self._writer.close()
+
+
+@lru_cache(maxsize=256)
+def build_update_statement(table, columns, key_column, touch_updated_at=False):
+    """
+    Текст UPDATE для набора колонок (кэшируется по набору колонок).
+    
+    Имена таблицы и колонок должны быть проверены по схеме заранее:
+    они подставляются в SQL как есть.
+    """
+    assignments = [f"{column} = ?" for column in columns]
+    if touch_updated_at:
+        assignments.append("updated_at = CURRENT_TIMESTAMP")
+    return f"UPDATE {table} SET {', '.join(assignments)} WHERE {key_column} = ?"
+
+
 class Database:
-    def __init__(self, db_path="marketplace.db"):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+    # Колонки, которые нельзя менять через update_* (ключи и служебные поля)
+    PROTECTED_COLUMNS = {
+        'executor_profiles': {'user_id', 'created_at', 'updated_at'},
+        'executor_equipment': {'id', 'executor_id', 'created_at'},
+    }
+    
+    def __init__(self, db_path="marketplace.db", readers=4, pragma_profile=None,
+                 cache_size=10000, cache_ttl=300):
+        self.pool = ConnectionPool(db_path, readers=readers, pragma_profile=pragma_profile)
+        # Колонки таблиц для проверки полей в update_* (сбрасываются после миграций)
+        self._schema_columns = {}
         self.init_db()
+        
+        # Кэш пользователей и профилей исполнителей (сбрасывается при записи)
+        self.users_cache = TTLCache('users', maxsize=cache_size, ttl=cache_ttl)
+        self.profiles_cache = TTLCache('executor_profiles', maxsize=cache_size, ttl=cache_ttl)
+        
+        # Индекс для подбора исполнителей под новый заказ
+        self.match_index = ExecutorMatchIndex()
+        self.match_index.load(self._fetchall(self._MATCH_PROFILE_QUERY))
     
     def init_db(self):
         """Инициализация всех таблиц"""
+        with self.pool.writer() as conn:
+            self._create_tables(conn)
+        
+        # Доводим схему до актуальной версии
+        self._apply_migrations()
+        
+        # Инициализируем базовые категории
+        self.init_default_categories()
+        
+        print("✅ База данных инициализирована")
+    
+    def _create_tables(self, conn):
+        """Создание таблиц (если их еще нет)"""
         
         # Пользователи
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 user_id INTEGER PRIMARY KEY,
                 username TEXT,
@@ -27,10 +225,11 @@ class Database:
             )
         ''')
         
-        # Заказы
-        self.cursor.execute('''
+        # Заказы (id - постоянный ключ для orders_rtree и orders_fts, см. миграцию 11)
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS orders (
-                order_id TEXT PRIMARY KEY,
+                id INTEGER PRIMARY KEY,
+                order_id TEXT NOT NULL UNIQUE,
                 user_id INTEGER,
                 service_type TEXT,
                 description TEXT,
@@ -38,15 +237,18 @@ class Database:
                 desired_price INTEGER,
                 status TEXT DEFAULT 'active',
                 selected_executor_id INTEGER DEFAULT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
+                created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                expires_at INTEGER,
+                latitude REAL,
+                longitude REAL,
+                offers_count INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (user_id) REFERENCES users (user_id),
                 FOREIGN KEY (selected_executor_id) REFERENCES users (user_id)
             )
         ''')
         
         # Предложения
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS offers (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 order_id TEXT,
@@ -61,7 +263,7 @@ class Database:
         ''')
         
         # Отзывы
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS reviews (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 order_id TEXT,
@@ -74,7 +276,7 @@ class Database:
         ''')
         
         # Категории услуг
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS service_categories (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
@@ -86,7 +288,7 @@ class Database:
         ''')
         
         # Профили исполнителей
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS executor_profiles (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER UNIQUE NOT NULL,
@@ -113,7 +315,7 @@ class Database:
         ''')
         
         # Техника исполнителя
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS executor_equipment (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 executor_id INTEGER NOT NULL,
@@ -135,7 +337,7 @@ class Database:
         ''')
         
         # Геолокация пользователей
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS user_locations (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER UNIQUE NOT NULL,
@@ -149,7 +351,7 @@ class Database:
         ''')
         
         # Избранные категории исполнителя
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS executor_categories (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 executor_id INTEGER NOT NULL,
@@ -158,13 +360,504 @@ class Database:
                 FOREIGN KEY (category_id) REFERENCES service_categories (id)
             )
         ''')
+    
+    # ===== МИГРАЦИИ СХЕМЫ =====
+    
+    # Версия схемы хранится в PRAGMA user_version. Каждая миграция
+    # выполняется один раз и атомарно; новые добавляются в конец списка.
+    MIGRATIONS = (
+        (1, '_migration_add_indexes'),
+        (2, '_migration_orders_epoch_timestamps'),
+        (3, '_migration_orders_coordinates'),
+        (4, '_migration_spatial_index'),
+        (5, '_migration_notification_retries'),
+        (6, '_migration_orders_feed_keyset_index'),
+        (7, '_migration_offers_count'),
+        (8, '_migration_user_rating_totals'),
+        (9, '_migration_user_stats'),
+        (10, '_migration_orders_fulltext'),
+        (11, '_migration_orders_integer_key'),
+        (12, '_migration_user_stats_skip_null_users'),
+        (13, '_migration_orders_fulltext_stable_key'),
+    )
+    
+    def _apply_migrations(self):
+        """Применение недостающих миграций"""
+        with self.pool.writer() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
         
-        self.conn.commit()
+        for target_version, method_name in self.MIGRATIONS:
+            if version >= target_version:
+                continue
+            
+            with self.pool.writer() as conn:
+                conn.execute("BEGIN")
+                getattr(self, method_name)(conn)
+                conn.execute(f"PRAGMA user_version = {target_version}")
+            
+            version = target_version
+            self._schema_columns.clear()
+            print(f"✅ Миграция БД до версии {target_version}: {method_name}")
+    
+    def _migration_add_indexes(self, conn):
+        """Индексы для горячих запросов"""
+        # Перед уникальными индексами убираем дубли, оставляя последнюю запись
+        conn.execute('''
+            DELETE FROM offers WHERE id NOT IN (
+                SELECT MAX(id) FROM offers GROUP BY order_id, executor_id
+            )
+        ''')
+        conn.execute('''
+            DELETE FROM executor_categories WHERE id NOT IN (
+                SELECT MIN(id) FROM executor_categories GROUP BY executor_id, category_id
+            )
+        ''')
         
-        # Инициализируем базовые категории
-        self.init_default_categories()
+        indexes = [
+            # Лента заказов: активные заказы по дате создания / сроку
+            "CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_orders_status_expires ON orders (status, expires_at)",
+            # Мои заказы и статистика заказчика
+            "CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)",
+            # Одно предложение исполнителя на заказ
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_offers_order_executor ON offers (order_id, executor_id)",
+            "CREATE INDEX IF NOT EXISTS idx_offers_executor_created ON offers (executor_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_reviews_to_user_created ON reviews (to_user_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_equipment_executor_created ON executor_equipment (executor_id, created_at)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_executor_categories ON executor_categories (executor_id, category_id)",
+            "CREATE INDEX IF NOT EXISTS idx_service_categories_parent ON service_categories (parent_id, name)",
+        ]
+        for statement in indexes:
+            conn.execute(statement)
+    
+    def _migration_orders_epoch_timestamps(self, conn):
+        """Даты заказов - в секунды Unix (UTC), чтобы сравнивать колонки напрямую"""
+        # created_at заполнялся CURRENT_TIMESTAMP (UTC),
+        # expires_at - из datetime.now() (локальное время)
+        conn.execute('''
+            UPDATE orders SET created_at = CAST(strftime('%s', created_at) AS INTEGER)
+            WHERE typeof(created_at) = 'text'
+        ''')
+        conn.execute('''
+            UPDATE orders SET expires_at = CAST(strftime('%s', expires_at, 'utc') AS INTEGER)
+            WHERE typeof(expires_at) = 'text'
+        ''')
+    
+    def _migration_orders_coordinates(self, conn):
+        """Координаты заказа для подбора исполнителей по расстоянию"""
+        columns = {column[1] for column in conn.execute("PRAGMA table_info(orders)")}
+        for column in ('latitude', 'longitude'):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE orders ADD COLUMN {column} REAL")
+        # Грубый фильтр ленты: активные заказы в прямоугольнике вокруг исполнителя
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_status_lat_lon ON orders (status, latitude, longitude)"
+        )
+    
+    def _migration_spatial_index(self, conn):
+        """R*Tree: точки активных заказов и зоны работы исполнителей"""
+        # Точки активных заказов (id = orders.id, см. миграцию 11), синхронизируются триггерами
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS orders_rtree
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS orders_rtree_insert AFTER INSERT ON orders
+            WHEN new.status = 'active' AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+            BEGIN
+                INSERT INTO orders_rtree VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS orders_rtree_update AFTER UPDATE OF status, latitude, longitude ON orders
+            BEGIN
+                DELETE FROM orders_rtree WHERE id = old.rowid;
+                INSERT INTO orders_rtree
+                SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude
+                WHERE new.status = 'active' AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS orders_rtree_delete AFTER DELETE ON orders
+            BEGIN
+                DELETE FROM orders_rtree WHERE id = old.rowid;
+            END
+        ''')
+        conn.execute('''
+            INSERT OR REPLACE INTO orders_rtree
+            SELECT rowid, latitude, latitude, longitude, longitude FROM orders
+            WHERE status = 'active' AND latitude IS NOT NULL AND longitude IS NOT NULL
+        ''')
         
-        print("✅ База данных инициализирована")
+        # Зоны работы исполнителей (id = user_id): прямоугольник вокруг
+        # точки исполнителя по work_radius_km. Считается в Python,
+        # поэтому синхронизируется методами профиля, а не триггерами
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS executors_rtree
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+        ''')
+        user_ids = [row[0] for row in conn.execute("SELECT user_id FROM executor_profiles")]
+        for user_id in user_ids:
+            self._sync_executor_area(conn, user_id)
+    
+    def _migration_notification_retries(self, conn):
+        """Уведомления, которые не удалось отправить сразу (см. notifications.py)"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS notification_retries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                reply_markup TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at INTEGER NOT NULL,
+                created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+            )
+        ''')
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_notification_retries_next ON notification_retries (next_attempt_at)"
+        )
+    
+    def _migration_orders_feed_keyset_index(self, conn):
+        """Индекс под keyset-пагинацию ленты: (created_at, order_id) внутри статуса"""
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_status_created_id ON orders (status, created_at, order_id)"
+        )
+        # Старый индекс - префикс нового
+        conn.execute("DROP INDEX IF EXISTS idx_orders_status_created")
+    
+    def _migration_offers_count(self, conn):
+        """Счетчик предложений в заказе, поддерживается триггерами на offers"""
+        columns = {column[1] for column in conn.execute("PRAGMA table_info(orders)")}
+        if 'offers_count' not in columns:
+            conn.execute("ALTER TABLE orders ADD COLUMN offers_count INTEGER NOT NULL DEFAULT 0")
+        
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS offers_count_insert AFTER INSERT ON offers
+            BEGIN
+                UPDATE orders SET offers_count = offers_count + 1 WHERE order_id = new.order_id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS offers_count_delete AFTER DELETE ON offers
+            BEGIN
+                UPDATE orders SET offers_count = offers_count - 1 WHERE order_id = old.order_id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS offers_count_move AFTER UPDATE OF order_id ON offers
+            WHEN new.order_id IS NOT old.order_id
+            BEGIN
+                UPDATE orders SET offers_count = offers_count - 1 WHERE order_id = old.order_id;
+                UPDATE orders SET offers_count = offers_count + 1 WHERE order_id = new.order_id;
+            END
+        ''')
+        
+        self._rebuild_offer_counters(conn)
+    
+    def _migration_user_rating_totals(self, conn):
+        """Сумма и число оценок пользователя (рейтинг без пересчета по reviews)"""
+        columns = {column[1] for column in conn.execute("PRAGMA table_info(users)")}
+        if 'rating_sum' not in columns:
+            conn.execute("ALTER TABLE users ADD COLUMN rating_sum INTEGER NOT NULL DEFAULT 0")
+        if 'rating_count' not in columns:
+            conn.execute("ALTER TABLE users ADD COLUMN rating_count INTEGER NOT NULL DEFAULT 0")
+        
+        self._rebuild_user_ratings(conn)
+    
+    def _migration_user_stats(self, conn):
+        """Статистика пользователя (заказы, завершенные, предложения), ведется триггерами"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_stats (
+                user_id INTEGER PRIMARY KEY,
+                orders_count INTEGER NOT NULL DEFAULT 0,
+                completed_orders INTEGER NOT NULL DEFAULT 0,
+                offers_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        self._create_user_stats_triggers(conn)
+        self._rebuild_user_stats(conn)
+    
+    USER_STATS_TRIGGERS = (
+        'user_stats_order_insert', 'user_stats_order_delete', 'user_stats_order_update',
+        'user_stats_offer_insert', 'user_stats_offer_delete', 'user_stats_offer_move',
+    )
+    
+    @staticmethod
+    def _create_user_stats_triggers(conn):
+        """Триггеры, которые ведут user_stats по orders и offers"""
+        # Заказы заказчика: +1 новому владельцу/статусу, -1 старому.
+        # Заказ без user_id не считаем: NULL в INTEGER PRIMARY KEY
+        # превратился бы в новый rowid, то есть в строку чужого пользователя
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_order_insert AFTER INSERT ON orders
+            WHEN new.user_id IS NOT NULL
+            BEGIN
+                INSERT INTO user_stats (user_id, orders_count, completed_orders)
+                VALUES (new.user_id, 1, new.status = 'completed')
+                ON CONFLICT (user_id) DO UPDATE SET
+                    orders_count = orders_count + 1,
+                    completed_orders = completed_orders + excluded.completed_orders;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_order_delete AFTER DELETE ON orders
+            WHEN old.user_id IS NOT NULL
+            BEGIN
+                UPDATE user_stats
+                SET orders_count = orders_count - 1,
+                    completed_orders = completed_orders - (old.status = 'completed')
+                WHERE user_id = old.user_id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_order_update AFTER UPDATE OF user_id, status ON orders
+            WHEN new.user_id IS NOT old.user_id
+              OR (new.status = 'completed') IS NOT (old.status = 'completed')
+            BEGIN
+                UPDATE user_stats
+                SET orders_count = orders_count - 1,
+                    completed_orders = completed_orders - (old.status = 'completed')
+                WHERE user_id = old.user_id;
+                INSERT INTO user_stats (user_id, orders_count, completed_orders)
+                SELECT new.user_id, 1, new.status = 'completed' WHERE new.user_id IS NOT NULL
+                ON CONFLICT (user_id) DO UPDATE SET
+                    orders_count = orders_count + 1,
+                    completed_orders = completed_orders + excluded.completed_orders;
+            END
+        ''')
+        
+        # Предложения исполнителя
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_offer_insert AFTER INSERT ON offers
+            WHEN new.executor_id IS NOT NULL
+            BEGIN
+                INSERT INTO user_stats (user_id, offers_count) VALUES (new.executor_id, 1)
+                ON CONFLICT (user_id) DO UPDATE SET offers_count = offers_count + 1;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_offer_delete AFTER DELETE ON offers
+            WHEN old.executor_id IS NOT NULL
+            BEGIN
+                UPDATE user_stats SET offers_count = offers_count - 1 WHERE user_id = old.executor_id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS user_stats_offer_move AFTER UPDATE OF executor_id ON offers
+            WHEN new.executor_id IS NOT old.executor_id
+            BEGIN
+                UPDATE user_stats SET offers_count = offers_count - 1 WHERE user_id = old.executor_id;
+                INSERT INTO user_stats (user_id, offers_count)
+                SELECT new.executor_id, 1 WHERE new.executor_id IS NOT NULL
+                ON CONFLICT (user_id) DO UPDATE SET offers_count = offers_count + 1;
+            END
+        ''')
+    
+    def _migration_orders_fulltext(self, conn):
+        """
+        Полнотекстовый индекс orders_fts по описанию и адресу.
+        
+        Индекс с внешним содержимым (тексты читаются из orders по rowid)
+        и только по активным заказам, как orders_rtree. unicode61 приводит
+        регистр и убирает диакритику (ё = е), prefix ускоряет поиск
+        по началу слова (см. fts_match_query).
+        """
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+                description, address,
+                content='orders', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS orders_fts_insert AFTER INSERT ON orders
+            WHEN new.status = 'active'
+            BEGIN
+                INSERT INTO orders_fts (rowid, description, address)
+                VALUES (new.rowid, new.description, new.address);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS orders_fts_delete AFTER DELETE ON orders
+            WHEN old.status = 'active'
+            BEGIN
+                INSERT INTO orders_fts (orders_fts, rowid, description, address)
+                VALUES ('delete', old.rowid, old.description, old.address);
+            END
+        ''')
+        # Для удаления из индекса с внешним содержимым нужны старые значения колонок
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS orders_fts_update AFTER UPDATE OF description, address, status ON orders
+            WHEN (old.status = 'active' OR new.status = 'active')
+              AND (old.status IS NOT new.status
+                   OR old.description IS NOT new.description
+                   OR old.address IS NOT new.address)
+            BEGIN
+                INSERT INTO orders_fts (orders_fts, rowid, description, address)
+                SELECT 'delete', old.rowid, old.description, old.address WHERE old.status = 'active';
+                INSERT INTO orders_fts (rowid, description, address)
+                SELECT new.rowid, new.description, new.address WHERE new.status = 'active';
+            END
+        ''')
+        
+        conn.execute("INSERT INTO orders_fts (orders_fts) VALUES ('delete-all')")
+        conn.execute('''
+            INSERT INTO orders_fts (rowid, description, address)
+            SELECT rowid, description, address FROM orders WHERE status = 'active'
+        ''')
+    
+    def _migration_orders_integer_key(self, conn):
+        """
+        Постоянный ключ заказа orders.id для orders_rtree.
+        
+        При order_id TEXT PRIMARY KEY rowid заказа неявный, и VACUUM
+        может его перенумеровать - R*Tree продолжил бы хранить старые
+        номера и указывать на чужие заказы. Таблица пересобирается
+        с id INTEGER PRIMARY KEY (id = прежний rowid), который VACUUM
+        не меняет; order_id остается уникальным ключом для остального кода.
+        Новые базы _create_tables сразу создает с id - их не пересобираем.
+        """
+        columns = [column[1] for column in conn.execute("PRAGMA table_info(orders)")]
+        if 'id' not in columns:
+            # Индексы и триггеры удаляются вместе со старой таблицей - запоминаем их
+            schema = [row[0] for row in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE tbl_name = 'orders' AND type IN ('index', 'trigger') "
+                "AND sql IS NOT NULL"
+            )]
+            
+            conn.execute('''
+                CREATE TABLE orders_new (
+                    id INTEGER PRIMARY KEY,
+                    order_id TEXT NOT NULL UNIQUE,
+                    user_id INTEGER,
+                    service_type TEXT,
+                    description TEXT,
+                    address TEXT,
+                    desired_price INTEGER,
+                    status TEXT DEFAULT 'active',
+                    selected_executor_id INTEGER DEFAULT NULL,
+                    created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                    expires_at INTEGER,
+                    latitude REAL,
+                    longitude REAL,
+                    offers_count INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id),
+                    FOREIGN KEY (selected_executor_id) REFERENCES users (user_id)
+                )
+            ''')
+            copied = ", ".join(columns)
+            conn.execute(f"INSERT INTO orders_new (id, {copied}) SELECT rowid, {copied} FROM orders")
+            conn.execute("DROP TABLE orders")
+            # Триггеры на offers ссылаются на orders, которой в этот момент нет;
+            # в режиме legacy переименование не проверяет чужие триггеры
+            conn.execute("PRAGMA legacy_alter_table = ON")
+            conn.execute("ALTER TABLE orders_new RENAME TO orders")
+            conn.execute("PRAGMA legacy_alter_table = OFF")
+            
+            for statement in schema:
+                conn.execute(statement)
+        
+        # Триггеры R*Tree - по orders.id вместо rowid
+        for name in ('orders_rtree_insert', 'orders_rtree_update', 'orders_rtree_delete'):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute('''
+            CREATE TRIGGER orders_rtree_insert AFTER INSERT ON orders
+            WHEN new.status = 'active' AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+            BEGIN
+                INSERT INTO orders_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER orders_rtree_update AFTER UPDATE OF status, latitude, longitude ON orders
+            BEGIN
+                DELETE FROM orders_rtree WHERE id = old.id;
+                INSERT INTO orders_rtree
+                SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+                WHERE new.status = 'active' AND new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER orders_rtree_delete AFTER DELETE ON orders
+            BEGIN
+                DELETE FROM orders_rtree WHERE id = old.id;
+            END
+        ''')
+        
+        # Если VACUUM уже перенумеровал rowid, старое содержимое R*Tree неверно
+        conn.execute("DELETE FROM orders_rtree")
+        conn.execute('''
+            INSERT INTO orders_rtree
+            SELECT id, latitude, latitude, longitude, longitude FROM orders
+            WHERE status = 'active' AND latitude IS NOT NULL AND longitude IS NOT NULL
+        ''')
+    
+    def _migration_user_stats_skip_null_users(self, conn):
+        """
+        Триггеры user_stats без строк для заказов и предложений с NULL
+        вместо пользователя; уже созданные такие строки удаляет пересчет.
+        """
+        for name in self.USER_STATS_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        self._create_user_stats_triggers(conn)
+        self._rebuild_user_stats(conn)
+    
+    def _migration_orders_fulltext_stable_key(self, conn):
+        """
+        orders_fts с content_rowid='id' вместо неявного rowid.
+        
+        Индекс из миграции 10 читал тексты из orders по rowid; после
+        VACUUM неявный rowid мог бы указывать на другой заказ. Теперь
+        ключ индекса - orders.id (с миграции 11 - INTEGER PRIMARY KEY),
+        триггеры пишут new.id/old.id. Индекс пересоздается и заполняется
+        заново по активным заказам.
+        """
+        for name in ('orders_fts_insert', 'orders_fts_delete', 'orders_fts_update'):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute("DROP TABLE IF EXISTS orders_fts")
+        
+        conn.execute('''
+            CREATE VIRTUAL TABLE orders_fts USING fts5(
+                description, address,
+                content='orders', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER orders_fts_insert AFTER INSERT ON orders
+            WHEN new.status = 'active'
+            BEGIN
+                INSERT INTO orders_fts (rowid, description, address)
+                VALUES (new.id, new.description, new.address);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER orders_fts_delete AFTER DELETE ON orders
+            WHEN old.status = 'active'
+            BEGIN
+                INSERT INTO orders_fts (orders_fts, rowid, description, address)
+                VALUES ('delete', old.id, old.description, old.address);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER orders_fts_update AFTER UPDATE OF description, address, status ON orders
+            WHEN (old.status = 'active' OR new.status = 'active')
+              AND (old.status IS NOT new.status
+                   OR old.description IS NOT new.description
+                   OR old.address IS NOT new.address)
+            BEGIN
+                INSERT INTO orders_fts (orders_fts, rowid, description, address)
+                SELECT 'delete', old.id, old.description, old.address WHERE old.status = 'active';
+                INSERT INTO orders_fts (rowid, description, address)
+                SELECT new.id, new.description, new.address WHERE new.status = 'active';
+            END
+        ''')
+        conn.execute('''
+            INSERT INTO orders_fts (rowid, description, address)
+            SELECT id, description, address FROM orders WHERE status = 'active'
+        ''')
     
     def init_default_categories(self):
         """Заполняем таблицу категорий услугами по умолчанию"""
@@ -183,298 +876,495 @@ class Database:
             {'name': '📝 Другое', 'code': 'other', 'parent_id': None, 'equipment_type': 'universal'},
         ]
         
-        for category in default_categories:
-            self.cursor.execute('''
-                INSERT OR IGNORE INTO service_categories (name, code, parent_id, equipment_type)
-                VALUES (?, ?, ?, ?)
-            ''', (category['name'], category['code'], category['parent_id'], category['equipment_type']))
+        with self.pool.writer() as conn:
+            for category in default_categories:
+                conn.execute('''
+                    INSERT OR IGNORE INTO service_categories (name, code, parent_id, equipment_type)
+                    VALUES (?, ?, ?, ?)
+                ''', (category['name'], category['code'], category['parent_id'], category['equipment_type']))
         
-        self.conn.commit()
+        self.refresh_categories()
+    
+    # ===== ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ =====
+    
+    def _table_columns(self, table):
+        """Колонки таблицы (PRAGMA table_info читается один раз на версию схемы)"""
+        columns = self._schema_columns.get(table)
+        if columns is None:
+            with self.pool.reader() as conn:
+                columns = frozenset(row[1] for row in conn.execute(f"PRAGMA table_info({table})"))
+            self._schema_columns[table] = columns
+        return columns
+    
+    def _updatable_fields(self, table, fields):
+        """Поля для UPDATE: только существующие и не защищенные колонки"""
+        allowed = self._table_columns(table) - self.PROTECTED_COLUMNS.get(table, set())
+        
+        valid = {}
+        for key, value in fields.items():
+            if key in allowed:
+                valid[key] = value
+            else:
+                print(f"⚠️ Колонка '{key}' недоступна для обновления в таблице {table}")
+        
+        if not valid:
+            print("⚠️ Нет допустимых полей для обновления")
+        return valid
+    
+    def _fetchone(self, query, params=()):
+        """Одна строка результата в виде dict (или None)"""
+        with self.pool.reader() as conn:
+            row = conn.execute(query, params).fetchone()
+        return dict(row) if row else None
+    
+    def _fetchall(self, query, params=()):
+        """Все строки результата в виде списка dict"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
     
     # ===== ГЕОЛОКАЦИЯ =====
     
     @staticmethod
     def haversine_distance(lat1, lon1, lat2, lon2):
         """Рассчитывает расстояние между двумя точками на Земле (в км)"""
-        R = 6371.0
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        return R * c
+        return haversine_distance(lat1, lon1, lat2, lon2)
     
     # ===== ПОЛЬЗОВАТЕЛИ =====
     
     def add_user(self, user_id, username, full_name):
-        """Добавление/обновление пользователя"""
-        self.cursor.execute(
-            '''INSERT OR REPLACE INTO users (user_id, username, full_name) 
-               VALUES (?, ?, ?)''',
-            (user_id, username, full_name)
-        )
-        self.conn.commit()
+        """
+        Добавление/обновление пользователя
+        
+        UPSERT меняет только имя, роль, рейтинг и дата регистрации
+        сохраняются (INSERT OR REPLACE удалял строку целиком).
+        Если имя не изменилось (по кэшу или по строке в БД), записи нет.
+        
+        Returns:
+            Строка пользователя после записи
+        """
+        known = self.get_user(user_id)
+        if known and known['username'] == username and known['full_name'] == full_name:
+            return known
+        
+        with self.pool.writer() as conn:
+            row = conn.execute('''
+                INSERT INTO users (user_id, username, full_name)
+                VALUES (?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    username = excluded.username,
+                    full_name = excluded.full_name
+                WHERE username IS NOT excluded.username
+                   OR full_name IS NOT excluded.full_name
+                RETURNING *
+            ''', (user_id, username, full_name)).fetchone()
+        
+        # Строки нет - имя в БД уже совпадало, кэш был устаревшим
+        self._invalidate_user(user_id)
+        return dict(row) if row else self.get_user(user_id)
     
     def get_user(self, user_id):
-        """Получение информации о пользователя"""
-        self.cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        user = self.cursor.fetchone()
-        return dict(user) if user else None
-    
-    def update_user_role(self, user_id, role):
-        """Изменение роли пользователя"""
-        self.cursor.execute(
-            "UPDATE users SET role = ? WHERE user_id = ?",
-            (role, user_id)
+        """Получение информации о пользователя (через кэш)"""
+        return self.users_cache.get_or_load(
+            user_id,
+            lambda: self._fetchone("SELECT * FROM users WHERE user_id = ?", (user_id,))
         )
-        self.conn.commit()
+    
+    def transaction(self):
+        """
+        Общая транзакция для нескольких вызовов методов Database:
+        
+            with db.transaction():
+                db.update_executor_profile(user_id, ...)
+                db.update_user_location(user_id, ...)
         
-        if role == 'executor':
-            self.create_executor_profile(user_id)
+        Вложенные методы не коммитят сами, кэши и индекс подбора
+        обновляются после commit.
+        """
+        return self.pool.writer()
+    
+    def _invalidate_user(self, user_id):
+        """Сбросить кэш пользователя и его профиля исполнителя (после commit)"""
+        def invalidate():
+            self.users_cache.invalidate(user_id)
+            self.profiles_cache.invalidate(user_id)
         
+        self.pool.after_commit(invalidate)
+    
+    def get_cache_stats(self):
+        """Счетчики попаданий/промахов кэшей"""
+        return {
+            cache.name: cache.stats()
+            for cache in (self.users_cache, self.profiles_cache)
+        }
+    
+    def update_user_role(self, user_id, role):
+        """Изменение роли пользователя (вместе с созданием профиля - один commit)"""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE users SET role = ? WHERE user_id = ?",
+                (role, user_id)
+            )
+            
+            if role == 'executor':
+                self.create_executor_profile(user_id)
+        
+        self._invalidate_user(user_id)
+        self._executor_changed(user_id)
         return True
     
+    def complete_executor_registration(self, user_id, profile_data, latitude=None, longitude=None, address=None):
+        """Сохранение анкеты исполнителя и его геолокации в одной транзакции"""
+        with self.transaction():
+            updated = self.update_executor_profile(user_id, **profile_data) if profile_data else True
+            if latitude is not None and longitude is not None:
+                self.update_user_location(user_id, latitude, longitude, address)
+        return updated
+    
     def update_user_rating(self, user_id, new_rating):
-        """Обновление рейтинга пользователя"""
-        self.cursor.execute(
-            "UPDATE users SET rating = ? WHERE user_id = ?",
-            (new_rating, user_id)
-        )
-        self.conn.commit()
+        """Ручная установка рейтинга (отзывы обновляют его сами, см. add_review)"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE users SET rating = ? WHERE user_id = ?",
+                (new_rating, user_id)
+            )
+        
+        self._invalidate_user(user_id)
     
     # ===== ПРОФИЛИ ИСПОЛНИТЕЛЕЙ =====
     
     def create_executor_profile(self, user_id):
         """Создание пустого профиля исполнителя"""
-        self.cursor.execute('''
-            INSERT OR IGNORE INTO executor_profiles 
-            (user_id, work_radius_km, min_price, max_price) 
-            VALUES (?, 20, 1000, 50000)
-        ''', (user_id,))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO executor_profiles 
+                (user_id, work_radius_km, min_price, max_price) 
+                VALUES (?, 20, 1000, 50000)
+            ''', (user_id,))
+        
+        self._invalidate_user(user_id)
+        self._executor_changed(user_id)
         return True
     
     def get_executor_profile(self, user_id):
-        """Получение профиля исполнителя"""
-        self.cursor.execute('''
+        """Получение профиля исполнителя (через кэш)"""
+        return self.profiles_cache.get_or_load(user_id, lambda: self._fetchone('''
             SELECT ep.*, u.username, u.full_name, u.rating 
             FROM executor_profiles ep
             LEFT JOIN users u ON ep.user_id = u.user_id
             WHERE ep.user_id = ?
-        ''', (user_id,))
-        profile = self.cursor.fetchone()
-        return dict(profile) if profile else None
+        ''', (user_id,)))
     
     def update_executor_profile(self, user_id, **kwargs):
         """Обновление профиля исполнителя (БЕЗОПАСНЫЙ МЕТОД)"""
         if not kwargs:
             return False
         
-        # Получаем список существующих колонок
-        self.cursor.execute("PRAGMA table_info(executor_profiles)")
-        existing_columns = [column[1] for column in self.cursor.fetchall()]
-        
-        # Фильтруем только существующие колонки
-        valid_kwargs = {}
-        for key, value in kwargs.items():
-            if key in existing_columns:
-                valid_kwargs[key] = value
-            else:
-                print(f"⚠️ Колонка '{key}' не существует в таблице executor_profiles")
-        
+        valid_kwargs = self._updatable_fields('executor_profiles', kwargs)
         if not valid_kwargs:
-            print("⚠️ Нет допустимых полей для обновления")
             return False
         
-        set_clause = ", ".join([f"{key} = ?" for key in valid_kwargs.keys()])
-        values = list(valid_kwargs.values())
-        values.append(user_id)
+        columns = tuple(sorted(valid_kwargs))
+        query = build_update_statement('executor_profiles', columns, 'user_id', touch_updated_at=True)
         
-        query = f"UPDATE executor_profiles SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?"
-        self.cursor.execute(query, values)
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute(query, [valid_kwargs[column] for column in columns] + [user_id])
+            
+            if valid_kwargs.keys() & {'latitude', 'longitude', 'work_radius_km'}:
+                self._sync_executor_area(conn, user_id)
+        
+        self._invalidate_user(user_id)
+        if valid_kwargs.keys() & MATCH_FIELDS:
+            self._executor_changed(user_id)
         return True
     
+    def _sync_executor_area(self, conn, user_id):
+        """Обновить зону работы исполнителя в executors_rtree (в текущей транзакции)"""
+        conn.execute("DELETE FROM executors_rtree WHERE id = ?", (user_id,))
+        
+        row = conn.execute(
+            "SELECT latitude, longitude, work_radius_km FROM executor_profiles WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if not row or row['latitude'] is None or row['longitude'] is None or not row['work_radius_km']:
+            return
+        
+        min_lat, max_lat, min_lon, max_lon = bounding_box(row['latitude'], row['longitude'], row['work_radius_km'])
+        conn.execute(
+            "INSERT INTO executors_rtree VALUES (?, ?, ?, ?, ?)",
+            (user_id, min_lat, max_lat, min_lon, max_lon)
+        )
+    
+    def get_executors_near(self, latitude, longitude):
+        """
+        Исполнители, в зону работы которых попадает точка.
+        
+        Кандидаты отбираются по executors_rtree (CROSS JOIN фиксирует его
+        первым в плане), затем проверяется точное расстояние. Поле distance_km - расстояние до исполнителя.
+        """
+        candidates = self._fetchall('''
+            SELECT ep.*, u.username, u.full_name, u.rating
+            FROM executors_rtree r
+            CROSS JOIN executor_profiles ep ON ep.user_id = r.id
+            JOIN users u ON u.user_id = ep.user_id
+            WHERE r.min_lat <= ? AND r.max_lat >= ? AND r.min_lon <= ? AND r.max_lon >= ?
+            AND u.role = 'executor'
+        ''', (latitude, latitude, longitude, longitude))
+        
+        executors = []
+        if candidates:
+            distances = haversine_matrix(
+                [latitude], [longitude],
+                [executor['latitude'] for executor in candidates], [executor['longitude'] for executor in candidates]
+            )[0]
+            for executor, distance in zip(candidates, distances):
+                if distance <= executor['work_radius_km']:
+                    executor['distance_km'] = round(float(distance), 1)
+                    executors.append(executor)
+        executors.sort(key=lambda executor: executor['distance_km'])
+        return executors
+    
+    # ===== ПОДБОР ИСПОЛНИТЕЛЕЙ =====
+    
+    _MATCH_PROFILE_QUERY = '''
+        SELECT ep.user_id, ep.service_filter, ep.min_price, ep.max_price,
+               ep.latitude, ep.longitude, ep.work_radius_km
+        FROM executor_profiles ep
+        JOIN users u ON u.user_id = ep.user_id
+        WHERE u.role = 'executor'
+    '''
+    
+    def _executor_changed(self, user_id):
+        """Обновить исполнителя в индексе подбора после изменения профиля или роли"""
+        def reload():
+            profile = self._fetchone(self._MATCH_PROFILE_QUERY + " AND ep.user_id = ?", (user_id,))
+            if profile:
+                self.match_index.put(profile)
+            else:
+                self.match_index.remove(user_id)
+        
+        # Читатели видят изменения только после commit
+        self.pool.after_commit(reload)
+    
+    def match_executors(self, service_type, desired_price=None, latitude=None, longitude=None, exclude_user_id=None):
+        """ID исполнителей, которым подходит заказ (без запроса к БД)"""
+        return self.match_index.match(service_type, desired_price, latitude, longitude, exclude_user_id)
+    
     # ===== ТЕХНИКА =====
     
     def add_equipment(self, executor_id, equipment_data):
         """Добавление единицы техники"""
-        self.cursor.execute('''
-            INSERT INTO executor_equipment 
-            (executor_id, equipment_type, subtype, brand, model, year, 
-             capacity_kg, volume_m3, dimensions, features, daily_rate, hourly_rate)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            executor_id,
-            equipment_data.get('equipment_type'),
-            equipment_data.get('subtype'),
-            equipment_data.get('brand'),
-            equipment_data.get('model'),
-            equipment_data.get('year'),
-            equipment_data.get('capacity_kg'),
-            equipment_data.get('volume_m3'),
-            equipment_data.get('dimensions'),
-            json.dumps(equipment_data.get('features', {})) if equipment_data.get('features') else None,
-            equipment_data.get('daily_rate'),
-            equipment_data.get('hourly_rate')
-        ))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT INTO executor_equipment 
+                (executor_id, equipment_type, subtype, brand, model, year, 
+                 capacity_kg, volume_m3, dimensions, features, daily_rate, hourly_rate)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                executor_id,
+                equipment_data.get('equipment_type'),
+                equipment_data.get('subtype'),
+                equipment_data.get('brand'),
+                equipment_data.get('model'),
+                equipment_data.get('year'),
+                equipment_data.get('capacity_kg'),
+                equipment_data.get('volume_m3'),
+                equipment_data.get('dimensions'),
+                json.dumps(equipment_data.get('features', {})) if equipment_data.get('features') else None,
+                equipment_data.get('daily_rate'),
+                equipment_data.get('hourly_rate')
+            ))
         return True
     
     def get_executor_equipment(self, executor_id):
         """Получение всей техники исполнителя"""
-        self.cursor.execute('''
+        return self._fetchall('''
             SELECT * FROM executor_equipment 
             WHERE executor_id = ? 
             ORDER BY created_at DESC
         ''', (executor_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
     
     def get_equipment(self, equipment_id):
         """Получение техники по ID"""
-        self.cursor.execute(
+        return self._fetchone(
             "SELECT * FROM executor_equipment WHERE id = ?",
             (equipment_id,)
         )
-        equipment = self.cursor.fetchone()
-        return dict(equipment) if equipment else None
     
     def update_equipment(self, equipment_id, **kwargs):
-        """Обновление техники"""
+        """Обновление техники (только существующие колонки)"""
         if not kwargs:
             return False
         
-        set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-        values = list(kwargs.values())
-        values.append(equipment_id)
+        valid_kwargs = self._updatable_fields('executor_equipment', kwargs)
+        if not valid_kwargs:
+            return False
+        
+        columns = tuple(sorted(valid_kwargs))
+        query = build_update_statement('executor_equipment', columns, 'id')
         
-        query = f"UPDATE executor_equipment SET {set_clause} WHERE id = ?"
-        self.cursor.execute(query, values)
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute(query, [valid_kwargs[column] for column in columns] + [equipment_id])
         return True
     
     def delete_equipment(self, equipment_id):
         """Удаление техники"""
-        self.cursor.execute(
-            "DELETE FROM executor_equipment WHERE id = ?",
-            (equipment_id,)
-        )
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute(
+                "DELETE FROM executor_equipment WHERE id = ?",
+                (equipment_id,)
+            )
         return True
     
     def toggle_equipment_availability(self, equipment_id, is_available):
         """Изменение статуса доступности техники"""
-        self.cursor.execute(
-            "UPDATE executor_equipment SET is_available = ? WHERE id = ?",
-            (is_available, equipment_id)
-        )
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE executor_equipment SET is_available = ? WHERE id = ?",
+                (is_available, equipment_id)
+            )
         return True
     
     # ===== ГЕОЛОКАЦИЯ =====
     
     def update_user_location(self, user_id, latitude=None, longitude=None, address=None, city=None):
-        """Обновление/добавление локации пользователя"""
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO user_locations 
-            (user_id, latitude, longitude, address, city, last_updated)
-            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (user_id, latitude, longitude, address, city))
-        self.conn.commit()
-        
-        # Также обновляем в профиле исполнителя (если есть)
-        self.cursor.execute('''
-            UPDATE executor_profiles 
-            SET location_text = ?, latitude = ?, longitude = ?, location_type = 'coordinates'
-            WHERE user_id = ? AND (latitude IS NULL OR longitude IS NULL)
-        ''', (address, latitude, longitude, user_id))
-        self.conn.commit()
+        """Обновление/добавление локации пользователя (одна транзакция)"""
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT INTO user_locations (user_id, latitude, longitude, address, city, last_updated)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    latitude = excluded.latitude,
+                    longitude = excluded.longitude,
+                    address = excluded.address,
+                    city = excluded.city,
+                    last_updated = excluded.last_updated
+            ''', (user_id, latitude, longitude, address, city))
+            
+            # Также обновляем в профиле исполнителя (если есть)
+            cursor = conn.execute('''
+                UPDATE executor_profiles 
+                SET location_text = ?, latitude = ?, longitude = ?, location_type = 'coordinates'
+                WHERE user_id = ? AND (latitude IS NULL OR longitude IS NULL)
+            ''', (address, latitude, longitude, user_id))
+            if cursor.rowcount:
+                self._sync_executor_area(conn, user_id)
+        
+        if cursor.rowcount:
+            self._invalidate_user(user_id)
+            self._executor_changed(user_id)
         
         return True
     
+    def save_live_locations(self, locations):
+        """
+        Пакетная запись live-геолокации (из write_behind.location_writer)
+        
+        Args:
+            locations: Список (user_id, latitude, longitude, updated_at),
+                updated_at - секунды Unix момента получения координат
+        """
+        with self.pool.writer() as conn:
+            conn.executemany('''
+                INSERT INTO user_locations (user_id, latitude, longitude, last_updated)
+                VALUES (?, ?, ?, datetime(?, 'unixepoch'))
+                ON CONFLICT (user_id) DO UPDATE SET
+                    latitude = excluded.latitude,
+                    longitude = excluded.longitude,
+                    last_updated = excluded.last_updated
+            ''', locations)
+        return len(locations)
+    
     def get_user_location(self, user_id):
         """Получение локации пользователя"""
-        self.cursor.execute('''
+        return self._fetchone('''
             SELECT * FROM user_locations WHERE user_id = ?
         ''', (user_id,))
-        location = self.cursor.fetchone()
-        return dict(location) if location else None
     
     # ===== КАТЕГОРИИ УСЛУГ =====
     
+    def refresh_categories(self):
+        """
+        Перечитать справочник категорий из БД.
+        
+        Вызывать после любого изменения service_categories: справочник
+        заменяется целиком, читатели видят либо старую, либо новую версию.
+        """
+        self.categories = CategoryCatalogue(self._fetchall("SELECT * FROM service_categories"))
+        return len(self.categories)
+    
     def get_categories(self, parent_id=None):
-        """Получение категорий услуг"""
-        if parent_id is not None:
-            self.cursor.execute('''
-                SELECT * FROM service_categories 
-                WHERE parent_id = ?
-                ORDER BY name
-            ''', (parent_id,))
-        else:
-            self.cursor.execute('''
-                SELECT * FROM service_categories 
-                WHERE parent_id IS NULL
-                ORDER BY name
-            ''')
-        return [dict(row) for row in self.cursor.fetchall()]
+        """Получение категорий услуг (из справочника в памяти)"""
+        return list(self.categories.children(parent_id))
     
     def get_category_by_code(self, code):
-        """Получение категории по коду"""
-        self.cursor.execute('''
-            SELECT * FROM service_categories WHERE code = ?
-        ''', (code,))
-        category = self.cursor.fetchone()
-        return dict(category) if category else None
+        """Получение категории по коду (из справочника в памяти)"""
+        return self.categories.by_code(code)
     
     # ===== ИЗБРАННЫЕ КАТЕГОРИИ =====
     
     def add_executor_category(self, executor_id, category_id):
         """Добавление категории, которую выполняет исполнитель"""
-        self.cursor.execute('''
-            INSERT OR IGNORE INTO executor_categories (executor_id, category_id)
-            VALUES (?, ?)
-        ''', (executor_id, category_id))
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO executor_categories (executor_id, category_id)
+                VALUES (?, ?)
+            ''', (executor_id, category_id))
         return True
     
     def get_executor_categories(self, executor_id):
         """Получение категорий исполнителя"""
-        self.cursor.execute('''
+        return self._fetchall('''
             SELECT sc.* 
             FROM executor_categories ec
             JOIN service_categories sc ON ec.category_id = sc.id
             WHERE ec.executor_id = ?
         ''', (executor_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
     
     # ===== ФИЛЬТРАЦИЯ ЗАКАЗОВ (УПРОЩЕННАЯ) =====
     
-    def get_filtered_orders_for_executor(self, executor_id):
-        """
-        УПРОЩЕННАЯ ФИЛЬТРАЦИЯ - только по услуге и цене
+    _RTREE_BOX_FILTER = """
+        o.id IN (
+            SELECT id FROM orders_rtree
+            WHERE min_lat >= ? AND max_lat <= ? AND min_lon >= ? AND max_lon <= ?
+        )
+    """
+    
+    def _executor_feed_query(self, executor_id, executor_profile, search=None):
         """
-        executor_profile = self.get_executor_profile(executor_id)
+        Запрос ленты исполнителя с фильтрами по услуге и цене.
         
-        if not executor_profile:
-            return []
+        Args:
+            search: Выражение MATCH для orders_fts (поиск вместо ленты,
+                    в выборке появляется колонка rank - bm25, меньше = лучше)
         
-        # Базовый запрос
-        query = """
-            SELECT o.*, u.username, u.full_name
-            FROM orders o
-            LEFT JOIN users u ON o.user_id = u.user_id
-            WHERE o.status = 'active' 
-            AND datetime(o.expires_at) > datetime('now')
-            AND o.user_id != ?
+        Returns:
+            (query, params, area): area - (latitude, longitude, radius_km)
+            или None, если местоположение исполнителя неизвестно
         """
-        
-        params = [executor_id]
+        # Базовый запрос
+        if search:
+            query = """
+                SELECT o.*, u.username, u.full_name, bm25(orders_fts, 2.0, 1.0) AS rank
+                FROM orders_fts
+                JOIN orders o ON o.id = orders_fts.rowid
+                LEFT JOIN users u ON o.user_id = u.user_id
+                WHERE orders_fts MATCH ?
+                AND o.status = 'active'
+                AND o.expires_at > ?
+                AND o.user_id != ?
+            """
+            params = [search, int(time.time()), executor_id]
+        else:
+            query = """
+                SELECT o.*, u.username, u.full_name
+                FROM orders o
+                LEFT JOIN users u ON o.user_id = u.user_id
+                WHERE o.status = 'active' 
+                AND o.expires_at > ?
+                AND o.user_id != ?
+            """
+            params = [int(time.time()), executor_id]
         
         # 1. Фильтр по цене (если указан)
         min_price = executor_profile.get('min_price')
@@ -494,40 +1384,280 @@ class Database:
             query += " AND o.service_type = ?"
             params.append(service_filter)
         
-        query += " ORDER BY o.created_at DESC"
+        # 3. Зона работы (если известно местоположение исполнителя)
+        latitude = executor_profile.get('latitude')
+        longitude = executor_profile.get('longitude')
+        radius_km = executor_profile.get('work_radius_km')
+        
+        if latitude is None or longitude is None or not radius_km:
+            return query, params, None
+        
+        return query, params, (latitude, longitude, radius_km)
+    
+    @staticmethod
+    def _within_area(orders, area):
+        """
+        Оставить заказы в радиусе работы (поле distance_km).
+        Заказы без координат не отбрасываются; порядок сохраняется.
+        """
+        latitude, longitude, radius_km = area
+        located = [order for order in orders if order['latitude'] is not None]
+        if not located:
+            return orders
+        
+        distances = haversine_matrix(
+            [latitude], [longitude],
+            [order['latitude'] for order in located], [order['longitude'] for order in located]
+        )[0]
+        for order, distance in zip(located, distances):
+            order['distance_km'] = round(float(distance), 1)
         
-        self.cursor.execute(query, params)
-        return [dict(row) for row in self.cursor.fetchall()]
+        return [
+            order for order in orders
+            if order['latitude'] is None or order['distance_km'] <= radius_km
+        ]
+    
+    # Строк за один запрос в _page_within_area: при узком радиусе большая
+    # часть прямоугольника отсекается точной проверкой, и пачками по limit
+    # страница собиралась бы десятками мелких запросов
+    AREA_BATCH_SIZE = 50
+    
+    def _page_within_area(self, fetch, area, limit, batch_size=None):
+        """
+        Страница заказов с точной проверкой радиуса работы.
+        
+        Прямоугольник в SQL пропускает углы за пределами круга, и после
+        _within_area строк на странице может не хватить - тогда читается
+        следующая пачка того же запроса.
+        
+        Args:
+            fetch: fetch(last_row, read, size) - следующие size строк запроса
+                   после строки last_row (None - с начала); read - сколько
+                   строк уже прочитано
+            area: (latitude, longitude, radius_km) или None - без проверки
+            limit: Размер страницы
+            batch_size: Строк в одном запросе (по умолчанию limit)
+        
+        Returns:
+            (page, read, more): read - сколько строк запроса прочитано
+            до последней строки страницы включительно, more - могут ли
+            за ней быть еще строки
+        """
+        size = batch_size or limit
+        page, read, last_row = [], 0, None
+        
+        while True:
+            rows = fetch(last_row, read, size)
+            kept = self._within_area(rows, area) if area else rows
+            need = limit - len(page)
+            
+            if len(kept) >= need:
+                last = kept[need - 1]
+                position = next(i for i, row in enumerate(rows) if row is last) + 1
+                page += kept[:need]
+                return page, read + position, position < len(rows) or len(rows) == size
+            
+            page += kept
+            read += len(rows)
+            if len(rows) < size:
+                return page, read, False
+            last_row = rows[-1]
+    
+    # Ключ заказов без координат в ленте с зоной работы: они идут
+    # после всех заказов в радиусе
+    _UNLOCATED_DISTANCE = 1e9
+    
+    def _area_feed_query(self, query, params, area):
+        """
+        Лента с зоной работы: заказы в радиусе по расстоянию, затем без координат.
+        
+        Кандидаты в радиусе отбираются через orders_rtree, точное
+        расстояние считает haversine_km (см. ConnectionPool._connect).
+        Порядок ленты - ключ (feed_distance, feed_order): для заказов
+        в радиусе это (расстояние, id), для заказов без координат
+        (_UNLOCATED_DISTANCE, -id) - новые первыми.
+        """
+        latitude, longitude, radius_km = area
+        located = f"""
+            SELECT feed.*, haversine_km(feed.latitude, feed.longitude, ?, ?) AS feed_distance,
+                   feed.id AS feed_order
+            FROM ({query} AND {self._RTREE_BOX_FILTER}) AS feed
+            WHERE feed_distance <= ?
+        """
+        without_location = f"""
+            SELECT feed.*, {self._UNLOCATED_DISTANCE} AS feed_distance, -feed.id AS feed_order
+            FROM ({query} AND o.latitude IS NULL) AS feed
+        """
+        return (
+            f"SELECT * FROM ({located} UNION ALL {without_location})",
+            [latitude, longitude, *params, *bounding_box(*area), radius_km, *params]
+        )
+    
+    @classmethod
+    def _with_feed_distance(cls, orders):
+        """Поле distance_km (округленное расстояние) для заказов в радиусе"""
+        for order in orders:
+            if order['feed_distance'] < cls._UNLOCATED_DISTANCE:
+                order['distance_km'] = round(order['feed_distance'], 1)
+        return orders
+    
+    def get_filtered_orders_for_executor(self, executor_id):
+        """
+        Лента заказов исполнителя: фильтр по услуге, цене и радиусу работы.
+        
+        Если у исполнителя заданы координаты, заказы с координатами
+        отбираются в радиусе work_radius_km и сортируются по расстоянию
+        (поле distance_km), а заказы без координат идут следом, новые
+        первыми. Без координат исполнителя - все заказы по дате.
+        """
+        executor_profile = self.get_executor_profile(executor_id)
+        
+        if not executor_profile:
+            return []
+        
+        query, params, area = self._executor_feed_query(executor_id, executor_profile)
+        
+        if not area:
+            return self._fetchall(query + " ORDER BY o.created_at DESC", params)
+        
+        query, params = self._area_feed_query(query, params, area)
+        return self._with_feed_distance(
+            self._fetchall(query + " ORDER BY feed_distance, feed_order", params)
+        )
+    
+    def get_orders_feed_page(self, executor_id, cursor=None, limit=10, backward=False):
+        """
+        Страница ленты исполнителя с keyset-пагинацией.
+        
+        Порядок тот же, что в get_filtered_orders_for_executor: при заданной
+        зоне работы - по расстоянию, иначе новые заказы первыми.
+        
+        Args:
+            executor_id: ID исполнителя
+            cursor: feed_cursor() заказа, от которого листаем;
+                    None - начало ленты
+            limit: Размер страницы
+            backward: True - заказы перед cursor
+        
+        Returns:
+            Список заказов в порядке ленты
+        """
+        executor_profile = self.get_executor_profile(executor_id)
+        
+        if not executor_profile:
+            return []
+        
+        query, params, area = self._executor_feed_query(executor_id, executor_profile)
+        
+        if area:
+            query, params = self._area_feed_query(query, params, area)
+            key, condition = ("feed_distance", "feed_order"), " WHERE"
+            comparison, direction = ('<', 'DESC') if backward else ('>', 'ASC')
+        else:
+            key, condition = ("o.created_at", "o.order_id"), " AND"
+            comparison, direction = ('>', 'ASC') if backward else ('<', 'DESC')
+        
+        if cursor:
+            query += f"{condition} ({key[0]}, {key[1]}) {comparison} (?, ?)"
+            params = params + list(cursor)
+        query += f" ORDER BY {key[0]} {direction}, {key[1]} {direction} LIMIT ?"
+        
+        page = self._fetchall(query, params + [limit])
+        if backward:
+            page.reverse()
+        return self._with_feed_distance(page) if area else page
+    
+    @staticmethod
+    def feed_cursor(order):
+        """Курсор get_orders_feed_page, указывающий на заказ order из ленты"""
+        if 'feed_distance' in order:
+            return [order['feed_distance'], order['feed_order']]
+        return [order['created_at'], order['order_id']]
+    
+    # ===== ПОЛНОТЕКСТОВЫЙ ПОИСК =====
+    
+    def search_orders(self, text, executor_id=None, limit=10, offset=0):
+        """
+        Поиск активных заказов по описанию и адресу (FTS5, ранжирование bm25).
+        
+        Слова запроса ищутся по началу слова после отбрасывания
+        окончания ("краны Химках" найдет "кран в Химки").
+        
+        Args:
+            text: Строка запроса
+            executor_id: Применить фильтры ленты исполнителя
+                         (услуга, цена, радиус работы); None - без фильтров
+            limit: Размер страницы
+            offset: Смещение из предыдущего вызова (next_offset)
+        
+        Returns:
+            (orders, next_offset): next_offset - None, если результатов больше нет
+        """
+        match = fts_match_query(text)
+        if not match:
+            return [], None
+        
+        if executor_id is not None:
+            executor_profile = self.get_executor_profile(executor_id)
+            if not executor_profile:
+                return [], None
+            query, params, area = self._executor_feed_query(executor_id, executor_profile, search=match)
+        else:
+            query = """
+                SELECT o.*, u.username, u.full_name, bm25(orders_fts, 2.0, 1.0) AS rank
+                FROM orders_fts
+                JOIN orders o ON o.id = orders_fts.rowid
+                LEFT JOIN users u ON o.user_id = u.user_id
+                WHERE orders_fts MATCH ?
+                AND o.status = 'active'
+                AND o.expires_at > ?
+            """
+            params, area = [match, int(time.time())], None
+        
+        if area:
+            query += " AND (o.latitude IS NULL OR (o.latitude BETWEEN ? AND ? AND o.longitude BETWEEN ? AND ?))"
+            params += list(bounding_box(*area))
+        query += " ORDER BY rank, o.order_id LIMIT ? OFFSET ?"
+        
+        page, read, more = self._page_within_area(
+            lambda last_row, read, size: self._fetchall(query, params + [size, offset + read]),
+            area, limit, max(limit, self.AREA_BATCH_SIZE) if area else limit
+        )
+        # Следующая страница начнется после последней показанной строки
+        return page, (offset + read if more else None)
     
     # ===== ЗАКАЗЫ =====
     
-    def create_order(self, order_id, user_id, service_type, description, address, desired_price):
+    def create_order(self, order_id, user_id, service_type, description, address, desired_price,
+                     latitude=None, longitude=None):
         """Создание нового заказа"""
-        expires_at = datetime.now() + timedelta(days=7)
+        created_at = int(time.time())
+        expires_at = created_at + ORDER_TTL_SECONDS
         
-        self.cursor.execute(
-            '''INSERT INTO orders (order_id, user_id, service_type, description, address, desired_price, expires_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?)''',
-            (order_id, user_id, service_type, description, address, desired_price, expires_at)
-        )
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute(
+                '''INSERT INTO orders (order_id, user_id, service_type, description, address, desired_price,
+                                      created_at, expires_at, latitude, longitude)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (order_id, user_id, service_type, description, address, desired_price,
+                 created_at, expires_at, latitude, longitude)
+            )
         return True
     
     def get_order(self, order_id):
         """Получение заказа по ID"""
-        self.cursor.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,))
-        order = self.cursor.fetchone()
-        if order:
-            return dict(order)
-        return None
-    
-    def get_orders_by_user(self, user_id):
-        """Получение заказов пользователя"""
-        self.cursor.execute(
-            "SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC",
-            (user_id,)
-        )
-        return [dict(row) for row in self.cursor.fetchall()]
+        return self._fetchone("SELECT * FROM orders WHERE order_id = ?", (order_id,))
+    
+    def get_orders_by_user(self, user_id, limit=None):
+        """Получение заказов пользователя (с количеством предложений offers_count)"""
+        query = "SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC"
+        params = [user_id]
+        
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        return self._fetchall(query, params)
     
     def get_active_orders(self, exclude_user_id=None):
         """Получение активных заказов"""
@@ -536,159 +1666,352 @@ class Database:
             FROM orders o
             LEFT JOIN users u ON o.user_id = u.user_id
             WHERE o.status = 'active' 
-            AND datetime(o.expires_at) > datetime('now')
+            AND o.expires_at > ?
         """
         
-        params = []
+        params = [int(time.time())]
         if exclude_user_id:
             query += " AND o.user_id != ?"
             params.append(exclude_user_id)
         
         query += " ORDER BY o.created_at DESC"
         
-        self.cursor.execute(query, params)
-        return [dict(row) for row in self.cursor.fetchall()]
+        return self._fetchall(query, params)
+    
+    def expire_orders(self, now=None, chunk_size=500):
+        """
+        Перевод просроченных активных заказов в статус 'expired'.
+        
+        Обновляет пачками по chunk_size строк, отпуская блокировку записи
+        между пачками, чтобы не задерживать запросы пользователей.
+        Возвращает количество просроченных заказов.
+        """
+        now = int(time.time()) if now is None else now
+        total = 0
+        
+        while True:
+            with self.pool.writer() as conn:
+                cursor = conn.execute('''
+                    UPDATE orders SET status = 'expired'
+                    WHERE rowid IN (
+                        SELECT rowid FROM orders
+                        WHERE status = 'active' AND expires_at <= ?
+                        LIMIT ?
+                    )
+                ''', (now, chunk_size))
+            
+            total += cursor.rowcount
+            if cursor.rowcount < chunk_size:
+                return total
     
     def update_order_status(self, order_id, status):
         """Обновление статуса заказа"""
-        self.cursor.execute(
-            "UPDATE orders SET status = ? WHERE order_id = ?",
-            (status, order_id)
-        )
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE orders SET status = ? WHERE order_id = ?",
+                (status, order_id)
+            )
         return True
     
     def select_executor_for_order(self, order_id, executor_id):
         """Выбор исполнителя для заказа"""
-        self.cursor.execute(
-            "UPDATE orders SET selected_executor_id = ?, status = 'in_progress' WHERE order_id = ?",
-            (executor_id, order_id)
-        )
-        
-        self.cursor.execute(
-            "UPDATE offers SET is_selected = 1 WHERE order_id = ? AND executor_id = ?",
-            (order_id, executor_id)
-        )
-        
-        self.conn.commit()
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE orders SET selected_executor_id = ?, status = 'in_progress' WHERE order_id = ?",
+                (executor_id, order_id)
+            )
+            
+            conn.execute(
+                "UPDATE offers SET is_selected = 1 WHERE order_id = ? AND executor_id = ?",
+                (order_id, executor_id)
+            )
         return True
     
     # ===== ПРЕДЛОЖЕНИЯ =====
     
     def create_offer(self, order_id, executor_id, price, comment=""):
-        """Создание предложения от исполнителя"""
-        self.cursor.execute(
-            "SELECT * FROM offers WHERE order_id = ? AND executor_id = ?",
-            (order_id, executor_id)
-        )
-        existing = self.cursor.fetchone()
+        """
+        Создание предложения от исполнителя (повторное - обновляет цену)
         
-        if existing:
-            self.cursor.execute(
-                "UPDATE offers SET price = ?, comment = ? WHERE order_id = ? AND executor_id = ?",
-                (price, comment, order_id, executor_id)
-            )
-        else:
-            self.cursor.execute(
-                "INSERT INTO offers (order_id, executor_id, price, comment) VALUES (?, ?, ?, ?)",
-                (order_id, executor_id, price, comment)
-            )
+        Один запрос по уникальному индексу (order_id, executor_id):
+        одновременные отправки не создают дублей.
         
-        self.conn.commit()
-        return True
+        Returns:
+            id предложения
+        """
+        with self.pool.writer() as conn:
+            return conn.execute('''
+                INSERT INTO offers (order_id, executor_id, price, comment)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (order_id, executor_id) DO UPDATE SET
+                    price = excluded.price,
+                    comment = excluded.comment
+                RETURNING id
+            ''', (order_id, executor_id, price, comment)).fetchone()[0]
     
     def get_offers_for_order(self, order_id):
         """Получение предложений по заказу"""
-        self.cursor.execute('''
+        return self._fetchall('''
             SELECT o.*, u.username, u.full_name, u.rating
             FROM offers o
             LEFT JOIN users u ON o.executor_id = u.user_id
             WHERE o.order_id = ?
             ORDER BY o.price ASC
         ''', (order_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
     
     def get_offers_by_executor(self, executor_id):
         """Получение предложений исполнителя"""
-        self.cursor.execute('''
+        return self._fetchall('''
             SELECT o.*, ord.service_type, ord.description, ord.status
             FROM offers o
             LEFT JOIN orders ord ON o.order_id = ord.order_id
             WHERE o.executor_id = ?
             ORDER BY o.created_at DESC
         ''', (executor_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
     
     def get_order_offers_count(self, order_id):
         """Количество предложений по заказу"""
-        self.cursor.execute(
-            "SELECT COUNT(*) as count FROM offers WHERE order_id = ?",
+        result = self._fetchone(
+            "SELECT offers_count FROM orders WHERE order_id = ?",
             (order_id,)
         )
-        result = self.cursor.fetchone()
-        return result['count'] if result else 0
+        return result['offers_count'] if result else 0
+    
+    @staticmethod
+    def _rebuild_offer_counters(conn):
+        """Пересчет orders.offers_count; возвращает число исправленных заказов"""
+        return conn.execute('''
+            UPDATE orders
+            SET offers_count = (SELECT COUNT(*) FROM offers WHERE offers.order_id = orders.order_id)
+            WHERE offers_count != (SELECT COUNT(*) FROM offers WHERE offers.order_id = orders.order_id)
+        ''').rowcount
+    
+    def rebuild_offer_counters(self):
+        """Сверка счетчиков предложений с таблицей offers (python run.py reconcile counters)"""
+        with self.pool.writer() as conn:
+            return self._rebuild_offer_counters(conn)
+    
+    @staticmethod
+    def _rebuild_user_ratings(conn):
+        """Пересчет rating_sum/rating_count/rating по reviews; возвращает число исправленных"""
+        return conn.execute('''
+            UPDATE users
+            SET rating_sum = totals.rating_sum,
+                rating_count = totals.rating_count,
+                rating = CASE WHEN totals.rating_count > 0
+                              THEN ROUND(totals.rating_sum * 1.0 / totals.rating_count, 2)
+                              ELSE users.rating END
+            FROM (
+                SELECT u.user_id, COALESCE(SUM(r.rating), 0) AS rating_sum, COUNT(r.id) AS rating_count
+                FROM users u
+                LEFT JOIN reviews r ON r.to_user_id = u.user_id
+                GROUP BY u.user_id
+            ) AS totals
+            WHERE users.user_id = totals.user_id
+              AND (users.rating_sum != totals.rating_sum
+                   OR users.rating_count != totals.rating_count
+                   OR (totals.rating_count > 0
+                       AND users.rating IS NOT ROUND(totals.rating_sum * 1.0 / totals.rating_count, 2)))
+        ''').rowcount
+    
+    def rebuild_user_ratings(self):
+        """Сверка рейтингов с таблицей reviews (python run.py reconcile ratings)"""
+        with self.pool.writer() as conn:
+            fixed = self._rebuild_user_ratings(conn)
+        if fixed:
+            self.users_cache.clear()
+            self.profiles_cache.clear()
+        return fixed
     
     # ===== ОТЗЫВЫ =====
     
     def add_review(self, order_id, from_user_id, to_user_id, rating, comment):
-        """Добавление отзыва"""
-        self.cursor.execute(
-            '''INSERT INTO reviews (order_id, from_user_id, to_user_id, rating, comment)
-               VALUES (?, ?, ?, ?, ?)''',
-            (order_id, from_user_id, to_user_id, rating, comment)
-        )
-        self.conn.commit()
+        """Добавление отзыва и пересчет рейтинга получателя в одной транзакции"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                '''INSERT INTO reviews (order_id, from_user_id, to_user_id, rating, comment)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (order_id, from_user_id, to_user_id, rating, comment)
+            )
+            # В SET справа старые значения колонок
+            conn.execute('''
+                UPDATE users
+                SET rating_sum = rating_sum + ?,
+                    rating_count = rating_count + 1,
+                    rating = ROUND((rating_sum + ?) * 1.0 / (rating_count + 1), 2)
+                WHERE user_id = ?
+            ''', (rating, rating, to_user_id))
         
-        self.update_user_rating(to_user_id, rating)
+        self._invalidate_user(to_user_id)
         return True
     
     def get_user_reviews(self, user_id):
         """Получение отзывов о пользователе"""
-        self.cursor.execute(
+        return self._fetchall(
             "SELECT * FROM reviews WHERE to_user_id = ? ORDER BY created_at DESC",
             (user_id,)
         )
-        return [dict(row) for row in self.cursor.fetchall()]
+    
+    # ===== ОЧЕРЕДЬ ПОВТОРНЫХ УВЕДОМЛЕНИЙ =====
+    
+    def add_notification_retries(self, notifications):
+        """
+        Сохранить уведомления для повторной отправки
+        
+        Args:
+            notifications: Кортежи (chat_id, text, reply_markup, attempts, next_attempt_at)
+        """
+        with self.pool.writer() as conn:
+            conn.executemany('''
+                INSERT INTO notification_retries (chat_id, text, reply_markup, attempts, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', notifications)
+    
+    def take_due_notification_retries(self, now=None, limit=100):
+        """Забрать (и удалить из таблицы) уведомления, время повтора которых наступило"""
+        now = int(time.time()) if now is None else now
+        
+        with self.pool.writer() as conn:
+            rows = conn.execute('''
+                DELETE FROM notification_retries
+                WHERE id IN (
+                    SELECT id FROM notification_retries
+                    WHERE next_attempt_at <= ?
+                    ORDER BY next_attempt_at
+                    LIMIT ?
+                )
+                RETURNING chat_id, text, reply_markup, attempts, next_attempt_at
+            ''', (now, limit)).fetchall()
+        
+        return sorted((dict(row) for row in rows), key=lambda row: row['next_attempt_at'])
     
     # ===== СТАТИСТИКА =====
     
     def get_user_stats(self, user_id):
-        """Получение статистики пользователя"""
+        """Получение статистики пользователя (одна строка из user_stats)"""
         user = self.get_user(user_id)
         if not user:
             return None
         
-        stats = {
+        counters = self._fetchone('''
+            SELECT orders_count, offers_count, completed_orders FROM user_stats WHERE user_id = ?
+        ''', (user_id,)) or {'orders_count': 0, 'offers_count': 0, 'completed_orders': 0}
+        
+        return {
             'user': user,
-            'orders_count': 0,
-            'offers_count': 0,
-            'completed_orders': 0,
+            **counters,
             'average_rating': user.get('rating', 0)
         }
+    
+    @staticmethod
+    def _rebuild_user_stats(conn):
+        """Пересчет user_stats по orders и offers; возвращает число исправленных строк"""
+        fixed = conn.execute('''
+            INSERT INTO user_stats (user_id, orders_count, completed_orders, offers_count)
+            SELECT user_id, SUM(is_order), SUM(is_completed), SUM(is_offer)
+            FROM (
+                SELECT user_id, 1 AS is_order, status = 'completed' AS is_completed, 0 AS is_offer
+                FROM orders WHERE user_id IS NOT NULL
+                UNION ALL
+                SELECT executor_id, 0, 0, 1 FROM offers WHERE executor_id IS NOT NULL
+            )
+            GROUP BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET
+                orders_count = excluded.orders_count,
+                completed_orders = excluded.completed_orders,
+                offers_count = excluded.offers_count
+            WHERE orders_count != excluded.orders_count
+               OR completed_orders != excluded.completed_orders
+               OR offers_count != excluded.offers_count
+        ''').rowcount
         
-        self.cursor.execute(
-            "SELECT COUNT(*) as count FROM orders WHERE user_id = ?",
-            (user_id,)
-        )
-        stats['orders_count'] = self.cursor.fetchone()['count']
+        # Пользователи, у которых не осталось ни заказов, ни предложений.
+        # NOT EXISTS, а не NOT IN: один NULL в подзапросе NOT IN не дал бы удалить ничего
+        fixed += conn.execute('''
+            DELETE FROM user_stats
+            WHERE NOT EXISTS (SELECT 1 FROM orders o WHERE o.user_id = user_stats.user_id)
+              AND NOT EXISTS (SELECT 1 FROM offers f WHERE f.executor_id = user_stats.user_id)
+        ''').rowcount
+        return fixed
+    
+    def rebuild_user_stats(self):
+        """Сверка user_stats с orders и offers (python run.py reconcile stats)"""
+        with self.pool.writer() as conn:
+            return self._rebuild_user_stats(conn)
+    
+    def get_system_status(self):
+        """Сводка по БД для команды /status"""
+        with self.pool.reader() as conn:
+            tables_count = conn.execute(
+                "SELECT COUNT(*) as count FROM sqlite_master WHERE type='table'"
+            ).fetchone()['count']
+            users_count = conn.execute("SELECT COUNT(*) as count FROM users").fetchone()['count']
+            executors_count = conn.execute(
+                "SELECT COUNT(*) as count FROM executor_profiles"
+            ).fetchone()['count']
         
-        self.cursor.execute(
-            "SELECT COUNT(*) as count FROM offers WHERE executor_id = ?",
-            (user_id,)
+        return {
+            'tables_count': tables_count,
+            'users_count': users_count,
+            'executors_count': executors_count
+        }
+    
+    def close(self):
+        """Закрытие соединений"""
+        self.pool.close()
+
+
+class AsyncDatabase:
+    """
+    Асинхронный фасад над Database.
+    
+    Повторяет методы Database, но выполняет их в отдельном ограниченном
+    пуле потоков, чтобы SQL и commit() не блокировали event loop:
+    
+        user = await async_db.get_user(user_id)
+    """
+    
+    # Функции без обращения к БД (расчеты и данные в памяти) вызываем напрямую
+    _SYNC_METHODS = {
+        'haversine_distance', 'match_executors', 'get_cache_stats',
+        'get_categories', 'get_category_by_code', 'feed_cursor',
+    }
+    
+    def __init__(self, database, max_workers=1):
+        self._db = database
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="db"
         )
-        stats['offers_count'] = self.cursor.fetchone()['count']
+    
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if not callable(attr) or name in self._SYNC_METHODS:
+            return attr
         
-        self.cursor.execute(
-            "SELECT COUNT(*) as count FROM orders WHERE user_id = ? AND status = 'completed'",
-            (user_id,)
-        )
-        stats['completed_orders'] = self.cursor.fetchone()['count']
+        @wraps(attr)
+        async def method(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(attr, *args, **kwargs))
         
-        return stats
+        # Кэшируем обертку, чтобы не создавать ее на каждый вызов
+        setattr(self, name, method)
+        return method
     
     def close(self):
-        """Закрытие соединения"""
-        self.conn.close()
+        """Дождаться завершения запросов и закрыть соединение"""
+        self._executor.shutdown(wait=True)
+        self._db.close()
+
 
 # Глобальный экземпляр БД
-db = Database()
\ No newline at end of file
+db = Database(
+    DB_PATH,
+    readers=DB_READERS,
+    pragma_profile=DB_PRAGMA_PROFILE,
+    cache_size=USER_CACHE_SIZE,
+    cache_ttl=USER_CACHE_TTL
+)
+
+# Асинхронный доступ для обработчиков бота
+async_db = AsyncDatabase(db, max_workers=DB_WORKERS)
\ No newline at end of file
@@ -0,0 +1,103 @@
+# geo.py
+"""
+Геометрия для подбора заказов по расстоянию
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy есть в requirements.txt; без него работает медленный цикл на Python
+    np = None
+
+# Пакетный расчет через numpy (False - запасной цикл, см. предупреждение в main.py)
+HAS_NUMPY = np is not None
+
+EARTH_RADIUS_KM = 6371.0
+# Длина одного градуса широты (км)
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Рассчитывает расстояние между двумя точками на Земле (в км)"""
+    lat1_rad = math.radians(lat1)
+    lon1_rad = math.radians(lon1)
+    lat2_rad = math.radians(lat2)
+    lon2_rad = math.radians(lon2)
+    
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+    
+    a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    
+    return EARTH_RADIUS_KM * c
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Прямоугольник (min_lat, max_lat, min_lon, max_lon), содержащий круг радиуса radius_km.
+    
+    Используется как грубый фильтр по индексу перед точным расчетом haversine.
+    Рядом с полюсами и линией перемены дат долгота не ограничивается.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+    
+    # Градус долготы короче на широте, самой далекой от экватора
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 0:
+        return min_lat, max_lat, -180.0, 180.0
+    
+    delta_lon = delta_lat / cos_lat
+    if longitude - delta_lon < -180.0 or longitude + delta_lon > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    
+    return min_lat, max_lat, longitude - delta_lon, longitude + delta_lon
+
+
+# ===== ПАКЕТНЫЙ РАСЧЕТ =====
+
+def haversine_matrix(lats1, lons1, lats2, lons2):
+    """
+    Матрица расстояний (км) между двумя наборами точек.
+    
+    Args:
+        lats1, lons1: Координаты первого набора (N точек), например исполнителей
+        lats2, lons2: Координаты второго набора (M точек), например заказов
+    
+    Returns:
+        Матрица N x M: numpy.ndarray, а без numpy - список списков
+    """
+    if np is None:
+        return [
+            [haversine_distance(lat1, lon1, lat2, lon2) for lat2, lon2 in zip(lats2, lons2)]
+            for lat1, lon1 in zip(lats1, lons1)
+        ]
+    
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, np.newaxis]
+    lon1 = np.radians(np.asarray(lons1, dtype=np.float64))[:, np.newaxis]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[np.newaxis, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=np.float64))[np.newaxis, :]
+    
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    # arcsin(sqrt(a)) равен atan2(sqrt(a), sqrt(1 - a)); clip защищает от a > 1 из-за округления
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def radius_mask(lats1, lons1, radii_km, lats2, lons2):
+    """
+    Маска N x M: точка j второго набора находится в радиусе radii_km[i] от точки i первого.
+    
+    Типичный случай: исполнители (координаты и work_radius_km) против заказов.
+    """
+    distances = haversine_matrix(lats1, lons1, lats2, lons2)
+    
+    if np is None:
+        return [
+            [distance <= radius for distance in row]
+            for row, radius in zip(distances, radii_km)
+        ]
+    
+    return distances <= np.asarray(radii_km, dtype=np.float64)[:, np.newaxis]
@@ -1,12 +1,14 @@
 # handlers/commands.py
 
 from aiogram import Router, F
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 import os
+import time
 
-from database import db
+from database import async_db as db
+from write_behind import location_writer
 from keyboards import main_menu, cancel_keyboard
 from states import ExecutorRegistrationStates
 
@@ -22,11 +24,8 @@ async def cmd_start(message: Message, state: FSMContext):
     # Очищаем состояние на всякий случай
     await state.clear()
     
-    # Добавляем/обновляем пользователя
-    db.add_user(user_id, username, full_name)
-    
-    # Получаем информацию о пользователе
-    user_info = db.get_user(user_id)
+    # Добавляем/обновляем пользователя (без записи, если имя не менялось)
+    user_info = await db.add_user(user_id, username, full_name)
     role = user_info['role'] if user_info else 'customer'
     
     await message.answer(
@@ -53,6 +52,7 @@ async def cmd_help(message: Message):
         
         "<b>🛠️ ДЛЯ ИСПОЛНИТЕЛЕЙ:</b>\n"
         "• 📋 Доступные заказы - поиск работы\n"
+        "• 🔎 Поиск заказов - по словам из описания и адреса\n"
         "• ⚙️ Мой профиль - управление профилем\n"
         "• 🚛 Моя техника - управление техникой\n"
         "• 💼 Мои предложения - ваши предложения\n"
@@ -90,7 +90,7 @@ async def cmd_help(message: Message):
 async def cmd_profile(message: Message):
     """Обработчик команды /profile"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info:
         await message.answer("❌ Вы не зарегистрированы. Используйте /start")
@@ -114,14 +114,14 @@ async def cmd_profile(message: Message):
 async def cmd_executor(message: Message):
     """Стать исполнителем"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info:
         await message.answer("❌ Вы не зарегистрированы. Используйте /start")
         return
     
     # Меняем роль на исполнителя
-    db.update_user_role(user_id, 'executor')
+    await db.update_user_role(user_id, 'executor')
     
     await message.answer(
         "✅ Теперь вы исполнитель!\n\n"
@@ -137,14 +137,14 @@ async def cmd_executor(message: Message):
 async def cmd_customer(message: Message):
     """Стать заказчиком"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info:
         await message.answer("❌ Вы не зарегистрированы. Используйте /start")
         return
     
     # Меняем роль на заказчика
-    db.update_user_role(user_id, 'customer')
+    await db.update_user_role(user_id, 'customer')
     
     await message.answer(
         "✅ Теперь вы заказчик!\n\n"
@@ -157,17 +157,17 @@ async def cmd_customer(message: Message):
 async def cmd_register(message: Message):
     """Быстрая регистрация исполнителя (альтернатива через команду)"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info:
         await message.answer("❌ Вы не зарегистрированы. Используйте /start")
         return
     
     # Меняем роль на исполнителя
-    db.update_user_role(user_id, 'executor')
+    await db.update_user_role(user_id, 'executor')
     
     # Создаем профиль исполнителя
-    db.create_executor_profile(user_id)
+    await db.create_executor_profile(user_id)
     
     await message.answer(
         "👷 БЫСТРАЯ РЕГИСТРАЦИЯ ИСПОЛНИТЕЛЯ\n\n"
@@ -186,7 +186,7 @@ async def cmd_register(message: Message):
 async def cmd_fill_profile(message: Message, state: FSMContext):
     """Прямой переход к заполнению профиля исполнителя"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info:
         await message.answer("❌ Вы не зарегистрированы. Используйте /start")
@@ -201,7 +201,7 @@ async def cmd_fill_profile(message: Message, state: FSMContext):
         return
     
     # Проверяем, заполнен ли уже профиль
-    executor_profile = db.get_executor_profile(user_id)
+    executor_profile = await db.get_executor_profile(user_id)
     
     if executor_profile and executor_profile.get('company_name'):
         await message.answer(
@@ -228,7 +228,7 @@ async def cmd_fill_profile(message: Message, state: FSMContext):
 async def cmd_status(message: Message):
     """Проверить статус системы"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info:
         status_text = "❌ Вы не зарегистрированы"
@@ -237,17 +237,10 @@ async def cmd_status(message: Message):
         
         # Проверяем базу данных
         try:
-            db.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = db.cursor.fetchall()
-            table_count = len(tables)
-            
-            # Проверяем таблицу users
-            db.cursor.execute("SELECT COUNT(*) as count FROM users")
-            users_count = db.cursor.fetchone()['count']
-            
-            # Проверяем таблицу executor_profiles
-            db.cursor.execute("SELECT COUNT(*) as count FROM executor_profiles")
-            executors_count = db.cursor.fetchone()['count']
+            system_status = await db.get_system_status()
+            table_count = system_status['tables_count']
+            users_count = system_status['users_count']
+            executors_count = system_status['executors_count']
             
             status_text = (
                 f"📊 <b>СТАТУС СИСТЕМЫ</b>\n\n"
@@ -274,14 +267,14 @@ async def cmd_status(message: Message):
 async def cmd_debug_profile(message: Message):
     """Отладочная информация о профиле"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info:
         await message.answer("❌ Вы не зарегистрированы. Используйте /start")
         return
     
     # Получаем данные профиля
-    executor_profile = db.get_executor_profile(user_id)
+    executor_profile = await db.get_executor_profile(user_id)
     
     debug_text = (
         f"🔍 <b>ОТЛАДКА ПРОФИЛЯ</b>\n\n"
@@ -354,14 +347,14 @@ async def cmd_recreate_db(message: Message):
         "Бот автоматически создаст новые таблицы при запуске.",
         parse_mode="HTML"
     )
-    from database import db
-from keyboards import main_menu
+
+
 
 @router.callback_query(F.data == "main_menu")
 async def cmd_main_menu_callback(callback: CallbackQuery):
     """Обработчик кнопки 'В главное меню'"""
     user_id = callback.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     role = user_info['role'] if user_info else 'customer'
     
@@ -376,4 +369,17 @@ async def cmd_main_menu_callback(callback: CallbackQuery):
             reply_markup=main_menu(role)
         )
     
-    await callback.answer()
\ No newline at end of file
+    await callback.answer()
+
+
+# ========== LIVE-ГЕОЛОКАЦИЯ ==========
+
+@router.edited_message(F.location)
+async def live_location_update(message: Message):
+    """Обновление трансляции геопозиции (пишется в БД пачками, см. write_behind.py)"""
+    location_writer.put(
+        message.from_user.id,
+        message.location.latitude,
+        message.location.longitude,
+        int(time.time())
+    )
@@ -1,27 +1,36 @@
 # handlers/customer.py
 
-from aiogram import Router, F, Bot
-from aiogram.types import Message, CallbackQuery
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 
-from database import db
-from keyboards import main_menu, services_keyboard
+from database import async_db as db
+from keyboards import main_menu, services_keyboard, location_keyboard, cancel_keyboard
 from states import OrderStates
-from config import SERVICES, BOT_TOKEN, ADMIN_ID
-from utils import generate_order_id
+from config import SERVICES, ADMIN_ID
+from utils import generate_order_id, format_datetime
+from notifications import notifier
 
 # Создаем роутер для заказчиков
 router = Router()
 
-# Создаем экземпляр бота для отправки уведомлений
-bot = Bot(token=BOT_TOKEN)
+# Сколько последних заказов показывать в "📋 Мои заказы"
+MY_ORDERS_LIMIT = 10
+
+ORDER_STATUS_LABELS = {
+    'active': '🟢 Активен',
+    'in_progress': '🚚 В работе',
+    'completed': '✅ Завершен',
+    'cancelled': '❌ Отменен',
+    'expired': '⌛ Истек',
+}
 
 # ========== ОБРАБОТКА КНОПОК ГЛАВНОГО МЕНЮ (заказчик) ==========
 
 @router.message(F.text == "📦 Создать заказ")
 async def create_order_start(message: Message, state: FSMContext):
     """Начало создания заказа"""
-    user_info = db.get_user(message.from_user.id)
+    user_info = await db.get_user(message.from_user.id)
     if user_info and user_info['role'] == 'executor':
         await message.answer("❌ Вы исполнитель. Перейдите в заказчики для создания заказов.")
         return
@@ -36,7 +45,7 @@ async def create_order_start(message: Message, state: FSMContext):
 async def become_executor(message: Message, state: FSMContext):
     """Стать исполнителем"""
     user_id = message.from_user.id
-    db.update_user_role(user_id, 'executor')
+    await db.update_user_role(user_id, 'executor')
     
     await message.answer(
         "✅ Вы теперь исполнитель!\n\n"
@@ -45,6 +54,26 @@ async def become_executor(message: Message, state: FSMContext):
         reply_markup=main_menu('executor')
     )
 
+@router.message(F.text == "📋 Мои заказы")
+async def show_my_orders(message: Message):
+    """Последние заказы пользователя с количеством предложений"""
+    orders = await db.get_orders_by_user(message.from_user.id, limit=MY_ORDERS_LIMIT)
+    
+    if not orders:
+        await message.answer("📭 У вас пока нет заказов.\n\nНажмите '📦 Создать заказ', чтобы разместить первый.")
+        return
+    
+    text = "📋 ВАШИ ЗАКАЗЫ:\n"
+    for order in orders:
+        text += (
+            f"\n📦 #{order['order_id']} - {SERVICES.get(order['service_type'], order['service_type'])}\n"
+            f"   {ORDER_STATUS_LABELS.get(order['status'], order['status'])} | "
+            f"💬 Предложений: {order['offers_count']} | "
+            f"📅 {format_datetime(order['created_at'])}\n"
+        )
+    
+    await message.answer(text)
+
 @router.message(F.text == "👤 Профиль")
 async def show_profile_button(message: Message):
     """Показать профиль (переадресация на команду)"""
@@ -86,19 +115,49 @@ async def process_description(message: Message, state: FSMContext):
     await state.update_data(description=message.text)
     await state.set_state(OrderStates.enter_address)
     
-    await message.answer("📍 Теперь укажите АДРЕС:")
+    await message.answer(
+        "📍 Теперь укажите АДРЕС или отправьте геопозицию.\n\n"
+        "С геопозицией заказ увидят исполнители поблизости.",
+        reply_markup=location_keyboard()
+    )
 
 @router.message(OrderStates.enter_address)
 async def process_address(message: Message, state: FSMContext):
-    """Обработка адреса"""
-    await state.update_data(address=message.text)
+    """Обработка адреса (текст или геопозиция)"""
+    if message.location:
+        latitude = message.location.latitude
+        longitude = message.location.longitude
+        await state.update_data(
+            address=f"Координаты: {latitude:.5f}, {longitude:.5f}",
+            latitude=latitude,
+            longitude=longitude
+        )
+    elif message.text == "❌ Отмена":
+        await cancel_action(message, state)
+        return
+    elif message.text == "📝 Ввести вручную":
+        await message.answer("📝 Напишите адрес одним сообщением:")
+        return
+    elif message.text:
+        await state.update_data(address=message.text)
+    else:
+        await message.answer("❌ Укажите адрес текстом или отправьте геопозицию")
+        return
+    
     await state.set_state(OrderStates.enter_price)
     
-    await message.answer("💰 Укажите ЖЕЛАЕМУЮ ЦЕНУ:\n\nНапишите сумму в рублях или 0 если цена договорная.")
+    await message.answer(
+        "💰 Укажите ЖЕЛАЕМУЮ ЦЕНУ:\n\nНапишите сумму в рублях или 0 если цена договорная.",
+        reply_markup=cancel_keyboard()
+    )
 
 @router.message(OrderStates.enter_price)
 async def process_price(message: Message, state: FSMContext):
     """Обработка цены заказа"""
+    if message.text == "❌ Отмена":
+        await cancel_action(message, state)
+        return
+    
     try:
         price = int(message.text)
         if price < 0:
@@ -118,7 +177,10 @@ async def process_price(message: Message, state: FSMContext):
     order_id = generate_order_id()
     desired_price = price if price > 0 else None
     
-    success = db.create_order(order_id, message.from_user.id, service, description, address, desired_price)
+    success = await db.create_order(
+        order_id, message.from_user.id, service, description, address, desired_price,
+        latitude=data.get('latitude'), longitude=data.get('longitude')
+    )
     
     if success:
         response = f"""
@@ -137,14 +199,18 @@ async def process_price(message: Message, state: FSMContext):
         
         # Уведомление админу
         if ADMIN_ID:
-            try:
-                admin_msg = f"🆕 НОВЫЙ ЗАКАЗ #{order_id}\nОт: @{message.from_user.username or 'без username'}\nУслуга: {SERVICES.get(service, service)}"
-                await bot.send_message(ADMIN_ID, admin_msg)
-            except:
-                pass
+            admin_msg = f"🆕 НОВЫЙ ЗАКАЗ #{order_id}\nОт: @{message.from_user.username or 'без username'}\nУслуга: {SERVICES.get(service, service)}"
+            notifier.enqueue(ADMIN_ID, admin_msg)
+        
+        # Уведомление подходящим исполнителям
+        executor_ids = db.match_executors(
+            service, desired_price, data.get('latitude'), data.get('longitude'),
+            exclude_user_id=message.from_user.id
+        )
+        notify_executors_about_order(executor_ids, order_id, service, address, desired_price)
         
         # Получаем роль пользователя для меню
-        user_info = db.get_user(message.from_user.id)
+        user_info = await db.get_user(message.from_user.id)
         role = user_info.get('role', 'customer') if user_info else 'customer'
         
         await message.answer("Главное меню:", reply_markup=main_menu(role))
@@ -154,6 +220,21 @@ async def process_price(message: Message, state: FSMContext):
     # Очищаем состояние
     await state.clear()
 
+def notify_executors_about_order(executor_ids, order_id, service, address, desired_price):
+    """Рассылка нового заказа исполнителям, которым он подходит (через очередь)"""
+    text = (
+        f"🔔 НОВЫЙ ЗАКАЗ #{order_id}\n\n"
+        f"📋 Услуга: {SERVICES.get(service, service)}\n"
+        f"📍 Адрес: {address[:50]}\n"
+        f"💰 Цена: {f'{desired_price} ₽' if desired_price else 'Договорная'}"
+    )
+    markup = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="💰 Предложить цену", callback_data=f"make_offer_{order_id}")
+    ]])
+    
+    for executor_id in executor_ids:
+        notifier.enqueue(executor_id, text, reply_markup=markup)
+
 # ========== ОБРАБОТКА ОТМЕНЫ ==========
 
 @router.message(F.text == "❌ Отмена")
@@ -161,7 +242,7 @@ async def cancel_action(message: Message, state: FSMContext):
     """Отмена текущего действия"""
     await state.clear()
     
-    user_info = db.get_user(message.from_user.id)
+    user_info = await db.get_user(message.from_user.id)
     role = user_info.get('role', 'customer') if user_info else 'customer'
     
     await message.answer(
@@ -7,7 +7,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 import json
 import re
 
-from database import db
+from database import async_db as db
 from keyboards import (
     main_menu,
     equipment_types_keyboard,
@@ -31,10 +31,10 @@ router = Router()
 async def back_to_profile_handler(callback: CallbackQuery):
     """Обработчик кнопки 'Назад к профилю'"""
     user_id = callback.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if user_info and user_info['role'] == 'executor':
-        executor_profile = db.get_executor_profile(user_id)
+        executor_profile = await db.get_executor_profile(user_id)
         has_full_profile = bool(executor_profile and executor_profile.get('company_name'))
         
         await callback.message.answer(
@@ -57,7 +57,7 @@ async def back_to_profile_handler(callback: CallbackQuery):
 async def start_add_equipment(callback: CallbackQuery, state: FSMContext):
     """Начало добавления новой техники"""
     user_id = callback.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if not user_info or user_info['role'] != 'executor':
         await callback.answer("❌ Вы не исполнитель", show_alert=True)
@@ -469,7 +469,7 @@ async def confirm_save_equipment(callback: CallbackQuery, state: FSMContext):
         equipment_data['model'] = ''
     
     # Сохраняем в БД
-    success = db.add_equipment(data['executor_id'], equipment_data)
+    success = await db.add_equipment(data['executor_id'], equipment_data)
     
     if success:
         await callback.message.answer(
@@ -505,7 +505,7 @@ async def edit_equipment_again(callback: CallbackQuery, state: FSMContext):
 async def cancel_equipment_add(message: Message, state: FSMContext):
     """Отмена добавления техники"""
     await state.clear()
-    user_info = db.get_user(message.from_user.id)
+    user_info = await db.get_user(message.from_user.id)
     role = user_info.get('role', 'customer') if user_info else 'customer'
     
     await message.answer(
@@ -519,7 +519,7 @@ async def cancel_equipment_add(message: Message, state: FSMContext):
 async def manage_equipment_list(callback: CallbackQuery):
     """Показать список техники для управления"""
     user_id = callback.from_user.id
-    equipment = db.get_executor_equipment(user_id)
+    equipment = await db.get_executor_equipment(user_id)
     
     if not equipment:
         await callback.message.answer("🚛 У вас нет техники для управления.")
@@ -549,7 +549,7 @@ async def manage_equipment_list(callback: CallbackQuery):
 async def view_equipment_details(callback: CallbackQuery):
     """Просмотр деталей техники"""
     equipment_id = int(callback.data.replace("eq_view_", ""))
-    equipment = db.get_equipment(equipment_id)
+    equipment = await db.get_equipment(equipment_id)
     
     if not equipment:
         await callback.answer("❌ Техника не найдена", show_alert=True)
@@ -612,7 +612,7 @@ async def view_equipment_details(callback: CallbackQuery):
 async def delete_equipment_start(callback: CallbackQuery):
     """Начало удаления техники"""
     equipment_id = int(callback.data.replace("eq_delete_", ""))
-    equipment = db.get_equipment(equipment_id)
+    equipment = await db.get_equipment(equipment_id)
     
     if not equipment:
         await callback.answer("❌ Техника не найдена", show_alert=True)
@@ -642,14 +642,14 @@ async def delete_equipment_start(callback: CallbackQuery):
 async def confirm_delete_equipment(callback: CallbackQuery):
     """Подтверждение удаления техники"""
     equipment_id = int(callback.data.replace("confirm_delete_", ""))
-    equipment = db.get_equipment(equipment_id)
+    equipment = await db.get_equipment(equipment_id)
     
     if not equipment:
         await callback.answer("❌ Техника не найдена", show_alert=True)
         return
     
     # Удаляем из БД
-    success = db.delete_equipment(equipment_id)
+    success = await db.delete_equipment(equipment_id)
     
     if success:
         await callback.message.answer(
@@ -672,7 +672,7 @@ async def disable_equipment(callback: CallbackQuery):
     """Сделать технику недоступной"""
     equipment_id = int(callback.data.replace("eq_disable_", ""))
     
-    success = db.toggle_equipment_availability(equipment_id, False)
+    success = await db.toggle_equipment_availability(equipment_id, False)
     
     if success:
         await callback.answer("🔴 Техника теперь недоступна", show_alert=True)
@@ -686,7 +686,7 @@ async def enable_equipment(callback: CallbackQuery):
     """Сделать технику доступной"""
     equipment_id = int(callback.data.replace("eq_enable_", ""))
     
-    success = db.toggle_equipment_availability(equipment_id, True)
+    success = await db.toggle_equipment_availability(equipment_id, True)
     
     if success:
         await callback.answer("🟢 Техника теперь доступна", show_alert=True)
@@ -723,7 +723,7 @@ async def edit_equipment_start(callback: CallbackQuery):
 async def back_to_equipment_menu(callback: CallbackQuery):
     """Вернуться к меню техники"""
     user_id = callback.from_user.id
-    equipment = db.get_executor_equipment(user_id)
+    equipment = await db.get_executor_equipment(user_id)
     
     if not equipment:
         builder = InlineKeyboardBuilder()
@@ -1,14 +1,13 @@
 # handlers/executor.py
 
 from aiogram import Router, F
+from aiogram.dispatcher.event.bases import SkipHandler
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from functools import wraps
-from aiogram import Bot
-from config import BOT_TOKEN
 
-from database import db
+from database import async_db as db
 from keyboards import (
     main_menu, 
     executor_profile_keyboard,
@@ -19,7 +18,10 @@ from keyboards import (
     skip_keyboard,
     executor_registration_steps,
     services_keyboard,
-    executor_categories_keyboard
+    executor_categories_keyboard,
+    order_navigation_keyboard,
+    search_results_keyboard,
+    MENU_BUTTONS
 )
 from states import (
     ExecutorRegistrationStates, 
@@ -27,15 +29,13 @@ from states import (
     ProfileEditSimpleStates,
     OfferStates
 )
-from utils import validate_phone
+from utils import validate_phone, format_datetime
+from notifications import notifier
 from aiogram.filters import Command
 
 # Создаем роутер для исполнителей
 router = Router()
 
-# Инициализация бота
-bot = Bot(token=BOT_TOKEN)
-
 # ========== ДЕКОРАТОР ДЛЯ ПРОВЕРКИ ИСПОЛНИТЕЛЯ ==========
 
 def executor_required(func):
@@ -60,7 +60,7 @@ def executor_required(func):
             return await func(*args, **kwargs)
         
         user_id = message_or_callback.from_user.id
-        user_info = db.get_user(user_id)
+        user_info = await db.get_user(user_id)
         
         if not user_info:
             if isinstance(message_or_callback, CallbackQuery):
@@ -85,9 +85,9 @@ def executor_required(func):
         # Проверяем наличие профиля, если нужно
         if func.__name__ in ['show_filter_settings', 'filter_service_handler', 
                            'filter_price_handler', 'filter_distance_handler']:
-            executor_profile = db.get_executor_profile(user_id)
+            executor_profile = await db.get_executor_profile(user_id)
             if not executor_profile:
-                db.create_executor_profile(user_id)
+                await db.create_executor_profile(user_id)
         
         return await func(*args, **kwargs)
     
@@ -102,7 +102,7 @@ async def start_executor_registration(callback: CallbackQuery, state: FSMContext
     user_id = callback.from_user.id
     
     # Проверяем, не заполнен ли уже профиль
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     if profile and profile.get('company_name'):
         await callback.message.answer(
             "✅ У вас уже заполнен профиль исполнителя!\n"
@@ -143,6 +143,11 @@ async def cancel_registration(message: Message, state: FSMContext):
                 "❌ Создание заказа отменено.",
                 reply_markup=main_menu('customer')
             )
+        elif "OrderFilterStates" in str(current_state):
+            await message.answer(
+                "❌ Поиск отменен.",
+                reply_markup=main_menu('executor')
+            )
         elif "EquipmentRegistrationStates" in str(current_state):
             await message.answer(
                 "❌ Добавление техники отменено.",
@@ -449,23 +454,19 @@ async def finish_executor_registration(message: Message, state: FSMContext):
     # Объединяем все данные
     all_profile_data = {**profile_data, **location_data}
     
-    # Сохраняем в БД (безопасный метод)
-    if all_profile_data:
-        success = db.update_executor_profile(user_id, **all_profile_data)
-        if not success:
-            print(f"⚠️ Ошибка обновления профиля для user_id={user_id}")
-    
-    # Также сохраняем геолокацию в отдельную таблицу
-    if 'latitude' in data and 'longitude' in data:
-        db.update_user_location(
-            user_id=user_id,
-            latitude=data.get('latitude'),
-            longitude=data.get('longitude'),
-            address=data.get('location_text')
-        )
+    # Сохраняем профиль и геолокацию (в отдельную таблицу) одной транзакцией
+    success = await db.complete_executor_registration(
+        user_id,
+        all_profile_data,
+        latitude=data.get('latitude'),
+        longitude=data.get('longitude'),
+        address=data.get('location_text')
+    )
+    if not success:
+        print(f"⚠️ Ошибка обновления профиля для user_id={user_id}")
     
     # Получаем обновленный профиль
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     if not profile:
         await message.answer(
@@ -503,7 +504,7 @@ async def finish_executor_registration(message: Message, state: FSMContext):
 async def view_executor_profile(callback: CallbackQuery):
     """Просмотр профиля исполнителя"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     if not profile:
         await callback.answer("❌ Профиль не найден")
@@ -532,14 +533,21 @@ async def view_executor_profile(callback: CallbackQuery):
 
 # ========== ОБРАБОТКА КНОПОК ГЛАВНОГО МЕНЮ (исполнитель) ==========
 
+@router.message(OrderFilterStates.enter_search_query, F.text.in_(MENU_BUTTONS))
+async def leave_search_on_menu(message: Message, state: FSMContext):
+    """Кнопка меню вместо запроса: выходим из поиска, кнопку обрабатывает ее обработчик"""
+    await state.set_state(None)
+    raise SkipHandler()
+
+
 @router.message(F.text == "⚙️ Мой профиль")
 async def show_executor_profile(message: Message):
     """Показать профиль исполнителя"""
     user_id = message.from_user.id
-    user_info = db.get_user(user_id)
+    user_info = await db.get_user(user_id)
     
     if user_info and user_info['role'] == 'executor':
-        executor_profile = db.get_executor_profile(user_id)
+        executor_profile = await db.get_executor_profile(user_id)
         has_profile = bool(executor_profile and executor_profile.get('company_name'))
         
         await message.answer(
@@ -556,7 +564,7 @@ async def show_equipment_menu(message: Message):
     """Меню управления техникой - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
     user_id = message.from_user.id
     
-    equipment = db.get_executor_equipment(user_id)
+    equipment = await db.get_executor_equipment(user_id)
     
     if not equipment:
         # Используем InlineKeyboardBuilder для inline-кнопок
@@ -609,12 +617,12 @@ async def show_filter_settings(message: Message):
     user_id = message.from_user.id
     
     # Получаем текущие настройки профиля
-    executor_profile = db.get_executor_profile(user_id)
+    executor_profile = await db.get_executor_profile(user_id)
     
     # Если профиль не найден, создаем его
     if not executor_profile:
-        db.create_executor_profile(user_id)
-        executor_profile = db.get_executor_profile(user_id)
+        await db.create_executor_profile(user_id)
+        executor_profile = await db.get_executor_profile(user_id)
         
         if not executor_profile:
             await message.answer("❌ Ошибка создания профиля. Попробуйте /register")
@@ -674,7 +682,7 @@ async def show_filter_settings(message: Message):
 async def show_my_offers(message: Message):
     """Показать предложения исполнителя"""
     user_id = message.from_user.id
-    offers = db.get_offers_by_executor(user_id)
+    offers = await db.get_offers_by_executor(user_id)
     
     if not offers:
         await message.answer("📭 У вас пока нет предложений.")
@@ -682,7 +690,7 @@ async def show_my_offers(message: Message):
     
     text = "💼 ВАШИ ПРЕДЛОЖЕНИЯ:\n\n"
     for offer in offers[:5]:
-        order = db.get_order(offer['order_id'])
+        order = await db.get_order(offer['order_id'])
         if order:
             text += f"📦 Заказ #{offer['order_id'][:8]}...\n"
             text += f"   Цена: {offer['price']} ₽\n"
@@ -692,6 +700,25 @@ async def show_my_offers(message: Message):
     await message.answer(text)
 
 
+@router.message(F.text == "📦 Вернуться в заказчики")
+async def back_to_customer(message: Message):
+    """Вернуться в режим заказчика"""
+    user_id = message.from_user.id
+    await db.update_user_role(user_id, 'customer')
+    
+    await message.answer(
+        "✅ Вы вернулись в режим заказчика!",
+        reply_markup=main_menu('customer')
+    )
+
+
+@router.message(F.text == "ℹ️ Помощь")
+async def show_help_button(message: Message):
+    """Показать помощь (переадресация на команду)"""
+    from handlers.commands import cmd_help
+    await cmd_help(message)
+
+
 # ========== ПРОСМОТР ДОСТУПНЫХ ЗАКАЗОВ ==========
 
 @router.message(F.text == "📋 Доступные заказы")
@@ -700,8 +727,8 @@ async def show_available_orders(message: Message, state: FSMContext):
     """Показать доступные заказы для исполнителя"""
     user_id = message.from_user.id
     
-    # Получаем отфильтрованные заказы
-    orders = db.get_filtered_orders_for_executor(user_id)
+    # Первый заказ ленты и признак следующего
+    orders = await db.get_orders_feed_page(user_id, limit=2)
     
     if not orders:
         await message.answer(
@@ -714,30 +741,57 @@ async def show_available_orders(message: Message, state: FSMContext):
         )
         return
     
-    # Сохраняем заказы в состояние для навигации
-    await state.update_data(available_orders=orders, current_order_index=0)
+    # В состоянии храним только курсор текущего заказа и номер позиции
+    order = orders[0]
+    await state.update_data(feed_cursor=db.feed_cursor(order), feed_position=1)
     
-    # Показываем первый заказ
-    await show_order_details(message, state, 0)
+    text, markup = render_order_card(order, position=1, has_next=len(orders) > 1)
+    await message.answer(text, reply_markup=markup)
 
 
-async def show_order_details(message: Message, state: FSMContext, order_index: int):
-    """Показать детали конкретного заказа"""
+@router.callback_query(F.data.in_({"order_nav_next", "order_nav_prev"}))
+@executor_required
+async def navigate_orders(callback: CallbackQuery, state: FSMContext):
+    """Листание ленты заказов (keyset-курсор в состоянии)"""
     data = await state.get_data()
-    orders = data.get('available_orders', [])
+    cursor = data.get('feed_cursor')
+    position = data.get('feed_position', 1)
     
-    if not orders or order_index >= len(orders):
-        await message.answer("❌ Заказы не найдены")
-        await state.clear()
+    if not cursor:
+        await callback.answer("❌ Лента устарела, откройте '📋 Доступные заказы' снова", show_alert=True)
+        return
+    
+    user_id = callback.from_user.id
+    
+    if callback.data == "order_nav_next":
+        orders = await db.get_orders_feed_page(user_id, cursor=tuple(cursor), limit=2)
+        order = orders[0] if orders else None
+        position += 1
+        has_next = len(orders) > 1
+    else:
+        orders = await db.get_orders_feed_page(user_id, cursor=tuple(cursor), limit=1, backward=True)
+        order = orders[-1] if orders else None
+        position = max(position - 1, 1)
+        has_next = True
+    
+    if not order:
+        await callback.answer("📭 Больше заказов нет")
         return
     
-    order = orders[order_index]
+    await state.update_data(feed_cursor=db.feed_cursor(order), feed_position=position)
     
+    text, markup = render_order_card(order, position=position, has_next=has_next)
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+
+def render_order_card(order, position, has_next):
+    """Текст и кнопки карточки заказа в ленте"""
     # Формируем текст заказа
     text = f"""📦 ЗАКАЗ #{order['order_id']}
 
 📋 Услуга: {order['service_type']}
-📍 Адрес: {order.get('address', 'Не указан')}
+📍 Адрес: {order.get('address', 'Не указан')}{f" ({order['distance_km']} км от вас)" if order.get('distance_km') is not None else ''}
 👤 Заказчик: {order.get('full_name', 'Аноним')}
 
 📝 Описание:
@@ -750,72 +804,101 @@ async def show_order_details(message: Message, state: FSMContext, order_index: i
     else:
         text += "💰 Цена: Договорная\n\n"
     
-    text += f"📅 Создан: {order.get('created_at', '')[:10]}\n"
-    
-    # Количество предложений
-    offers_count = db.get_order_offers_count(order['order_id'])
-    if offers_count > 0:
-        text += f"📊 Предложений уже: {offers_count}\n"
-    
-    # Кнопки
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    builder = InlineKeyboardBuilder()
+    text += f"📅 Создан: {format_datetime(order.get('created_at'))}\n"
     
-    # Кнопка "Предложить цену"
-    builder.add(InlineKeyboardButton(
-        text="💰 Предложить цену",
-        callback_data=f"make_offer_{order['order_id']}"
-    ))
+    # Количество предложений (счетчик в строке заказа)
+    if order.get('offers_count'):
+        text += f"📊 Предложений уже: {order['offers_count']}\n"
     
-    # Навигация если больше 1 заказа
-    if len(orders) > 1:
-        nav_buttons = []
-        
-        if order_index > 0:
-            nav_buttons.append(InlineKeyboardButton(
-                text="◀️ Назад",
-                callback_data=f"order_nav_{order_index-1}"
-            ))
-        
-        nav_buttons.append(InlineKeyboardButton(
-            text=f"{order_index+1}/{len(orders)}",
-            callback_data="order_page"
-        ))
-        
-        if order_index < len(orders) - 1:
-            nav_buttons.append(InlineKeyboardButton(
-                text="Вперед ▶️",
-                callback_data=f"order_nav_{order_index+1}"
-            ))
-        
-        builder.row(*nav_buttons)
+    return text, order_navigation_keyboard(order['order_id'], position, has_next)
+
+
+# ========== ПОИСК ЗАКАЗОВ ==========
+
+SEARCH_PAGE_SIZE = 5
+
+
+@router.message(F.text == "🔎 Поиск заказов")
+@executor_required
+async def start_order_search(message: Message, state: FSMContext):
+    """Запрос строки поиска"""
+    await state.set_state(OrderFilterStates.enter_search_query)
+    await message.answer(
+        "🔎 ПОИСК ЗАКАЗОВ\n\n"
+        "Введите слова из описания или адреса, например:\n"
+        "<i>кран 25т Химки</i>\n\n"
+        "Учитываются ваши фильтры по услуге, цене и радиусу работы.",
+        parse_mode="HTML",
+        reply_markup=cancel_keyboard()
+    )
+
+
+@router.message(OrderFilterStates.enter_search_query, F.text, ~F.text.in_(MENU_BUTTONS))
+@executor_required
+async def process_search_query(message: Message, state: FSMContext):
+    """Первая страница результатов поиска"""
+    query = (message.text or "").strip()
+    orders, next_offset = await db.search_orders(query, executor_id=message.from_user.id, limit=SEARCH_PAGE_SIZE)
     
-    # Кнопка возврата
-    builder.row(InlineKeyboardButton(
-        text="⬅️ Назад в меню",
-        callback_data="back_to_main_menu"
-    ))
+    await state.set_state(None)
+    if not orders:
+        await message.answer(
+            f"📭 По запросу «{query}» ничего не найдено.\n\n"
+            "Попробуйте другие слова или расширьте фильтры.",
+            reply_markup=main_menu('executor')
+        )
+        return
     
-    await message.answer(text, reply_markup=builder.as_markup())
+    await state.update_data(search_query=query, search_offset=next_offset, search_shown=len(orders))
+    await message.answer(f"🔎 Результаты по запросу «{query}»:", reply_markup=main_menu('executor'))
+    await message.answer(
+        render_search_results(orders, start=1),
+        reply_markup=search_results_keyboard(orders, has_more=next_offset is not None, start=1)
+    )
 
 
-@router.message(F.text == "📦 Вернуться в заказчики")
-async def back_to_customer(message: Message):
-    """Вернуться в режим заказчика"""
-    user_id = message.from_user.id
-    db.update_user_role(user_id, 'customer')
+@router.callback_query(F.data == "search_more")
+@executor_required
+async def show_more_search_results(callback: CallbackQuery, state: FSMContext):
+    """Следующая страница результатов поиска (смещение в состоянии)"""
+    data = await state.get_data()
+    query, offset = data.get('search_query'), data.get('search_offset')
     
-    await message.answer(
-        "✅ Вы вернулись в режим заказчика!",
-        reply_markup=main_menu('customer')
+    if not query or offset is None:
+        await callback.answer("📭 Больше результатов нет")
+        return
+    
+    orders, next_offset = await db.search_orders(
+        query, executor_id=callback.from_user.id, limit=SEARCH_PAGE_SIZE, offset=offset
+    )
+    if not orders:
+        await state.update_data(search_offset=None)
+        await callback.answer("📭 Больше результатов нет")
+        return
+    
+    shown = data.get('search_shown', 0)
+    await state.update_data(search_offset=next_offset, search_shown=shown + len(orders))
+    
+    await callback.message.edit_text(
+        render_search_results(orders, start=shown + 1),
+        reply_markup=search_results_keyboard(orders, has_more=next_offset is not None, start=shown + 1)
     )
+    await callback.answer()
 
 
-@router.message(F.text == "ℹ️ Помощь")
-async def show_help_button(message: Message):
-    """Показать помощь (переадресация на команду)"""
-    from handlers.commands import cmd_help
-    await cmd_help(message)
+def render_search_results(orders, start):
+    """Краткий список найденных заказов (номера совпадают с кнопками)"""
+    lines = []
+    for number, order in enumerate(orders, start=start):
+        price = f"{order['desired_price']} ₽" if order.get('desired_price') else "Договорная"
+        distance = f" ({order['distance_km']} км)" if order.get('distance_km') is not None else ""
+        description = order.get('description') or 'Без описания'
+        lines.append(
+            f"{number}. 📋 {order['service_type']} | 💰 {price}\n"
+            f"📍 {order.get('address') or 'Не указан'}{distance}\n"
+            f"📝 {description[:100]}{'...' if len(description) > 100 else ''}"
+        )
+    return "\n\n".join(lines)
 
 
 # ========== ОБРАБОТКА ФИЛЬТРОВ ==========
@@ -880,12 +963,12 @@ async def select_service_filter(callback: CallbackQuery, state: FSMContext):
     # Сохраняем в профиле
     if service_code == "all":
         # Сбрасываем фильтр по услуге
-        db.update_executor_profile(user_id, service_filter=None)
+        await db.update_executor_profile(user_id, service_filter=None)
         service_name = "Все услуги"
     else:
         category = db.get_category_by_code(service_code)
         if category:
-            db.update_executor_profile(user_id, service_filter=service_code)
+            await db.update_executor_profile(user_id, service_filter=service_code)
             service_name = category['name']
         else:
             service_name = "Неизвестная услуга"
@@ -939,7 +1022,7 @@ async def process_price_filter(message: Message, state: FSMContext):
     
     if text == "0":
         # Сброс фильтра
-        db.update_executor_profile(user_id, min_price=None, max_price=None)
+        await db.update_executor_profile(user_id, min_price=None, max_price=None)
         await message.answer("✅ Фильтр по цене сброшен")
     else:
         try:
@@ -964,7 +1047,7 @@ async def process_price_filter(message: Message, state: FSMContext):
                         return
                     
                     # Сохраняем
-                    db.update_executor_profile(user_id, min_price=min_price, max_price=max_price)
+                    await db.update_executor_profile(user_id, min_price=min_price, max_price=max_price)
                     
                     min_text = f"{min_price}" if min_price else "любая"
                     max_text = f"{max_price}" if max_price else "любая"
@@ -989,10 +1072,10 @@ async def apply_filters(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # УБИРАЕМ ПРОВЕРКУ ГЕОЛОКАЦИИ - она больше не нужна!
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     # Получаем отфильтрованные заказы
-    orders = db.get_filtered_orders_for_executor(user_id)
+    orders = await db.get_filtered_orders_for_executor(user_id)
     
     await callback.message.answer(
         f"✅ Фильтры применены!\n\n"
@@ -1010,7 +1093,7 @@ async def reset_filters(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Сбрасываем только фильтры услуги и цены (радиус больше не сбрасываем)
-    db.update_executor_profile(user_id, 
+    await db.update_executor_profile(user_id, 
         service_filter=None,
         min_price=None,
         max_price=None
@@ -1041,7 +1124,7 @@ async def show_filter_settings_with_update(callback: CallbackQuery, state: FSMCo
     
     # Получаем текущие настройки профиля
     user_id = callback.from_user.id
-    executor_profile = db.get_executor_profile(user_id)
+    executor_profile = await db.get_executor_profile(user_id)
     
     if not executor_profile:
         await callback.answer("❌ Профиль не найден", show_alert=True)
@@ -1152,7 +1235,7 @@ async def executor_edit_menu_handler(callback: CallbackQuery):
 async def equipment_menu_handler(callback: CallbackQuery):
     """Меню управления техникой через inline-кнопку"""
     user_id = callback.from_user.id
-    equipment = db.get_executor_equipment(user_id)
+    equipment = await db.get_executor_equipment(user_id)
     
     if not equipment:
         builder = InlineKeyboardBuilder()
@@ -1205,7 +1288,7 @@ async def back_to_profile_handler(callback: CallbackQuery):
     
     # Показываем клавиатуру профиля
     from keyboards import executor_profile_keyboard
-    executor_profile = db.get_executor_profile(user_id)
+    executor_profile = await db.get_executor_profile(user_id)
     has_profile = bool(executor_profile and executor_profile.get('company_name'))
     
     try:
@@ -1229,7 +1312,7 @@ async def back_to_profile_handler(callback: CallbackQuery):
 async def edit_company_start(callback: CallbackQuery, state: FSMContext):
     """Начать редактирование названия компании"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_name = profile.get('company_name', 'Не указано')
     
@@ -1258,7 +1341,7 @@ async def edit_company_process(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Сохраняем в БД
-    db.update_executor_profile(user_id, company_name=new_name)
+    await db.update_executor_profile(user_id, company_name=new_name)
     
     await message.answer(
         f"✅ Название компании обновлено: <b>{new_name}</b>",
@@ -1274,7 +1357,7 @@ async def edit_company_process(message: Message, state: FSMContext):
 async def edit_phone_start(callback: CallbackQuery, state: FSMContext):
     """Начать редактирование телефона"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_phone = profile.get('phone', 'Не указан')
     
@@ -1307,7 +1390,7 @@ async def edit_phone_process(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Сохраняем в БД
-    db.update_executor_profile(user_id, phone=result)
+    await db.update_executor_profile(user_id, phone=result)
     
     await message.answer(
         f"✅ Телефон обновлен: <b>{result}</b>",
@@ -1323,7 +1406,7 @@ async def edit_phone_process(message: Message, state: FSMContext):
 async def edit_description_start(callback: CallbackQuery, state: FSMContext):
     """Начать редактирование описания услуг"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_desc = profile.get('description', 'Не указано')
     if len(current_desc) > 100:
@@ -1354,7 +1437,7 @@ async def edit_description_process(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Сохраняем в БД
-    db.update_executor_profile(user_id, description=description)
+    await db.update_executor_profile(user_id, description=description)
     
     await message.answer(
         "✅ Описание услуг обновлено!",
@@ -1369,7 +1452,7 @@ async def edit_description_process(message: Message, state: FSMContext):
 async def edit_experience_start(callback: CallbackQuery, state: FSMContext):
     """Начать редактирование опыта работы"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_exp = profile.get('experience_years', 0)
     
@@ -1407,7 +1490,7 @@ async def edit_experience_process(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Сохраняем в БД
-    db.update_executor_profile(user_id, experience_years=experience)
+    await db.update_executor_profile(user_id, experience_years=experience)
     
     await message.answer(
         f"✅ Опыт работы обновлен: <b>{experience} лет</b>",
@@ -1423,7 +1506,7 @@ async def edit_experience_process(message: Message, state: FSMContext):
 async def edit_pricing_start(callback: CallbackQuery, state: FSMContext):
     """Начать редактирование ценовой политики"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     min_price = profile.get('min_price', 1000)
     max_price = profile.get('max_price', 50000)
@@ -1457,7 +1540,7 @@ async def edit_pricing_process(message: Message, state: FSMContext):
     
     if text == "0":
         # Сброс фильтра
-        db.update_executor_profile(user_id, min_price=None, max_price=None)
+        await db.update_executor_profile(user_id, min_price=None, max_price=None)
         await message.answer("✅ Ценовая политика сброшена", reply_markup=back_to_profile_keyboard())
     else:
         try:
@@ -1482,7 +1565,7 @@ async def edit_pricing_process(message: Message, state: FSMContext):
                         return
                     
                     # Сохраняем
-                    db.update_executor_profile(user_id, min_price=min_price, max_price=max_price)
+                    await db.update_executor_profile(user_id, min_price=min_price, max_price=max_price)
                     
                     min_text = f"{min_price}" if min_price else "любая"
                     max_text = f"{max_price}" if max_price else "любая"
@@ -1513,13 +1596,13 @@ async def make_offer_start(callback: CallbackQuery, state: FSMContext):
     order_id = callback.data.replace("make_offer_", "")
     
     # Проверяем, существует ли заказ
-    order = db.get_order(order_id)
+    order = await db.get_order(order_id)
     if not order:
         await callback.answer("❌ Заказ не найден", show_alert=True)
         return
     
     # Проверяем, не предложил ли уже исполнитель
-    existing_offers = db.get_offers_for_order(order_id)
+    existing_offers = await db.get_offers_for_order(order_id)
     user_id = callback.from_user.id
     
     for offer in existing_offers:
@@ -1610,25 +1693,22 @@ async def process_offer_comment(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     # Сохраняем предложение в БД
-    success = db.create_offer(order_id, user_id, price, comment)
+    success = await db.create_offer(order_id, user_id, price, comment)
     
     if success:
         # Получаем информацию о заказе
-        order = db.get_order(order_id)
+        order = await db.get_order(order_id)
         if order:
             # Уведомляем заказчика (если это не он сам)
             if order['user_id'] != user_id:
-                try:
-                    await bot.send_message(
-                        order['user_id'],
-                        f"🎉 НОВОЕ ПРЕДЛОЖЕНИЕ!\n\n"
-                        f"📦 Заказ #{order_id}\n"
-                        f"💰 Цена: {price} ₽\n"
-                        f"👷 Исполнитель: {message.from_user.full_name}\n\n"
-                        f"Используйте '📋 Мои заказы' для просмотра всех предложений."
-                    )
-                except:
-                    pass  # Не удалось отправить уведомление
+                notifier.enqueue(
+                    order['user_id'],
+                    f"🎉 НОВОЕ ПРЕДЛОЖЕНИЕ!\n\n"
+                    f"📦 Заказ #{order_id}\n"
+                    f"💰 Цена: {price} ₽\n"
+                    f"👷 Исполнитель: {message.from_user.full_name}\n\n"
+                    f"Используйте '📋 Мои заказы' для просмотра всех предложений."
+                )
         
         await message.answer(
             f"✅ ПРЕДЛОЖЕНИЕ ОТПРАВЛЕНО!\n\n"
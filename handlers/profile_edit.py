@@ -5,7 +5,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from database import db
+from database import async_db as db
 from keyboards import (
     executor_profile_keyboard, 
     cancel_keyboard, 
@@ -23,7 +23,7 @@ router = Router()
 async def executor_edit_menu(callback: CallbackQuery):
     """Меню редактирования профиля"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     if not profile:
         await callback.answer("❌ Профиль не найден")
@@ -75,7 +75,7 @@ async def executor_edit_menu(callback: CallbackQuery):
 async def edit_company_name_start(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования названия компании"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_name = profile.get('company_name', 'Не указано')
     
@@ -104,7 +104,7 @@ async def process_edit_company_name(message: Message, state: FSMContext):
         )
         return
     
-    db.update_executor_profile(user_id, company_name=new_name)
+    await db.update_executor_profile(user_id, company_name=new_name)
     
     await message.answer(
         f"✅ Название компании обновлено: <b>{new_name}</b>",
@@ -121,7 +121,7 @@ async def process_edit_company_name(message: Message, state: FSMContext):
 async def edit_phone_start(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования телефона"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_phone = profile.get('phone', 'Не указан')
     
@@ -149,7 +149,7 @@ async def process_edit_phone(message: Message, state: FSMContext):
         await message.answer(result, reply_markup=cancel_keyboard())
         return
     
-    db.update_executor_profile(user_id, phone=result)
+    await db.update_executor_profile(user_id, phone=result)
     
     await message.answer(
         f"✅ Телефон обновлен: <b>{result}</b>",
@@ -166,7 +166,7 @@ async def process_edit_phone(message: Message, state: FSMContext):
 async def edit_description_start(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования описания услуг"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_description = profile.get('description', 'Не указано')
     if len(current_description) > 100:
@@ -202,7 +202,7 @@ async def process_edit_description(message: Message, state: FSMContext):
         )
         return
     
-    db.update_executor_profile(user_id, description=description)
+    await db.update_executor_profile(user_id, description=description)
     
     await message.answer(
         f"✅ Описание услуг обновлено!\n\n"
@@ -221,7 +221,7 @@ async def process_edit_description(message: Message, state: FSMContext):
 async def edit_experience_start(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования опыта работы"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     current_experience = profile.get('experience_years', 0)
     
@@ -265,7 +265,7 @@ async def process_edit_experience(message: Message, state: FSMContext):
         except:
             experience_years = 0
     
-    db.update_executor_profile(user_id, experience_years=experience_years)
+    await db.update_executor_profile(user_id, experience_years=experience_years)
     
     await message.answer(
         f"✅ Опыт работы обновлен: <b>{experience_years} лет</b>",
@@ -282,7 +282,7 @@ async def process_edit_experience(message: Message, state: FSMContext):
 async def edit_pricing_start(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования ценовой политики"""
     user_id = callback.from_user.id
-    profile = db.get_executor_profile(user_id)
+    profile = await db.get_executor_profile(user_id)
     
     min_price = profile.get('min_price', 1000)
     max_price = profile.get('max_price', 50000)
@@ -314,7 +314,7 @@ async def process_edit_pricing(message: Message, state: FSMContext):
     text = message.text.strip()
     
     if text == "0":
-        db.update_executor_profile(user_id, min_price=None, max_price=None)
+        await db.update_executor_profile(user_id, min_price=None, max_price=None)
         await message.answer(
             "✅ Ценовая политика сброшена",
             reply_markup=back_to_profile_keyboard()
@@ -340,7 +340,7 @@ async def process_edit_pricing(message: Message, state: FSMContext):
                         await message.answer("❌ Минимальная цена не может быть больше максимальной")
                         return
                     
-                    db.update_executor_profile(user_id, min_price=min_price, max_price=max_price)
+                    await db.update_executor_profile(user_id, min_price=min_price, max_price=max_price)
                     
                     min_text = f"{min_price}" if min_price else "любая"
                     max_text = f"{max_price}" if max_price else "любая"
@@ -7,27 +7,29 @@ from config import SERVICES
 
 # ========== REPLY КЛАВИАТУРЫ ==========
 
+CUSTOMER_MENU_BUTTONS = (
+    "📦 Создать заказ", "📋 Мои заказы", "👷 Стать исполнителем", "👤 Профиль", "ℹ️ Помощь",
+)
+EXECUTOR_MENU_BUTTONS = (
+    "📋 Доступные заказы", "🔎 Поиск заказов", "⚙️ Мой профиль", "🚛 Моя техника",
+    "💼 Мои предложения", "🔍 Настройки фильтров", "📦 Вернуться в заказчики", "ℹ️ Помощь",
+)
+# Кнопки главного меню обеих ролей: состояния ввода текста их не принимают
+MENU_BUTTONS = frozenset(CUSTOMER_MENU_BUTTONS + EXECUTOR_MENU_BUTTONS)
+
 def main_menu(role='customer'):
     """Главное меню в зависимости от роли"""
     builder = ReplyKeyboardBuilder()
     
     if role == 'customer':
-        builder.add(KeyboardButton(text="📦 Создать заказ"))
-        builder.add(KeyboardButton(text="📋 Мои заказы"))
-        builder.add(KeyboardButton(text="👷 Стать исполнителем"))
-        builder.add(KeyboardButton(text="👤 Профиль"))
-        builder.add(KeyboardButton(text="ℹ️ Помощь"))
+        for text in CUSTOMER_MENU_BUTTONS:
+            builder.add(KeyboardButton(text=text))
         builder.adjust(2, 2, 1)
         
     else:  # executor
-        builder.add(KeyboardButton(text="📋 Доступные заказы"))
-        builder.add(KeyboardButton(text="⚙️ Мой профиль"))
-        builder.add(KeyboardButton(text="🚛 Моя техника"))
-        builder.add(KeyboardButton(text="💼 Мои предложения"))
-        builder.add(KeyboardButton(text="🔍 Настройки фильтров"))
-        builder.add(KeyboardButton(text="📦 Вернуться в заказчики"))
-        builder.add(KeyboardButton(text="ℹ️ Помощь"))
-        builder.adjust(2, 2, 2, 1)
+        for text in EXECUTOR_MENU_BUTTONS:
+            builder.add(KeyboardButton(text=text))
+        builder.adjust(2, 2, 2, 2)
     
     return builder.as_markup(resize_keyboard=True)
 
@@ -422,8 +424,8 @@ def back_to_profile_keyboard():
     return builder.as_markup()
 
 
-def order_navigation_keyboard(order_index, total_orders, order_id):
-    """Клавиатура для навигации по заказам"""
+def order_navigation_keyboard(order_id, position, has_next):
+    """Клавиатура для навигации по ленте заказов (листание по курсору)"""
     builder = InlineKeyboardBuilder()
     
     # Кнопка предложения
@@ -433,24 +435,24 @@ def order_navigation_keyboard(order_index, total_orders, order_id):
     ))
     
     # Навигация
-    if total_orders > 1:
+    if position > 1 or has_next:
         nav_buttons = []
         
-        if order_index > 0:
+        if position > 1:
             nav_buttons.append(InlineKeyboardButton(
                 text="◀️ Назад",
-                callback_data=f"order_nav_{order_index-1}"
+                callback_data="order_nav_prev"
             ))
         
         nav_buttons.append(InlineKeyboardButton(
-            text=f"{order_index+1}/{total_orders}",
+            text=f"№{position}",
             callback_data="order_page_info"
         ))
         
-        if order_index < total_orders - 1:
+        if has_next:
             nav_buttons.append(InlineKeyboardButton(
                 text="Вперед ▶️",
-                callback_data=f"order_nav_{order_index+1}"
+                callback_data="order_nav_next"
             ))
         
         builder.row(*nav_buttons)
@@ -463,6 +465,31 @@ def order_navigation_keyboard(order_index, total_orders, order_id):
     return builder.as_markup()
 
 
+def search_results_keyboard(orders, has_more, start=1):
+    """Кнопки предложения цены для найденных заказов и загрузка следующих"""
+    builder = InlineKeyboardBuilder()
+    
+    for number, order in enumerate(orders, start=start):
+        builder.add(InlineKeyboardButton(
+            text=f"💰 №{number}",
+            callback_data=f"make_offer_{order['order_id']}"
+        ))
+    builder.adjust(5)
+    
+    if has_more:
+        builder.row(InlineKeyboardButton(
+            text="Еще результаты ▶️",
+            callback_data="search_more"
+        ))
+    
+    builder.row(InlineKeyboardButton(
+        text="⬅️ Назад в меню",
+        callback_data="back_to_main_menu"
+    ))
+    
+    return builder.as_markup()
+
+
 def equipment_subtype_keyboard(equipment_type):
     """Клавиатура для выбора подтипа техники"""
     builder = InlineKeyboardBuilder()
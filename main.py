@@ -7,9 +7,14 @@ from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
-from config import BOT_TOKEN, ADMIN_ID
-from database import db
+from config import BOT_TOKEN, ADMIN_ID, ORDER_SWEEP_INTERVAL, ORDER_SWEEP_CHUNK
+from bot_provider import get_bot, close_bot
+from database import async_db
 from handlers import commands, customer, executor, equipment
+from tasks import order_expiry_sweeper
+from notifications import notifier
+from write_behind import location_writer
+from geo import HAS_NUMPY
 
 # Настройка логирования
 logging.basicConfig(
@@ -43,7 +48,7 @@ async def main():
     """Основная функция запуска бота"""
     
     # Инициализация бота и диспетчера
-    bot = Bot(token=BOT_TOKEN)
+    bot = get_bot()
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
     
@@ -56,6 +61,13 @@ async def main():
     dp.include_router(customer.router)     # Затем заказчики
     dp.include_router(commands.router)     # И только потом общие команды
     
+    # Очередь уведомлений и фоновые задачи
+    notifier.start(bot, async_db)
+    location_writer.start(async_db)
+    background_tasks = [
+        asyncio.create_task(order_expiry_sweeper(async_db, ORDER_SWEEP_INTERVAL, ORDER_SWEEP_CHUNK)),
+    ]
+    
     # Приветственное сообщение
     print("=" * 60)
     print("🤖 БИРЖА ГРУЗОПЕРЕВОЗОК И СПЕЦТЕХНИКИ ЗАПУЩЕНА")
@@ -69,6 +81,10 @@ async def main():
     print("🔄 Бот работает...")
     print("=" * 60)
     
+    if not HAS_NUMPY:
+        logger.warning("⚠️ numpy не установлен: расстояния до заказов считаются циклом на Python "
+                       "(pip install -r requirements.txt)")
+    
     try:
         # Запуск бота в режиме long-polling
         await dp.start_polling(bot, skip_updates=True)
@@ -80,8 +96,18 @@ async def main():
         print(f"❌ Ошибка: {e}")
         print("🔄 Перезапустите бота вручную")
     finally:
-        await bot.session.close()
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await notifier.stop()
+        print("✅ Очередь уведомлений остановлена")
+        await location_writer.stop()
+        print("✅ Буфер геолокации записан")
+        
+        await close_bot()
         print("✅ Сессия бота закрыта")
+        async_db.close()
+        print("✅ Соединение с базой данных закрыто")
 
 if __name__ == "__main__":
     try:
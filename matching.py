@@ -0,0 +1,190 @@
+# matching.py
+"""
+Обратный подбор: какие исполнители подходят под новый заказ.
+
+Индекс держится в памяти и повторяет правила ленты
+Database.get_filtered_orders_for_executor (услуга, цена, радиус работы),
+чтобы при создании заказа сразу получить список исполнителей
+без запроса к БД.
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from geo import bounding_box, haversine_distance
+
+# Размер ячейки сетки в градусах (~28 км по широте)
+CELL_DEGREES = 0.25
+
+# Зона, перекрывающая больше ячеек (радиус от ~100 км), идет в общую
+# ячейку WIDE_AREA: таких исполнителей мало, и у кандидатов все равно
+# проверяется точное расстояние, а радиус 1000 км дал бы ~12 тыс. ячеек
+MAX_ENTRY_CELLS = 100
+WIDE_AREA = 'wide'
+
+# Ключ для исполнителей без фильтра по услуге
+ANY_SERVICE = '*'
+
+# Поля профиля, от которых зависит подбор
+MATCH_FIELDS = {'service_filter', 'min_price', 'max_price', 'latitude', 'longitude', 'work_radius_km'}
+
+# (строка, столбец) сетки, WIDE_AREA или None - исполнитель без координат
+Cell = Union[None, str, Tuple[int, int]]
+
+
+def cell_of(latitude, longitude):
+    """Ячейка сетки, в которую попадает точка"""
+    return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+
+@dataclass(frozen=True)
+class ExecutorEntry:
+    """Параметры исполнителя, нужные для подбора"""
+    user_id: int
+    service: str
+    min_price: Optional[int]
+    max_price: Optional[int]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    radius_km: Optional[float]
+
+    @property
+    def has_area(self):
+        """Задана ли зона работы (иначе исполнитель видит заказы везде)"""
+        return self.latitude is not None and self.longitude is not None and bool(self.radius_km)
+
+    def cells(self) -> List[Cell]:
+        """Ячейки сетки, которые перекрывает зона работы"""
+        if not self.has_area:
+            return [None]
+
+        min_lat, max_lat, min_lon, max_lon = bounding_box(self.latitude, self.longitude, self.radius_km)
+        min_row, min_col = cell_of(min_lat, min_lon)
+        max_row, max_col = cell_of(max_lat, max_lon)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > MAX_ENTRY_CELLS:
+            return [WIDE_AREA]
+        return [(row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+
+    def accepts_price(self, price):
+        """Цена заказа в интервале исполнителя (договорная подходит всем)"""
+        if price is None:
+            return True
+        if self.min_price and price < self.min_price:
+            return False
+        if self.max_price and price > self.max_price:
+            return False
+        return True
+
+    @classmethod
+    def from_profile(cls, profile):
+        service = profile.get('service_filter')
+        return cls(
+            user_id=profile['user_id'],
+            service=service if service and service != 'all' else ANY_SERVICE,
+            min_price=profile.get('min_price'),
+            max_price=profile.get('max_price'),
+            latitude=profile.get('latitude'),
+            longitude=profile.get('longitude'),
+            radius_km=profile.get('work_radius_km'),
+        )
+
+
+class ExecutorMatchIndex:
+    """
+    Индекс исполнителей: услуга -> ячейка сетки -> исполнители.
+
+    Исполнитель с зоной работы лежит во всех ячейках, которые она
+    перекрывает (широкая зона - в одной ячейке WIDE_AREA),
+    исполнитель без координат - в ячейке None.
+    Цена и точное расстояние проверяются у найденных кандидатов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, ExecutorEntry] = {}
+        self._cells: Dict[Tuple[str, Cell], Set[int]] = {}
+        self._services: Dict[str, Set[int]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, profiles):
+        """Полная пересборка индекса по профилям исполнителей"""
+        with self._lock:
+            self._entries.clear()
+            self._cells.clear()
+            self._services.clear()
+            for profile in profiles:
+                self._add(ExecutorEntry.from_profile(profile))
+
+    def put(self, profile):
+        """Добавить или обновить исполнителя"""
+        entry = ExecutorEntry.from_profile(profile)
+        with self._lock:
+            self._remove(entry.user_id)
+            self._add(entry)
+
+    def remove(self, user_id):
+        """Убрать исполнителя (например, сменил роль)"""
+        with self._lock:
+            self._remove(user_id)
+
+    def match(self, service_type, desired_price=None, latitude=None, longitude=None, exclude_user_id=None):
+        """
+        ID исполнителей, в ленту которых попадет заказ
+
+        Returns:
+            Список user_id, ближайшие исполнители первыми
+        """
+        services = (service_type, ANY_SERVICE)
+        located = latitude is not None and longitude is not None
+
+        with self._lock:
+            candidates = set()
+            for service in services:
+                if located:
+                    candidates.update(self._cells.get((service, cell_of(latitude, longitude)), ()))
+                    candidates.update(self._cells.get((service, WIDE_AREA), ()))
+                    candidates.update(self._cells.get((service, None), ()))
+                else:
+                    # Заказ без координат виден всем исполнителям с подходящей услугой
+                    candidates.update(self._services.get(service, ()))
+            entries = [self._entries[user_id] for user_id in candidates if user_id != exclude_user_id]
+
+        matched = []
+        for entry in entries:
+            if not entry.accepts_price(desired_price):
+                continue
+
+            distance = 0.0
+            if located and entry.has_area:
+                distance = haversine_distance(entry.latitude, entry.longitude, latitude, longitude)
+                if distance > entry.radius_km:
+                    continue
+            matched.append((distance, entry.user_id))
+
+        matched.sort()
+        return [user_id for _, user_id in matched]
+
+    # ===== ВНУТРЕННИЕ МЕТОДЫ (под блокировкой) =====
+
+    def _add(self, entry):
+        self._entries[entry.user_id] = entry
+        self._services.setdefault(entry.service, set()).add(entry.user_id)
+        for cell in entry.cells():
+            self._cells.setdefault((entry.service, cell), set()).add(entry.user_id)
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if not entry:
+            return
+
+        self._services[entry.service].discard(user_id)
+        for cell in entry.cells():
+            bucket = self._cells.get((entry.service, cell))
+            if bucket is not None:
+                bucket.discard(user_id)
+                if not bucket:
+                    del self._cells[(entry.service, cell)]
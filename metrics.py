@@ -0,0 +1,41 @@
+# metrics.py
+"""
+Простые метрики процесса: счетчики и текущие значения.
+
+Пишутся фоновыми задачами и компонентами БД, читаются через snapshot()
+(например, для логов или команды /status).
+"""
+
+import threading
+
+
+class Metrics:
+    """Потокобезопасный набор счетчиков (inc) и показателей (set)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+    
+    def inc(self, name, value=1):
+        """Увеличить счетчик"""
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+    
+    def set(self, name, value):
+        """Записать текущее значение показателя"""
+        with self._lock:
+            self._values[name] = value
+    
+    def get(self, name, default=0):
+        """Значение метрики"""
+        with self._lock:
+            return self._values.get(name, default)
+    
+    def snapshot(self):
+        """Копия всех метрик"""
+        with self._lock:
+            return dict(self._values)
+
+
+# Глобальный набор метрик
+metrics = Metrics()
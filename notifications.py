@@ -0,0 +1,286 @@
+# notifications.py
+"""
+Очередь исходящих уведомлений Telegram.
+
+Обработчики ставят сообщение в очередь (notifier.enqueue) и сразу
+отвечают пользователю. Воркеры отправляют сообщения с учетом лимитов
+Telegram: общий (~30 сообщений в секунду) и на один чат (~1 в секунду).
+Неудачные отправки сохраняются в таблицу notification_retries
+и повторяются позже, в том числе после перезапуска бота.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from aiogram.types import InlineKeyboardMarkup
+
+from config import NOTIFY_QUEUE_SIZE, NOTIFY_WORKERS, NOTIFY_RATE, NOTIFY_CHAT_INTERVAL, NOTIFY_MAX_ATTEMPTS
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    """Сообщение в очереди (reply_markup - JSON инлайн-клавиатуры)"""
+    chat_id: int
+    text: str
+    reply_markup: Optional[str] = None
+    attempts: int = 0
+
+
+class TokenBucket:
+    """Ограничитель скорости: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Дождаться свободного токена"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """
+    Ограниченная очередь уведомлений с пулом воркеров.
+
+    Жизненный цикл: start(bot, database) при запуске бота,
+    stop() при остановке (неотправленное сохраняется в БД).
+    """
+
+    def __init__(self, queue_size=10000, workers=4, rate=30, chat_interval=1.0,
+                 max_attempts=5, retry_delay=30, poll_interval=5):
+        self.queue_size = queue_size
+        self.rate = rate
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+
+        # Очередь и ограничитель создаются в start(), внутри работающего event loop
+        self._queue = None
+        self._bucket = None
+        self._bot = None
+        self._database = None
+        self._tasks = []
+        self._pending_saves = set()
+        # Уведомления, отправка которых прервана остановкой воркера
+        self._interrupted = []
+        # Время (monotonic), раньше которого нельзя писать в чат / в API вообще
+        self._chat_ready_at = {}
+        self._paused_until = 0.0
+
+    # ===== ПУБЛИЧНЫЙ ИНТЕРФЕЙС =====
+
+    def enqueue(self, chat_id, text, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        """
+        Поставить уведомление в очередь (не ждет отправки)
+
+        Returns:
+            False, если очередь переполнена и уведомление отложено в БД
+        """
+        markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup else None
+        notification = Notification(chat_id, text, markup)
+
+        if self._queue is None:
+            logger.error(f"❌ Очередь уведомлений не запущена, сообщение для {chat_id} потеряно")
+            return False
+
+        try:
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            metrics.inc('notifications_overflow_total')
+            self._save_later(notification, delay=0)
+            return False
+
+        metrics.set('notifications_queue_depth', self._queue.qsize())
+        return True
+
+    def start(self, bot, database):
+        """Запуск воркеров и опроса таблицы повторов"""
+        self._bot = bot
+        self._database = database
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._bucket = TokenBucket(self.rate)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._poll_retries()))
+
+    async def stop(self):
+        """Остановить воркеры и сохранить неотправленные уведомления"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+
+        # start() не вызывался - сохранять нечего
+        if self._queue is None:
+            return
+
+        left, self._interrupted = self._interrupted, []
+        while not self._queue.empty():
+            left.append(self._queue.get_nowait())
+
+        if left and self._database:
+            now = int(time.time())
+            await self._database.add_notification_retries(
+                [(n.chat_id, n.text, n.reply_markup, n.attempts, now) for n in left]
+            )
+            logger.info(f"💾 Отложено неотправленных уведомлений: {len(left)}")
+
+    # ===== ОТПРАВКА =====
+
+    async def _worker(self):
+        while True:
+            notification = await self._queue.get()
+            try:
+                await self._deliver(notification)
+            except asyncio.CancelledError:
+                # Остановка во время отправки: сохраним вместе с очередью в stop().
+                # Если запрос уже ушел в Telegram, сообщение придет дважды - это лучше потери
+                self._interrupted.append(notification)
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка отправки уведомления в {notification.chat_id}: {e}")
+            finally:
+                self._queue.task_done()
+                metrics.set('notifications_queue_depth', self._queue.qsize())
+
+    async def _deliver(self, notification):
+        await self._wait_for_slot(notification.chat_id)
+        await self._bucket.acquire()
+
+        markup = None
+        if notification.reply_markup:
+            markup = InlineKeyboardMarkup.model_validate_json(notification.reply_markup)
+
+        try:
+            await self._bot.send_message(notification.chat_id, notification.text, reply_markup=markup)
+            metrics.inc('notifications_sent_total')
+        except TelegramRetryAfter as e:
+            # Флуд-контроль: приостанавливаем все воркеры, сообщение повторим позже
+            logger.warning(f"⏳ Telegram просит подождать {e.retry_after} с")
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            await self._retry(notification, delay=e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован или чат не найден - повтор не поможет
+            metrics.inc('notifications_dropped_total')
+            logger.info(f"🚫 Уведомление для {notification.chat_id} не доставлено: {e}")
+        except TelegramAPIError as e:
+            logger.warning(f"⚠️ Ошибка Telegram для {notification.chat_id}: {e}")
+            await self._retry(notification, delay=self.retry_delay * 2 ** notification.attempts)
+
+    async def _wait_for_slot(self, chat_id):
+        """Пауза после RetryAfter и интервал между сообщениями в один чат"""
+        now = time.monotonic()
+        ready_at = max(self._paused_until, self._chat_ready_at.get(chat_id, 0.0))
+        self._chat_ready_at[chat_id] = max(ready_at, now) + self.chat_interval
+
+        if ready_at > now:
+            await asyncio.sleep(ready_at - now)
+
+        # Не даем словарю расти бесконечно
+        if len(self._chat_ready_at) > 10000:
+            now = time.monotonic()
+            self._chat_ready_at = {
+                chat: ready for chat, ready in self._chat_ready_at.items() if ready > now
+            }
+
+    # ===== ПОВТОРЫ =====
+
+    async def _retry(self, notification, delay):
+        """Отложить уведомление в БД (или отбросить после max_attempts попыток)"""
+        notification.attempts += 1
+        if notification.attempts >= self.max_attempts:
+            metrics.inc('notifications_dropped_total')
+            logger.error(f"❌ Уведомление для {notification.chat_id} отброшено после {notification.attempts} попыток")
+            return
+
+        metrics.inc('notifications_retried_total')
+        await self._save(notification, delay)
+
+    async def _save(self, notification, delay):
+        await self._database.add_notification_retries([(
+            notification.chat_id, notification.text, notification.reply_markup,
+            notification.attempts, int(time.time() + delay)
+        )])
+
+    def _save_later(self, notification, delay):
+        """Сохранение в БД из синхронного enqueue"""
+        if not self._database:
+            logger.error(f"❌ Очередь уведомлений переполнена, сообщение для {notification.chat_id} потеряно")
+            return
+
+        task = asyncio.get_running_loop().create_task(self._save(notification, delay))
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+
+    async def _poll_retries(self):
+        """Возвращать в очередь уведомления, время повтора которых наступило"""
+        while True:
+            requeue = asyncio.ensure_future(self._requeue_due_retries())
+            try:
+                await asyncio.shield(requeue)
+            except asyncio.CancelledError:
+                # Строки уже удаляются из таблицы - дожидаемся, пока они попадут
+                # в очередь, откуда stop() сохранит их обратно
+                await asyncio.gather(requeue, return_exceptions=True)
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка чтения отложенных уведомлений: {e}")
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def _requeue_due_retries(self):
+        free = self._queue.maxsize - self._queue.qsize()
+        if free <= 0:
+            return
+
+        rows = await self._database.take_due_notification_retries(limit=min(free, 100))
+        overflow = []
+        for row in rows:
+            try:
+                self._queue.put_nowait(Notification(
+                    row['chat_id'], row['text'], row['reply_markup'], row['attempts']
+                ))
+            except asyncio.QueueFull:
+                overflow.append(tuple(row.values()))
+        # Пока ждали БД, очередь заполнилась - возвращаем остаток в таблицу
+        if overflow:
+            await self._database.add_notification_retries(overflow)
+
+
+# Глобальный диспетчер уведомлений (запускается в main.py)
+notifier = NotificationDispatcher(
+    queue_size=NOTIFY_QUEUE_SIZE,
+    workers=NOTIFY_WORKERS,
+    rate=NOTIFY_RATE,
+    chat_interval=NOTIFY_CHAT_INTERVAL,
+    max_attempts=NOTIFY_MAX_ATTEMPTS,
+)
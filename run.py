@@ -7,6 +7,9 @@
   python run.py migrate   - миграции БД
   python run.py shell     - интерактивная оболочка
   python run.py check     - проверка конфигурации
+  python run.py reconcile counters - пересчет счетчиков предложений
+  python run.py reconcile ratings  - пересчет рейтингов по отзывам
+  python run.py reconcile stats    - пересчет статистики пользователей
 """
 
 import asyncio
@@ -38,6 +41,7 @@ def print_banner():
       migrate   - Создать/обновить БД
       shell     - Интерактивная оболочка
       check     - Проверка конфигурации
+      reconcile - Пересчет денормализованных счетчиков
     
     """
     print(banner)
@@ -132,6 +136,50 @@ def check_config():
     
     from app.shared.config import config
     config.validate()
+    asyncio.run(check_database_pragmas())
+
+async def check_database_pragmas():
+    """Вывод активных настроек SQLite (PRAGMA)"""
+    from app.shared.config import config
+    if "sqlite" not in config.DATABASE_URL:
+        return
+    
+    try:
+        from app.infrastructure.database.database_manager import DatabaseManager
+        manager = DatabaseManager()
+        pragmas = await manager.get_pragmas()
+        await manager.close()
+    except Exception as e:
+        print(f"❌ Не удалось прочитать настройки SQLite: {e}")
+        return
+    
+    print(f"\n⚙️  НАСТРОЙКИ SQLITE (профиль: {config.DATABASE_PRAGMA_PROFILE}):")
+    for name, value in pragmas.items():
+        print(f"   {name}: {value}")
+
+# Денормализованные данные: цель -> (метод database.Database, описание)
+RECONCILE_TARGETS = {
+    "counters": ("rebuild_offer_counters", "Счетчики предложений (orders.offers_count)"),
+    "ratings": ("rebuild_user_ratings", "Рейтинги пользователей (users.rating_sum/rating_count)"),
+    "stats": ("rebuild_user_stats", "Статистика пользователей (user_stats)"),
+}
+
+def reconcile(target=None):
+    """Сверка и пересчет денормализованных счетчиков в БД бота"""
+    targets = [target] if target else list(RECONCILE_TARGETS)
+    unknown = [name for name in targets if name not in RECONCILE_TARGETS]
+    if unknown:
+        print(f"❌ Неизвестная цель: {', '.join(unknown)}. Доступно: {', '.join(RECONCILE_TARGETS)}")
+        sys.exit(1)
+    
+    from database import db
+    try:
+        for name in targets:
+            method_name, description = RECONCILE_TARGETS[name]
+            fixed = getattr(db, method_name)()
+            print(f"✅ {description}: исправлено записей - {fixed}")
+    finally:
+        db.close()
 
 def main():
     """Основная функция CLI"""
@@ -149,6 +197,8 @@ def main():
         asyncio.run(interactive_shell())
     elif command == "check":
         check_config()
+    elif command == "reconcile":
+        reconcile(sys.argv[2].lower() if len(sys.argv) > 2 else None)
     else:
         print(f"❌ Неизвестная команда: {command}")
         print(__doc__)
@@ -0,0 +1,102 @@
+# scripts/bench_commits.py
+"""
+Число commit и время на действие пользователя: отдельные вызовы
+методов Database (каждый со своим commit) против общей транзакции.
+
+Действия:
+  роль  - смена роли на исполнителя (users + пустой профиль)
+  анкета - завершение регистрации (профиль + геолокация)
+
+Запуск: python scripts/bench_commits.py [--users 300] [--profile safe]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DB_PATH", ":memory:")
+
+from database import Database
+
+PROFILE = {'company_name': "ООО Кран", 'phone': "+79990000000", 'work_radius_km': 30}
+
+
+def role_separately(db, user_id):
+    """Как раньше: UPDATE users и создание профиля - два commit"""
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE users SET role = 'executor' WHERE user_id = ?", (user_id,))
+    db.create_executor_profile(user_id)
+
+
+def role_in_transaction(db, user_id):
+    db.update_user_role(user_id, 'executor')
+
+
+def registration_separately(db, user_id):
+    """Как раньше: профиль и геолокация - два commit"""
+    db.update_executor_profile(user_id, **PROFILE)
+    db.update_user_location(user_id, 55.75, 37.62, "Москва")
+
+
+def registration_in_transaction(db, user_id):
+    db.complete_executor_registration(user_id, PROFILE, 55.75, 37.62, "Москва")
+
+
+def measure(db, action, user_ids):
+    """Среднее число COMMIT и миллисекунд на одно действие"""
+    statements = []
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(statements.append)
+
+    started = time.perf_counter()
+    for user_id in user_ids:
+        action(db, user_id)
+    seconds = time.perf_counter() - started
+
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(None)
+
+    commits = sum(1 for statement in statements if statement.strip().upper() == "COMMIT")
+    return commits / len(user_ids), seconds * 1000 / len(user_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк commit на действие пользователя")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--profile", default="safe", help="профиль PRAGMA (safe - fsync на каждый commit)")
+    args = parser.parse_args()
+
+    cases = [
+        ("Роль", role_separately, role_in_transaction),
+        ("Анкета", registration_separately, registration_in_transaction),
+    ]
+
+    print("=" * 60)
+    print(f"💾 COMMIT НА ДЕЙСТВИЕ: {args.users:,} пользователей, профиль {args.profile}")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), pragma_profile=args.profile)
+        before_ids = range(1, args.users + 1)
+        after_ids = range(args.users + 1, 2 * args.users + 1)
+        for user_id in [*before_ids, *after_ids]:
+            db.add_user(user_id, f"user{user_id}", f"Пользователь {user_id}")
+
+        for title, separately, in_transaction in cases:
+            before_commits, before_ms = measure(db, separately, before_ids)
+            after_commits, after_ms = measure(db, in_transaction, after_ids)
+            print(f"{title}:")
+            print(f"  📝 Отдельные вызовы: {before_commits:>4.1f} commit, {before_ms:>7.2f} мс")
+            print(f"  ✅ Одна транзакция:  {after_commits:>4.1f} commit, {after_ms:>7.2f} мс")
+
+        db.close()
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# scripts/bench_fts.py
+"""
+Сравнение поиска заказов по словам из описания и адреса:
+LIKE '%слово%' по таблице orders против индекса FTS5 (Database.search_orders).
+
+БД создается через Database, поэтому orders_fts заполняется
+боевыми триггерами. Построение на 1 млн заказов занимает несколько минут.
+
+Запуск: python scripts/bench_fts.py [--orders 1000000] [--queries 100] [--active 0.3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DB_PATH", ":memory:")
+
+from database import Database
+
+SERVICES = ['crane', 'truck', 'excavator', 'loader', 'gazelle']
+WORDS = [
+    "кран", "автокран", "манипулятор", "экскаватор", "погрузчик", "газель", "фура",
+    "переезд", "доставка", "стройматериалы", "бетон", "кирпич", "песок", "щебень",
+    "мебель", "контейнер", "демонтаж", "котлован", "траншея", "вывоз", "мусора",
+    "срочно", "сегодня", "завтра", "ночью", "аккуратно", "грузчики", "тонн", "25т", "50т",
+]
+CITIES = [
+    "Москва", "Химки", "Мытищи", "Балашиха", "Подольск", "Королев", "Люберцы",
+    "Красногорск", "Одинцово", "Домодедово", "Зеленоград", "Щелково",
+]
+STREETS = ["ул. Ленина", "ул. Мира", "Садовая ул.", "пр. Победы", "Лесная ул.", "ш. Энтузиастов"]
+QUERIES = [
+    "кран Химки", "экскаватор котлован", "газель переезд", "вывоз мусора Мытищи",
+    "25т кран", "погрузчик контейнер", "песок щебень Подольск", "манипулятор",
+    "бетон срочно", "мебель аккуратно Москва",
+]
+
+LIKE_QUERY = """
+    SELECT o.*, u.username, u.full_name
+    FROM orders o
+    LEFT JOIN users u ON o.user_id = u.user_id
+    WHERE o.status = 'active' AND o.expires_at > ?
+    {conditions}
+    ORDER BY o.created_at DESC
+    LIMIT 10
+"""
+
+
+def populate(db, size, active_share, rnd):
+    """size заказов со случайными описаниями и адресами"""
+    now = int(time.time())
+    batch = []
+    for number in range(size):
+        description = " ".join(rnd.choices(WORDS, k=rnd.randint(4, 12)))
+        address = f"{rnd.choice(CITIES)}, {rnd.choice(STREETS)} {rnd.randint(1, 150)}"
+        status = 'active' if rnd.random() < active_share else rnd.choice(('completed', 'expired'))
+        created_at = now - rnd.randint(0, 30 * 24 * 3600)
+        batch.append((
+            f"ORD{number:09d}", rnd.randint(1, 50_000), rnd.choice(SERVICES), description, address,
+            rnd.choice((None, rnd.randint(1, 100) * 1000)), status, created_at, now + 7 * 24 * 3600
+        ))
+
+        if len(batch) == 50_000 or number == size - 1:
+            with db.pool.writer() as conn:
+                conn.executemany('''
+                    INSERT INTO orders (order_id, user_id, service_type, description, address,
+                                        desired_price, status, created_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', batch)
+            batch = []
+
+    with db.pool.writer() as conn:
+        conn.execute("ANALYZE")
+
+
+def measure(search, queries):
+    """Среднее время запроса (мс) и среднее число найденных заказов"""
+    found = 0
+    started = time.perf_counter()
+    for query in queries:
+        found += len(search(query))
+    elapsed = time.perf_counter() - started
+    return elapsed * 1000 / len(queries), found / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк полнотекстового поиска заказов")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--active", type=float, default=0.3, help="доля активных заказов")
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    queries = [rnd.choice(QUERIES) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), pragma_profile="production")
+
+        started = time.perf_counter()
+        populate(db, args.orders, args.active, rnd)
+        build_seconds = time.perf_counter() - started
+
+        def search_like(text):
+            words = text.lower().split()
+            conditions = "".join(" AND (o.description LIKE ? OR o.address LIKE ?)" for _ in words)
+            params = [int(time.time())]
+            for word in words:
+                params += [f"%{word}%", f"%{word}%"]
+            return db._fetchall(LIKE_QUERY.format(conditions=conditions), params)
+
+        def search_fts(text):
+            return db.search_orders(text, limit=10)[0]
+
+        like_ms, like_found = measure(search_like, queries)
+        fts_ms, fts_found = measure(search_fts, queries)
+        db.close()
+
+    print("=" * 60)
+    print(f"🔎 ПОИСК: {args.orders:,} заказов ({args.active:.0%} активных), {args.queries} запросов")
+    print(f"🏗️ Заполнение с триггерами (включая orders_fts): {build_seconds:.1f} с")
+    print("=" * 60)
+    print(f"🐢 LIKE '%слово%':  {like_ms:>8.2f} мс/запрос, найдено {like_found:>5.1f}")
+    print(f"⚡ FTS5 + bm25:     {fts_ms:>8.2f} мс/запрос, найдено {fts_found:>5.1f}")
+    print(f"🚀 Ускорение:       {like_ms / fts_ms:>8.1f}x")
+    print("ℹ️ LIKE в SQLite не приводит регистр кириллицы и не ранжирует результаты")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# scripts/bench_geo.py
+"""
+Сравнение поиска заказов рядом с исполнителем:
+диапазоны по индексу (status, latitude, longitude) против R*Tree.
+
+Запуск: python scripts/bench_geo.py [--sizes 10000 100000 1000000] [--queries 200] [--radius 20]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import bounding_box
+
+# Район, в котором разбрасываем точки (примерно Московская область)
+LAT_RANGE = (54.5, 57.0)
+LON_RANGE = (35.0, 40.0)
+
+BBOX_FILTER = """
+    status = 'active'
+    AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+"""
+
+RTREE_FILTER = """
+    status = 'active'
+    AND rowid IN (
+        SELECT id FROM orders_rtree
+        WHERE min_lat >= ? AND max_lat <= ? AND min_lon >= ? AND max_lon <= ?
+    )
+"""
+
+# Отбор кандидатов (только rowid) и отбор вместе с чтением строк заказов
+QUERIES = {
+    'bbox_ids': f"SELECT rowid FROM orders WHERE {BBOX_FILTER}",
+    'rtree_ids': """
+        SELECT id FROM orders_rtree
+        WHERE min_lat >= ? AND max_lat <= ? AND min_lon >= ? AND max_lon <= ?
+    """,
+    'bbox_rows': f"SELECT * FROM orders WHERE {BBOX_FILTER}",
+    'rtree_rows': f"SELECT * FROM orders WHERE {RTREE_FILTER}",
+}
+
+
+def build(size, rnd):
+    """БД в памяти с size заказами, индексом по координатам и R*Tree"""
+    conn = sqlite3.connect(":memory:")
+    # Колонки кроме координат нужны, чтобы индекс не был покрывающим, как в боевой таблице
+    conn.execute("CREATE TABLE orders (status TEXT, latitude REAL, longitude REAL, created_at INTEGER, description TEXT)")
+    conn.execute("CREATE VIRTUAL TABLE orders_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+    
+    rows = [
+        (
+            rnd.choice(('active', 'completed')), rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE),
+            rnd.randint(0, 2**31), "Описание заказа " * 8
+        )
+        for _ in range(size)
+    ]
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", rows)
+    conn.execute('''
+        INSERT INTO orders_rtree
+        SELECT rowid, latitude, latitude, longitude, longitude FROM orders WHERE status = 'active'
+    ''')
+    conn.execute("CREATE INDEX idx_orders_status_lat_lon ON orders (status, latitude, longitude)")
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def measure(conn, query, boxes):
+    """Среднее время запроса (мс) и число найденных строк"""
+    found = 0
+    started = time.perf_counter()
+    for box in boxes:
+        found += len(conn.execute(query, box).fetchall())
+    elapsed = time.perf_counter() - started
+    return elapsed * 1000 / len(boxes), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска заказов по координатам")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=20, help="Радиус работы исполнителя, км")
+    args = parser.parse_args()
+    
+    rnd = random.Random(42)
+    
+    print("=" * 72)
+    print(f"📍 ПОИСК ЗАКАЗОВ В РАДИУСЕ {args.radius:g} КМ ({args.queries} запросов, среднее в мс)")
+    print("=" * 72)
+    print(f"{'Точек':>10} | {'bbox id':>9} | {'R*Tree id':>9} | {'bbox строки':>11} | {'R*Tree строки':>13}")
+    print("-" * 72)
+    
+    for size in args.sizes:
+        conn = build(size, rnd)
+        boxes = [
+            bounding_box(rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE), args.radius)
+            for _ in range(args.queries)
+        ]
+        
+        results = {name: measure(conn, query, boxes) for name, query in QUERIES.items()}
+        conn.close()
+        
+        # R*Tree хранит float32 и может немного расходиться на границе
+        bbox_found = results['bbox_ids'][1]
+        rtree_found = results['rtree_ids'][1]
+        if abs(bbox_found - rtree_found) > bbox_found * 0.01:
+            print(f"⚠️ Результаты различаются: {bbox_found} и {rtree_found}")
+        
+        print(
+            f"{size:>10,} | {results['bbox_ids'][0]:>9.3f} | {results['rtree_ids'][0]:>9.3f} | "
+            f"{results['bbox_rows'][0]:>11.3f} | {results['rtree_rows'][0]:>13.3f}"
+        )
+    
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
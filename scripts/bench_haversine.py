@@ -0,0 +1,75 @@
+# scripts/bench_haversine.py
+"""
+Сравнение расчета расстояний исполнители x заказы:
+цикл по geo.haversine_distance против geo.haversine_matrix (numpy).
+
+Запуск: python scripts/bench_haversine.py [--executors 2000] [--orders 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo
+from geo import haversine_distance, haversine_matrix, radius_mask
+
+
+def random_points(rnd, count):
+    """Случайные точки в районе Москвы"""
+    lats = [rnd.uniform(54.5, 57.0) for _ in range(count)]
+    lons = [rnd.uniform(35.0, 40.0) for _ in range(count)]
+    return lats, lons
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк пакетного haversine")
+    parser.add_argument("--executors", type=int, default=2_000)
+    parser.add_argument("--orders", type=int, default=1_000)
+    args = parser.parse_args()
+    
+    if geo.np is None:
+        print("❌ numpy не установлен: pip install -r requirements.txt")
+        return
+    
+    rnd = random.Random(42)
+    executor_lats, executor_lons = random_points(rnd, args.executors)
+    order_lats, order_lons = random_points(rnd, args.orders)
+    radii = [rnd.choice([5, 10, 20, 50, 100]) for _ in range(args.executors)]
+    pairs = args.executors * args.orders
+    
+    print("=" * 60)
+    print(f"📐 РАССТОЯНИЯ: {args.executors:,} исполнителей x {args.orders:,} заказов = {pairs:,} пар")
+    print("=" * 60)
+    
+    started = time.perf_counter()
+    loop_mask = [
+        [haversine_distance(lat1, lon1, lat2, lon2) <= radius for lat2, lon2 in zip(order_lats, order_lons)]
+        for lat1, lon1, radius in zip(executor_lats, executor_lons, radii)
+    ]
+    loop_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    mask = radius_mask(executor_lats, executor_lons, radii, order_lats, order_lons)
+    numpy_seconds = time.perf_counter() - started
+    
+    # Сверяем результаты с точным скалярным расчетом
+    distances = haversine_matrix(executor_lats[:50], executor_lons[:50], order_lats, order_lons)
+    max_error = max(
+        abs(distances[i][j] - haversine_distance(executor_lats[i], executor_lons[i], order_lats[j], order_lons[j]))
+        for i in range(len(distances)) for j in range(args.orders)
+    )
+    mismatches = int((mask != geo.np.array(loop_mask)).sum())
+    
+    print(f"🐍 Цикл (math):    {loop_seconds * 1000:>10.1f} мс")
+    print(f"⚡ numpy:          {numpy_seconds * 1000:>10.1f} мс")
+    print(f"🚀 Ускорение:      {loop_seconds / numpy_seconds:>10.1f}x")
+    print(f"🎯 Макс. расхождение: {max_error:.2e} км, различий в маске: {mismatches}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
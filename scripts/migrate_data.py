@@ -23,9 +23,8 @@ async def migrate_users():
     user_repo = repository_factory.create_user_repository()
     
     # Получаем всех пользователей из старой БД
-    with old_db.conn:
-        old_db.cursor.execute("SELECT * FROM users")
-        users = old_db.cursor.fetchall()
+    with old_db.pool.reader() as conn:
+        users = conn.execute("SELECT * FROM users").fetchall()
     
     migrated_count = 0
     
@@ -64,9 +63,8 @@ async def migrate_orders():
     order_repo = repository_factory.create_order_repository()
     
     # Получаем все заказы из старой БД
-    with old_db.conn:
-        old_db.cursor.execute("SELECT * FROM orders")
-        orders = old_db.cursor.fetchall()
+    with old_db.pool.reader() as conn:
+        orders = conn.execute("SELECT * FROM orders").fetchall()
     
     migrated_count = 0
     
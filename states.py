@@ -103,6 +103,7 @@ class OrderFilterStates(StatesGroup):
     set_price_range = State()         # Фильтр по цене (мин-макс)
     set_distance_filter = State()     # Фильтр по расстоянию
     set_sorting = State()             # Сортировка (по цене, дате, расстоянию)
+    enter_search_query = State()      # Полнотекстовый поиск по описанию и адресу
 
 
 class ProfileEditStates(StatesGroup):
@@ -0,0 +1,33 @@
+# tasks.py
+"""
+Фоновые задачи бота (запускаются из main.py)
+"""
+
+import asyncio
+import logging
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+async def order_expiry_sweeper(database, interval=60, chunk_size=500):
+    """
+    Периодически переводит просроченные заказы в статус 'expired'.
+    
+    Args:
+        database: AsyncDatabase
+        interval: Пауза между проходами (сек)
+        chunk_size: Размер пачки UPDATE
+    """
+    while True:
+        try:
+            expired = await database.expire_orders(chunk_size=chunk_size)
+            metrics.inc('orders_expired_total', expired)
+            metrics.set('orders_expired_last_run', expired)
+            if expired:
+                logger.info(f"⏰ Просрочено заказов: {expired}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки просроченных заказов: {e}")
+        
+        await asyncio.sleep(interval)
@@ -0,0 +1,914 @@
+# test_database.py
+"""
+Тесты слоя данных database.Database
+
+Запуск: python -m pytest -q test_database.py
+"""
+
+import os
+import random
+import re
+import sqlite3
+import time
+
+import pytest
+
+# Глобальный экземпляр БД из database.py не должен трогать рабочий файл
+os.environ.setdefault("DB_PATH", ":memory:")
+
+from database import Database
+from utils import generate_order_id
+
+
+ORDERS_COUNT = 100_000
+EXECUTORS_COUNT = 2_000
+CUSTOMERS_COUNT = 20_000
+DAY = 24 * 60 * 60
+
+# Таблицы, полный просмотр которых недопустим
+HOT_TABLES = {
+    'users', 'orders', 'offers', 'reviews', 'executor_profiles',
+    'executor_equipment', 'executor_categories', 'user_locations',
+}
+
+TABLE_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {'WHERE', 'SET', 'ON', 'ORDER', 'LEFT', 'JOIN', 'GROUP', 'LIMIT'}
+
+
+def populate(db):
+    """Заполнение БД объемом, близким к боевому"""
+    rnd = random.Random(42)
+    now = int(time.time())
+    services = ['truck', 'crane', 'excavator', 'loader', 'delivery', 'moving']
+    statuses = ['active'] * 25 + ['completed'] * 50 + ['in_progress'] * 15 + ['cancelled'] * 10
+
+    users = [(user_id, f"user{user_id}", f"User {user_id}") for user_id in range(1, CUSTOMERS_COUNT + 1)]
+    executors = list(range(1, EXECUTORS_COUNT + 1))
+    orders = [
+        (
+            f"ORD{index:08d}",
+            rnd.randint(1, CUSTOMERS_COUNT),
+            rnd.choice(services),
+            "Описание заказа",
+            "Москва",
+            rnd.choice([None, rnd.randint(500, 100_000)]),
+            rnd.choice(statuses),
+            now - rnd.randint(0, 90 * DAY),
+            now + rnd.randint(-7 * DAY, 7 * DAY),
+            *rnd.choice([(None, None), (55.0 + rnd.random(), 37.0 + rnd.random())]),
+        )
+        for index in range(ORDERS_COUNT)
+    ]
+    offers = {
+        (orders[rnd.randrange(ORDERS_COUNT)][0], rnd.choice(executors))
+        for _ in range(ORDERS_COUNT)
+    }
+
+    with db.pool.writer() as conn:
+        conn.executemany("INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)", users)
+        conn.execute("UPDATE users SET role = 'executor' WHERE user_id <= ?", (EXECUTORS_COUNT,))
+        conn.executemany(
+            "INSERT INTO executor_profiles (user_id, company_name, service_filter) VALUES (?, ?, ?)",
+            [(executor_id, f"Компания {executor_id}", rnd.choice(services)) for executor_id in executors]
+        )
+        conn.executemany(
+            '''INSERT INTO orders (order_id, user_id, service_type, description, address,
+                                   desired_price, status, created_at, expires_at, latitude, longitude)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            orders
+        )
+        conn.executemany(
+            "INSERT INTO offers (order_id, executor_id, price) VALUES (?, ?, ?)",
+            [(order_id, executor_id, rnd.randint(500, 100_000)) for order_id, executor_id in offers]
+        )
+        conn.executemany(
+            "INSERT INTO reviews (order_id, from_user_id, to_user_id, rating, comment) VALUES (?, ?, ?, ?, '')",
+            [(orders[i][0], orders[i][1], rnd.choice(executors), rnd.randint(1, 5)) for i in range(0, ORDERS_COUNT, 4)]
+        )
+        conn.executemany(
+            "INSERT INTO executor_equipment (executor_id, equipment_type, brand, model) VALUES (?, 'truck', 'ГАЗ', 'Газель')",
+            [(executor_id,) for executor_id in executors for _ in range(3)]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO executor_categories (executor_id, category_id) VALUES (?, ?)",
+            [(executor_id, rnd.randint(1, 12)) for executor_id in executors for _ in range(3)]
+        )
+        conn.executemany(
+            "INSERT INTO user_locations (user_id, latitude, longitude) VALUES (?, ?, ?)",
+            [(executor_id, 55.75, 37.62) for executor_id in executors]
+        )
+        conn.execute("ANALYZE")
+
+    return orders
+
+
+@pytest.fixture(scope="module")
+def loaded_db():
+    db = Database(":memory:")
+    orders = populate(db)
+    yield db, orders
+    db.close()
+
+
+def full_scans(db, statement):
+    """Строки плана запроса с полным просмотром горячих таблиц"""
+    # В плане SQLite пишет алиас таблицы, если он задан в запросе
+    names = set(HOT_TABLES)
+    for table, alias in TABLE_ALIAS_RE.findall(statement):
+        if table in HOT_TABLES and alias and alias.upper() not in SQL_KEYWORDS:
+            names.add(alias)
+
+    with db.pool.reader() as conn:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+
+    return [
+        row['detail'] for row in plan
+        if row['detail'].startswith('SCAN ') and row['detail'].split()[1] in names
+    ]
+
+
+def test_migrations_are_versioned(tmp_path):
+    path = str(tmp_path / "marketplace.db")
+    Database(path).close()
+
+    db = Database(path)
+    with db.pool.reader() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        indexes = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        orders_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'orders'").fetchone()[0]
+    db.close()
+
+    assert version == Database.MIGRATIONS[-1][0]
+    assert 'ux_offers_order_executor' in indexes
+    # Новая база создается с orders.id сразу (после пересборки имя было бы в кавычках)
+    assert orders_sql.startswith("CREATE TABLE orders (") and "id INTEGER PRIMARY KEY" in orders_sql
+
+
+def test_offers_are_unique_per_executor(loaded_db):
+    db, orders = loaded_db
+    order_id = orders[0][0]
+
+    db.create_offer(order_id, 1, 1000)
+    db.create_offer(order_id, 1, 900)
+
+    offers = [offer for offer in db.get_offers_for_order(order_id) if offer['executor_id'] == 1]
+    assert len(offers) == 1
+    assert offers[0]['price'] == 900
+    assert db.get_order(order_id)['offers_count'] == len(db.get_offers_for_order(order_id))
+
+
+def test_queries_use_indexes(loaded_db):
+    db, orders = loaded_db
+    order_id = orders[10][0]
+    customer_id = orders[10][1]
+    executor_id = 7
+
+    statements = []
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(statements.append)
+
+    try:
+        db.get_user(customer_id)
+        db.get_executor_profile(executor_id)
+        db.get_executor_equipment(executor_id)
+        db.get_equipment(1)
+        db.get_user_location(executor_id)
+        db.get_categories()
+        db.get_categories(parent_id=1)
+        db.get_category_by_code('crane')
+        db.get_executor_categories(executor_id)
+        db.get_filtered_orders_for_executor(executor_id)
+        db.update_executor_profile(executor_id, service_filter=None)
+        db.get_filtered_orders_for_executor(executor_id)
+        db.update_executor_profile(executor_id, latitude=55.75, longitude=37.62, work_radius_km=30)
+        db.get_filtered_orders_for_executor(executor_id)
+        db.get_executors_near(55.75, 37.62)
+        page = db.get_orders_feed_page(executor_id, limit=5)
+        db.get_orders_feed_page(executor_id, cursor=db.feed_cursor(page[-1]), limit=5)
+        db.get_orders_feed_page(executor_id, cursor=db.feed_cursor(page[-1]), backward=True)
+        db.get_order(order_id)
+        db.get_orders_by_user(customer_id)
+        db.get_orders_by_user(customer_id, limit=10)
+        db.get_active_orders(exclude_user_id=customer_id)
+        db.search_orders("кран Москва")
+        db.search_orders("кран", executor_id=executor_id, limit=5, offset=5)
+        db.get_offers_for_order(order_id)
+        db.get_offers_by_executor(executor_id)
+        db.get_order_offers_count(order_id)
+        db.create_offer(order_id, executor_id, 5000, "Готов")
+        db.select_executor_for_order(order_id, executor_id)
+        db.update_order_status(order_id, 'completed')
+        db.expire_orders(chunk_size=1000)
+        db.get_user_reviews(executor_id)
+        db.get_user_stats(customer_id)
+    finally:
+        with db.pool.writer() as conn:
+            conn.set_trace_callback(None)
+
+    checked = 0
+    for statement in statements:
+        keyword = statement.lstrip().split(None, 1)[0].upper()
+        if keyword not in ('SELECT', 'UPDATE', 'DELETE'):
+            continue
+        checked += 1
+        assert not full_scans(db, statement), f"Полный просмотр таблицы:\n{statement}"
+
+    assert checked >= 20
+
+
+def test_order_timestamps_migrated_to_epoch(tmp_path):
+    path = str(tmp_path / "marketplace.db")
+    db = Database(path)
+    with db.pool.writer() as conn:
+        conn.execute(
+            '''INSERT INTO orders (order_id, user_id, service_type, status, created_at, expires_at)
+               VALUES ('ORDOLD', 1, 'crane', 'active', '2026-01-01 00:00:00', '2099-01-01 00:00:00')'''
+        )
+        conn.execute("PRAGMA user_version = 1")
+    db.close()
+
+    db = Database(path)
+    order = db.get_order('ORDOLD')
+    active = db.get_active_orders()
+    db.close()
+
+    assert order['created_at'] == 1767225600
+    assert isinstance(order['expires_at'], int)
+    assert [row['order_id'] for row in active] == ['ORDOLD']
+
+
+def test_expire_orders_in_chunks():
+    db = Database(":memory:")
+    now = int(time.time())
+    with db.pool.writer() as conn:
+        conn.executemany(
+            '''INSERT INTO orders (order_id, user_id, service_type, status, created_at, expires_at)
+               VALUES (?, 1, 'crane', ?, ?, ?)''',
+            [(f"ORD{i:04d}", 'active', now - DAY, now - 1) for i in range(25)]
+            + [("ORDLIVE", 'active', now, now + DAY), ("ORDDONE", 'completed', now - DAY, now - 1)]
+        )
+
+    expired = db.expire_orders(now=now, chunk_size=10)
+    again = db.expire_orders(now=now, chunk_size=10)
+    statuses = {order_id: db.get_order(order_id)['status'] for order_id in ('ORD0000', 'ORDLIVE', 'ORDDONE')}
+    db.close()
+
+    assert expired == 25
+    assert again == 0
+    assert statuses == {'ORD0000': 'expired', 'ORDLIVE': 'active', 'ORDDONE': 'completed'}
+
+
+def test_feed_filters_and_sorts_by_distance():
+    db = Database(":memory:")
+    db.add_user(1, "customer", "Заказчик")
+    db.add_user(2, "executor", "Исполнитель")
+    db.update_user_role(2, 'executor')
+    db.update_executor_profile(2, latitude=55.7558, longitude=37.6173, work_radius_km=30)
+
+    db.create_order("ORDFAR", 1, 'crane', "Кран", "Тверь", None, latitude=56.8587, longitude=35.9176)
+    db.create_order("ORDNEAR", 1, 'crane', "Кран", "Химки", None, latitude=55.8970, longitude=37.4297)
+    db.create_order("ORDHERE", 1, 'crane', "Кран", "Кремль", None, latitude=55.7520, longitude=37.6175)
+    db.create_order("ORDNOGEO", 1, 'crane', "Кран", "Москва", None)
+
+    feed = db.get_filtered_orders_for_executor(2)
+    near_here = db.get_executors_near(55.7520, 37.6175)
+    near_far = db.get_executors_near(56.8587, 35.9176)
+
+    db.update_order_status("ORDHERE", 'completed')
+    db.update_executor_profile(2, work_radius_km=200)
+    feed_after = db.get_filtered_orders_for_executor(2)
+    near_far_after = db.get_executors_near(56.8587, 35.9176)
+    db.close()
+
+    assert [order['order_id'] for order in feed] == ['ORDHERE', 'ORDNEAR', 'ORDNOGEO']
+    assert feed[0]['distance_km'] < 1
+    assert 15 < feed[1]['distance_km'] < 30
+    assert [executor['user_id'] for executor in near_here] == [2]
+    assert near_far == []
+    assert [order['order_id'] for order in feed_after] == ['ORDNEAR', 'ORDFAR', 'ORDNOGEO']
+    assert [executor['user_id'] for executor in near_far_after] == [2]
+
+
+def test_spatial_index_uses_stable_order_key(tmp_path):
+    path = str(tmp_path / "marketplace.db")
+    # Таблица заказов в старом виде (ключ order_id TEXT, rowid неявный) с дырами в rowid
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE orders (
+            order_id TEXT PRIMARY KEY, user_id INTEGER, service_type TEXT, description TEXT,
+            address TEXT, desired_price INTEGER, status TEXT DEFAULT 'active',
+            selected_executor_id INTEGER DEFAULT NULL, created_at INTEGER, expires_at INTEGER,
+            latitude REAL, longitude REAL
+        )
+    ''')
+    now = int(time.time())
+    conn.executemany(
+        "INSERT INTO orders (order_id, user_id, service_type, created_at, expires_at, latitude, longitude) "
+        "VALUES (?, 1, 'crane', ?, ?, ?, ?)",
+        [(f"ORDFAR{i}", now, now + DAY, 56.8587, 35.9176) for i in range(5)]
+        + [("ORDHERE", now, now + DAY, 55.7520, 37.6175)]
+    )
+    conn.execute("DELETE FROM orders WHERE order_id IN ('ORDFAR0', 'ORDFAR1')")
+    old_rowid = conn.execute("SELECT rowid FROM orders WHERE order_id = 'ORDHERE'").fetchone()[0]
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    db.add_user(2, "executor", "Исполнитель")
+    db.update_user_role(2, 'executor')
+    db.update_executor_profile(2, latitude=55.7558, longitude=37.6173, work_radius_km=30)
+    with db.pool.writer() as conn:
+        conn.execute("VACUUM")
+    feed = db.get_filtered_orders_for_executor(2)
+    with db.pool.reader() as conn:
+        mismatched = conn.execute('''
+            SELECT COUNT(*) FROM orders_rtree r LEFT JOIN orders o ON o.id = r.id
+            WHERE o.id IS NULL OR abs(o.latitude - r.min_lat) > 0.001 OR abs(o.longitude - r.min_lon) > 0.001
+        ''').fetchone()[0]
+    db.close()
+
+    assert [(order['order_id'], order['id']) for order in feed] == [('ORDHERE', old_rowid)]
+    assert mismatched == 0
+
+
+def test_match_index_follows_profile_changes():
+    db = Database(":memory:")
+    for user_id in (1, 2, 3, 4):
+        db.add_user(user_id, f"user{user_id}", f"User {user_id}")
+    for user_id in (2, 3, 4):
+        db.update_user_role(user_id, 'executor')
+    db.update_executor_profile(2, service_filter='crane', latitude=55.7558, longitude=37.6173, work_radius_km=30)
+    db.update_executor_profile(3, service_filter='crane', latitude=59.9343, longitude=30.3351, work_radius_km=30)
+    db.update_executor_profile(4, service_filter='truck', min_price=1000, max_price=5000)
+
+    moscow_crane = db.match_executors('crane', 20000, 55.8970, 37.4297, exclude_user_id=1)
+    truck_cheap = db.match_executors('truck', 3000, 55.8970, 37.4297)
+    truck_expensive = db.match_executors('truck', 9000, 55.8970, 37.4297)
+    crane_no_location = db.match_executors('crane', None)
+
+    db.update_user_role(2, 'customer')
+    db.update_executor_profile(3, latitude=55.75, longitude=37.62)
+    moscow_crane_after = db.match_executors('crane', 20000, 55.8970, 37.4297)
+    db.close()
+
+    assert moscow_crane == [2]
+    assert truck_cheap == [4]
+    assert truck_expensive == []
+    assert sorted(crane_no_location) == [2, 3]
+    assert moscow_crane_after == [3]
+
+
+def test_match_index_keeps_wide_areas_in_one_cell():
+    from matching import ExecutorEntry, ExecutorMatchIndex, MAX_ENTRY_CELLS
+
+    def profile(user_id, radius_km):
+        return {'user_id': user_id, 'service_filter': 'crane', 'min_price': None, 'max_price': None,
+                'latitude': 55.7558, 'longitude': 37.6173, 'work_radius_km': radius_km}
+
+    index = ExecutorMatchIndex()
+    # Максимальный радиус, который принимает анкета исполнителя
+    index.load([profile(user_id, 1000) for user_id in range(1, 51)] + [profile(100, 20)])
+    index.put(profile(51, 1000))
+
+    cells = sum(len(ExecutorEntry.from_profile(profile(1, radius)).cells()) for radius in (1000, 20))
+    saint_petersburg = index.match('crane', None, 59.9343, 30.3351)
+    novosibirsk = index.match('crane', None, 55.0084, 82.9357)
+    moscow = index.match('crane', None, 55.76, 37.62)
+
+    assert cells <= 1 + MAX_ENTRY_CELLS
+    assert sorted(saint_petersburg) == list(range(1, 52))
+    assert novosibirsk == []
+    assert 100 in moscow and len(moscow) == 52
+
+
+def test_notification_retries_are_taken_once_when_due():
+    db = Database(":memory:")
+    db.add_notification_retries([
+        (1, "позже", None, 1, 2000),
+        (2, "первое", '{"inline_keyboard": []}', 2, 1000),
+        (3, "второе", None, 1, 1500),
+    ])
+
+    due = db.take_due_notification_retries(now=1500, limit=10)
+    again = db.take_due_notification_retries(now=1500, limit=10)
+    later = db.take_due_notification_retries(now=3000, limit=10)
+    db.close()
+
+    assert [row['chat_id'] for row in due] == [2, 3]
+    assert due[0]['reply_markup'] == '{"inline_keyboard": []}'
+    assert again == []
+    assert [row['text'] for row in later] == ["позже"]
+
+
+def test_feed_pages_follow_keyset_cursor(loaded_db):
+    db, orders = loaded_db
+    executor_id = 11
+    db.update_executor_profile(executor_id, service_filter='crane', latitude=55.5, longitude=37.5, work_radius_km=40)
+
+    expected = db.get_filtered_orders_for_executor(executor_id)
+
+    pages, cursor = [], None
+    while True:
+        page = db.get_orders_feed_page(executor_id, cursor=cursor, limit=50)
+        if not page:
+            break
+        pages.append(page)
+        cursor = db.feed_cursor(page[-1])
+
+    previous = db.get_orders_feed_page(executor_id, cursor=db.feed_cursor(pages[1][0]), limit=50, backward=True)
+    distances = [order['distance_km'] for page in pages for order in page if 'distance_km' in order]
+
+    assert [order['order_id'] for page in pages for order in page] == [order['order_id'] for order in expected]
+    assert distances and distances == sorted(distances)
+    assert all(len(page) == 50 for page in pages[:-1])
+    assert [order['order_id'] for order in previous] == [order['order_id'] for order in pages[0]]
+
+
+def test_narrow_radius_feed_page_is_one_query():
+    db = Database(":memory:")
+    db.add_user(2, "executor", "Исполнитель")
+    db.update_user_role(2, 'executor')
+    db.update_executor_profile(2, latitude=55.75, longitude=37.62, work_radius_km=5)
+
+    now = int(time.time())
+    # Угол прямоугольника радиуса: проходит грубый фильтр, но дальше 5 км
+    corner = [(f"ORDCORNER{i:03d}", now - i, now + DAY, 55.79, 37.69) for i in range(200)]
+    with db.pool.writer() as conn:
+        conn.executemany(
+            '''INSERT INTO orders (order_id, user_id, service_type, created_at, expires_at, latitude, longitude)
+               VALUES (?, 1, 'crane', ?, ?, ?, ?)''',
+            corner + [("ORDNEAR", now - 1000, now + DAY, 55.76, 37.63)]
+        )
+
+    statements = []
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(statements.append)
+    page = db.get_orders_feed_page(2, limit=2)
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(None)
+    db.close()
+
+    feed_queries = [statement for statement in statements if "FROM orders o" in statement]
+    assert [order['order_id'] for order in page] == ['ORDNEAR']
+    assert len(feed_queries) == 1
+
+
+def test_offer_counters_follow_offers_and_rebuild(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.create_order("ORDA", 1, 'crane', "Кран", "Москва", None)
+    db.create_order("ORDB", 1, 'crane', "Кран", "Москва", None)
+    for executor_id in (2, 3, 4):
+        db.create_offer("ORDA", executor_id, 1000)
+    db.create_offer("ORDA", 2, 900)
+    with db.pool.writer() as conn:
+        conn.execute("DELETE FROM offers WHERE executor_id = 4")
+        conn.execute("UPDATE orders SET offers_count = 7 WHERE order_id = 'ORDB'")
+
+    counted = [order['offers_count'] for order in db.get_orders_by_user(1)]
+    fixed = db.rebuild_offer_counters()
+    rebuilt = {order['order_id']: order['offers_count'] for order in db.get_orders_by_user(1)}
+    db.close()
+
+    assert sorted(counted) == [2, 7]
+    assert fixed == 1
+    assert rebuilt == {'ORDA': 2, 'ORDB': 0}
+
+
+def test_user_cache_is_invalidated_on_writes(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(1, "exec", "Иван")
+    db.update_user_role(1, 'executor')
+
+    db.get_user(1)
+    db.get_executor_profile(1)
+    user = db.get_user(1)
+    user['full_name'] = "Изменено"
+    profile = db.get_executor_profile(1)
+    stats = db.get_cache_stats()
+
+    db.update_executor_profile(1, min_price=5000)
+    db.update_user_role(1, 'customer')
+    updated_profile = db.get_executor_profile(1)
+    updated_user = db.get_user(1)
+    db.close()
+
+    # Первый промах - проверка в add_user
+    assert stats['users']['hits'] == 1 and stats['users']['misses'] == 2
+    assert stats['executor_profiles']['hits'] == 1
+    assert db.get_cache_stats()['users']['misses'] == 3
+    assert profile['min_price'] == 1000 and updated_profile['min_price'] == 5000
+    assert updated_user['full_name'] == "Иван" and updated_user['role'] == 'customer'
+
+
+def test_category_catalogue_refreshes_on_change(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    crane = db.get_category_by_code('crane')
+    roots = db.get_categories()
+    with db.pool.writer() as conn:
+        conn.execute(
+            "INSERT INTO service_categories (name, code, parent_id) VALUES ('Автокран 25 т', 'crane25', ?)",
+            (crane['id'],)
+        )
+    stale = db.get_category_by_code('crane25')
+    db.refresh_categories()
+    children = db.get_categories(parent_id=crane['id'])
+    db.close()
+
+    assert [category['name'] for category in roots] == sorted(category['name'] for category in roots)
+    assert db.categories.get(crane['id'])['code'] == 'crane'
+    assert stale is None
+    assert [category['code'] for category in children] == ['crane25']
+    with pytest.raises(TypeError):
+        crane['name'] = "Подмена"
+
+
+def test_update_methods_accept_only_known_columns(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(1, "exec", "Иван")
+    db.update_user_role(1, 'executor')
+    db.add_equipment(1, {'equipment_type': 'crane', 'brand': "Ивановец"})
+    equipment_id = db.get_executor_equipment(1)[0]['id']
+
+    statements = []
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(statements.append)
+    assert db.update_executor_profile(1, phone="+7", min_price=2000)
+    assert db.update_executor_profile(1, min_price=3000, phone="+8")
+    assert not db.update_executor_profile(1, **{"created_at": 0, "phone = 'x' --": 1})
+    assert not db.update_equipment(equipment_id, **{"brand = 'x', executor_id": 2})
+    assert db.update_equipment(equipment_id, brand="Клинцы", executor_id=2)
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(None)
+
+    profile = db.get_executor_profile(1)
+    equipment = db.get_equipment(equipment_id)
+    db.close()
+
+    assert not any("PRAGMA table_info" in statement for statement in statements)
+    assert (profile['phone'], profile['min_price']) == ("+8", 3000)
+    assert (equipment['brand'], equipment['executor_id']) == ("Клинцы", 1)
+
+
+def test_reviews_update_rating_totals_and_rebuild(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(1, "customer", "Петр")
+    db.add_user(2, "exec", "Иван")
+    db.get_user(2)
+    for rating in (5, 4, 4):
+        db.add_review("ORDA", 1, 2, rating, "")
+    user = db.get_user(2)
+
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE users SET rating_sum = 0, rating_count = 0, rating = 5.0")
+    fixed = db.rebuild_user_ratings()
+    rebuilt = db.get_user(2)
+    untouched = db.get_user(1)
+    db.close()
+
+    assert (user['rating_sum'], user['rating_count'], user['rating']) == (13, 3, 4.33)
+    assert fixed == 1
+    assert (rebuilt['rating_sum'], rebuilt['rating_count'], rebuilt['rating']) == (13, 3, 4.33)
+    assert (untouched['rating_count'], untouched['rating']) == (0, 5.0)
+
+
+def test_user_stats_follow_orders_offers_and_rebuild(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(1, "customer", "Петр")
+    db.add_user(2, "exec", "Иван")
+    db.create_order("ORDA", 1, 'crane', "Кран", "Москва", None)
+    db.create_order("ORDB", 1, 'crane', "Кран", "Москва", None)
+    db.create_offer("ORDA", 2, 1000)
+    db.create_offer("ORDB", 2, 1000)
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE orders SET status = 'completed' WHERE order_id = 'ORDA'")
+        conn.execute("DELETE FROM offers WHERE order_id = 'ORDB'")
+    customer, executor = db.get_user_stats(1), db.get_user_stats(2)
+
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE user_stats SET orders_count = 9")
+        conn.execute("INSERT INTO user_stats (user_id, offers_count) VALUES (3, 4)")
+    fixed = db.rebuild_user_stats()
+    rebuilt = db.get_user_stats(1)
+    db.close()
+
+    assert (customer['orders_count'], customer['completed_orders'], customer['offers_count']) == (2, 1, 0)
+    assert (executor['orders_count'], executor['offers_count']) == (0, 1)
+    assert fixed == 3
+    assert (rebuilt['orders_count'], rebuilt['completed_orders']) == (2, 1)
+
+
+def test_user_stats_ignore_orders_without_user(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.create_order("ORDA", 1, 'crane', "Кран", "Москва", None)
+    with db.pool.writer() as conn:
+        conn.execute(
+            "INSERT INTO orders (order_id, user_id, service_type, status) VALUES ('ORDNULL', NULL, 'crane', 'active')"
+        )
+        conn.execute("UPDATE orders SET status = 'completed' WHERE order_id = 'ORDNULL'")
+        conn.execute("INSERT INTO offers (order_id, executor_id, price) VALUES ('ORDA', NULL, 1000)")
+        # Строка пользователя, у которого не осталось ни заказов, ни предложений
+        conn.execute("INSERT INTO user_stats (user_id, orders_count) VALUES (5, 1)")
+    fixed = db.rebuild_user_stats()
+    with db.pool.reader() as conn:
+        user_ids = [row[0] for row in conn.execute("SELECT user_id FROM user_stats ORDER BY user_id")]
+    db.close()
+
+    assert fixed == 1
+    assert user_ids == [1]
+
+
+def test_order_ids_are_time_ordered_and_unique():
+    ids = [generate_order_id() for _ in range(10000)]
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert all(len(order_id) == 29 and "_" not in order_id for order_id in ids)
+
+
+def test_upserts_keep_existing_rows(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(1, "exec", "Иван")
+    db.update_user_role(1, 'executor')
+    db.add_review("ORDA", 2, 1, 4, "")
+    user = db.add_user(1, "exec_new", "Иван Петров")
+
+    first = db.create_offer("ORDA", 1, 1000)
+    second = db.create_offer("ORDA", 1, 900, "Дешевле")
+    offers = db.get_offers_for_order("ORDA")
+
+    db.update_user_location(1, 55.75, 37.62, "Москва")
+    location_id = db.get_user_location(1)['id']
+    db.update_user_location(1, 59.93, 30.31, "Санкт-Петербург")
+    location = db.get_user_location(1)
+    db.close()
+
+    assert (user['username'], user['role'], user['rating']) == ("exec_new", 'executor', 4.0)
+    assert first == second and [(offer['price'], offer['comment']) for offer in offers] == [(900, "Дешевле")]
+    assert (location['id'], location['address']) == (location_id, "Санкт-Петербург")
+
+
+def test_repeated_start_does_not_write(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(1, "exec", "Иван")
+    db.update_user_role(1, 'executor')
+
+    statements = []
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(statements.append)
+    for _ in range(3):
+        same = db.add_user(1, "exec", "Иван")
+    writes_when_same = [statement for statement in statements if "INSERT" in statement]
+    renamed = db.add_user(1, "exec", "Иван Петров")
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(None)
+    db.close()
+
+    assert writes_when_same == []
+    assert same['role'] == 'executor'
+    assert (renamed['full_name'], renamed['role']) == ("Иван Петров", 'executor')
+
+
+def test_nested_calls_share_one_transaction(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(1, "exec", "Иван")
+
+    statements = []
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(statements.append)
+    db.update_user_role(1, 'executor')
+    db.complete_executor_registration(1, {'company_name': "ООО Кран"}, 55.75, 37.62, "Москва")
+    commits = [statement for statement in statements if statement.strip() == "COMMIT"]
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.update_executor_profile(1, company_name="Откат")
+            raise RuntimeError
+    with db.transaction():
+        try:
+            with db.transaction():
+                db.update_executor_profile(1, phone="+7")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        db.update_executor_profile(1, description="Краны")
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(None)
+
+    profile = db.get_executor_profile(1)
+    matched = db.match_executors('crane', latitude=55.75, longitude=37.62)
+    db.close()
+
+    assert len(commits) == 2
+    assert (profile['company_name'], profile['phone'], profile['description']) == ("ООО Кран", None, "Краны")
+    assert profile['latitude'] == 55.75 and matched == [1]
+
+
+def test_write_behind_coalesces_and_flushes_on_stop(tmp_path):
+    import asyncio
+    from database import AsyncDatabase
+    from write_behind import WriteBehindBuffer
+
+    db = Database(str(tmp_path / "marketplace.db"))
+    async_db = AsyncDatabase(db)
+    buffer = WriteBehindBuffer('test_locations', 'save_live_locations', interval=60, max_items=5)
+    statements = []
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(statements.append)
+
+    async def scenario():
+        buffer.start(async_db)
+        for step in range(100):
+            buffer.put(step % 5, 55.0 + step / 1000, 37.0, 1700000000 + step)
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        buffer.put(7, 59.9, 30.3, 1700000500)
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    location = db.get_user_location(4)
+    late = db.get_user_location(7)
+    async_db.close()
+
+    commits = [statement for statement in statements if statement.strip() == "COMMIT"]
+    assert len(buffer) == 0 and len(commits) < 10
+    assert (location['latitude'], location['last_updated']) == (55.099, "2023-11-14 22:14:59")
+    assert late['latitude'] == 59.9
+
+
+def test_write_behind_keeps_batch_cancelled_mid_flush():
+    import asyncio
+    from write_behind import WriteBehindBuffer
+
+    class StuckDatabase:
+        """Первая запись зависает (ее отменит stop), следующие запоминаются"""
+
+        def __init__(self):
+            self.started = asyncio.Event()
+            self.written = []
+
+        async def save_live_locations(self, rows):
+            if not self.started.is_set():
+                self.started.set()
+                await asyncio.Event().wait()
+            self.written.extend(rows)
+
+    buffer = WriteBehindBuffer('test_cancelled', 'save_live_locations', interval=60, max_items=2)
+
+    async def scenario():
+        database = StuckDatabase()
+        buffer.start(database)
+        buffer.put(1, 55.0, 37.0, 1700000000)
+        buffer.put(2, 56.0, 38.0, 1700000001)
+        await database.started.wait()
+        buffer.put(1, 55.5, 37.5, 1700000002)
+        await buffer.stop()
+        return database.written
+
+    written = asyncio.run(scenario())
+
+    assert len(buffer) == 0
+    assert sorted(written) == [(1, 55.5, 37.5, 1700000002), (2, 56.0, 38.0, 1700000001)]
+
+
+def test_search_orders_ranks_and_follows_changes(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    db.add_user(2, "exec", "Иван")
+    db.update_user_role(2, 'executor')
+    db.create_order("ORDA", 1, 'crane', "Нужен кран 25т на день", "Химки, ул. Ленина 1", 20000)
+    db.create_order("ORDB", 1, 'crane', "Кран-манипулятор на объект", "Москва", None)
+    db.create_order("ORDC", 1, 'crane', "Краны для монтажа, 25т", "Химки", None, 55.89, 37.44)
+    db.create_order("ORDD", 1, 'truck', "Перевезти мебель", "Химки", None)
+    db.create_order("ORDE", 1, 'crane', "Кран на стройку", "Санкт-Петербург", None, 59.93, 30.31)
+    db.create_order("ORDF", 1, 'crane', "Кран, кран и еще раз кран", "Москва", None, 55.76, 37.61)
+
+    found, _ = db.search_orders("краны 25т в Химках")
+    with db.pool.writer() as conn:
+        conn.execute("UPDATE orders SET description = 'Нужен экскаватор' WHERE order_id = 'ORDA'")
+        conn.execute("UPDATE orders SET status = 'expired' WHERE order_id = 'ORDC'")
+    renamed, _ = db.search_orders("экскаватор")
+    expired, _ = db.search_orders("монтаж")
+
+    # Исполнитель в центре Москвы с радиусом 5 км: ORDE далеко, ORDA без слова "кран"
+    db.update_executor_profile(2, service_filter='crane', latitude=55.75, longitude=37.62, work_radius_km=5)
+    pages, offset = [], 0
+    while offset is not None:
+        page, offset = db.search_orders("кран", executor_id=2, limit=1, offset=offset)
+        pages.append([order['order_id'] for order in page])
+    db.close()
+
+    assert sorted(order['order_id'] for order in found) == ["ORDA", "ORDC"]
+    assert [order['order_id'] for order in renamed] == ["ORDA"] and expired == []
+    assert pages[:2] == [["ORDF"], ["ORDB"]] and not any(pages[2:])
+    assert db.search_orders("  ;*  ") == ([], None)
+
+
+def test_async_facade_runs_queries_in_worker_threads():
+    import asyncio
+    import threading
+    from database import AsyncDatabase
+
+    db = Database(":memory:")
+    async_db = AsyncDatabase(db, max_workers=2)
+    threads = set()
+    with db.pool.writer() as conn:
+        conn.set_trace_callback(lambda statement: threads.add(threading.current_thread().name))
+
+    async def scenario():
+        loop_thread = threading.current_thread().name
+        await async_db.add_user(1, "user", "Пользователь")
+        users = await asyncio.gather(*(async_db.get_user(1) for _ in range(5)))
+        return loop_thread, users
+
+    loop_thread, users = asyncio.run(scenario())
+    categories = async_db.get_categories()
+    crane = async_db.get_category_by_code('crane')
+    async_db.close()
+
+    assert threads and all(name.startswith("db") for name in threads)
+    assert loop_thread not in threads
+    assert [user['full_name'] for user in users] == ["Пользователь"] * 5
+    # Методы без запросов к БД возвращают результат сразу, а не корутину
+    assert isinstance(categories, list) and crane['code'] == 'crane'
+    assert async_db.get_user is async_db.get_user
+    # close() дождался запросов и закрыл соединения
+    with pytest.raises(sqlite3.ProgrammingError):
+        db.get_user(2)
+
+
+def test_pool_readers_are_isolated_from_writer(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"), readers=2)
+    count_users = "SELECT COUNT(*) FROM users"
+
+    with db.pool.writer() as writer:
+        writer.execute("INSERT INTO users (user_id, full_name) VALUES (1, 'Иван')")
+        # WAL: читатель не ждет писателя и не видит незакоммиченное
+        with db.pool.reader() as reader:
+            during_write = reader.execute(count_users).fetchone()[0]
+
+    with db.pool.reader() as reader:
+        reader.execute("BEGIN")
+        snapshot_before = reader.execute(count_users).fetchone()[0]
+        db.add_user(2, "petr", "Петр")
+        with db.pool.reader() as other:
+            other_after = other.execute(count_users).fetchone()[0]
+        snapshot_after = reader.execute(count_users).fetchone()[0]
+        reader.execute("COMMIT")
+
+    db.close()
+
+    assert db.pool.readers_count == 2
+    assert during_write == 0
+    assert (snapshot_before, snapshot_after, other_after) == (1, 1, 2)
+
+
+def test_pool_closes_with_connections_checked_out(tmp_path):
+    import threading
+
+    db = Database(str(tmp_path / "marketplace.db"), readers=2)
+    writer_entered = threading.Event()
+
+    def slow_write():
+        with db.pool.writer() as conn:
+            writer_entered.set()
+            time.sleep(0.2)
+            conn.execute("INSERT INTO users (user_id, full_name) VALUES (1, 'Иван')")
+
+    thread = threading.Thread(target=slow_write)
+    with db.pool.reader() as reader:
+        thread.start()
+        writer_entered.wait()
+        # Не зависает на выданном читателе и ждет транзакцию писателя
+        db.close()
+        thread.join()
+        still_open = reader.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        reader.execute("SELECT 1")
+    with pytest.raises(sqlite3.ProgrammingError):
+        with db.pool.reader():
+            pass
+
+    check = Database(str(tmp_path / "marketplace.db"))
+    committed = check.get_user(1)
+    check.close()
+
+    assert still_open == 1
+    assert committed['full_name'] == "Иван"
+
+
+def test_search_index_survives_vacuum(tmp_path):
+    db = Database(str(tmp_path / "marketplace.db"))
+    for number in range(6):
+        db.create_order(f"ORD{number}", 1, 'crane', f"Автовышка {number}", "Москва", None)
+    db.create_order("ORDX", 1, 'crane', "Экскаватор на котлован", "Химки", None)
+    with db.pool.writer() as conn:
+        conn.execute("DELETE FROM orders WHERE order_id IN ('ORD0', 'ORD1', 'ORD2')")
+    with db.pool.writer() as conn:
+        conn.execute("VACUUM")
+
+    found, _ = db.search_orders("экскаватор Химки")
+    with db.pool.writer() as conn:
+        # Сверка индекса с содержимым orders (все заказы активны)
+        conn.execute("INSERT INTO orders_fts (orders_fts, rank) VALUES ('integrity-check', 1)")
+    db.close()
+
+    assert [order['order_id'] for order in found] == ['ORDX']
@@ -0,0 +1,164 @@
+# test_notifications.py
+"""
+Тесты очереди уведомлений notifications.NotificationDispatcher
+(вместо Telegram - FakeBot, БД - в памяти)
+
+Запуск: python -m pytest -q test_notifications.py
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DB_PATH", ":memory:")
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from database import AsyncDatabase, Database
+from metrics import metrics
+from notifications import NotificationDispatcher, TokenBucket
+
+
+class FakeBot:
+    """Записывает отправки (chat_id, text, monotonic); ошибки берет из failures[chat_id]"""
+
+    def __init__(self, failures=None, delay=0.0):
+        self.failures = failures or {}
+        self.delay = delay
+        self.sent = []
+        self.calls = 0
+        self.called = asyncio.Event()
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.calls += 1
+        self.called.set()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        errors = self.failures.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def method(chat_id):
+    return SendMessage(chat_id=chat_id, text="test")
+
+
+def run(scenario):
+    """Выполнить сценарий scenario(async_db) над БД в памяти"""
+    async_db = AsyncDatabase(Database(":memory:"))
+    try:
+        return asyncio.run(scenario(async_db))
+    finally:
+        async_db.close()
+
+
+async def saved_retries(async_db):
+    """Все уведомления, отложенные в notification_retries"""
+    return await async_db.take_due_notification_retries(now=int(time.time()) + 3600)
+
+
+def test_token_bucket_limits_rate_after_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+        times = []
+        for _ in range(10):
+            await bucket.acquire()
+            times.append(time.monotonic() - started)
+        return times
+
+    times = asyncio.run(scenario())
+
+    assert times[4] < 0.02
+    # Еще 5 токенов при 50 в секунду - не быстрее 0.1 с
+    assert times[-1] >= 0.09
+
+
+def test_messages_to_one_chat_are_spaced():
+    bot = FakeBot()
+
+    async def scenario(async_db):
+        dispatcher = NotificationDispatcher(workers=3, rate=1000, chat_interval=0.1, poll_interval=60)
+        dispatcher.start(bot, async_db)
+        started = time.monotonic()
+        for number in range(3):
+            dispatcher.enqueue(1, f"chat1-{number}")
+        dispatcher.enqueue(2, "chat2")
+        await asyncio.sleep(0.35)
+        await dispatcher.stop()
+        return started
+
+    started = run(scenario)
+    chat1 = [moment for chat_id, _, moment in bot.sent if chat_id == 1]
+    chat2 = [moment for chat_id, _, moment in bot.sent if chat_id == 2]
+
+    assert len(chat1) == 3 and len(chat2) == 1
+    assert all(later - earlier >= 0.09 for earlier, later in zip(chat1, chat1[1:]))
+    # Другой чат не ждет очереди первого
+    assert chat2[0] - started < 0.05
+
+
+def test_retry_after_pauses_all_workers_and_saves_message():
+    bot = FakeBot(failures={1: [TelegramRetryAfter(method(1), "Flood control", retry_after=1)]})
+
+    async def scenario(async_db):
+        dispatcher = NotificationDispatcher(workers=2, rate=1000, chat_interval=0, poll_interval=60)
+        dispatcher.start(bot, async_db)
+        dispatcher.enqueue(1, "flood")
+        await bot.called.wait()
+        await asyncio.sleep(0.05)
+        failed_at = time.monotonic()
+        dispatcher.enqueue(2, "after pause")
+        await asyncio.sleep(1.2)
+        await dispatcher.stop()
+        return failed_at, await saved_retries(async_db)
+
+    failed_at, retries = run(scenario)
+
+    assert [(chat_id, text) for chat_id, text, _ in bot.sent] == [(2, "after pause")]
+    assert bot.sent[0][2] - failed_at >= 0.9
+    assert [(row['chat_id'], row['attempts']) for row in retries] == [(1, 1)]
+
+
+def test_message_is_dropped_after_max_attempts():
+    errors = [TelegramNetworkError(method(1), "timeout") for _ in range(5)]
+    bot = FakeBot(failures={1: errors})
+    dropped_before = metrics.get('notifications_dropped_total')
+
+    async def scenario(async_db):
+        dispatcher = NotificationDispatcher(
+            workers=1, rate=1000, chat_interval=0, max_attempts=2, retry_delay=0, poll_interval=0.05
+        )
+        dispatcher.start(bot, async_db)
+        dispatcher.enqueue(1, "unlucky")
+        await asyncio.sleep(0.5)
+        await dispatcher.stop()
+        return await saved_retries(async_db)
+
+    retries = run(scenario)
+
+    assert bot.calls == 2
+    assert retries == []
+    assert metrics.get('notifications_dropped_total') == dropped_before + 1
+
+
+def test_stop_saves_in_flight_message_and_works_without_start():
+    bot = FakeBot(delay=10)
+
+    async def scenario(async_db):
+        await NotificationDispatcher().stop()
+
+        dispatcher = NotificationDispatcher(workers=1, rate=1000, chat_interval=0, poll_interval=60)
+        dispatcher.start(bot, async_db)
+        dispatcher.enqueue(1, "in flight")
+        dispatcher.enqueue(1, "queued")
+        await bot.called.wait()
+        await dispatcher.stop()
+        return await saved_retries(async_db)
+
+    retries = run(scenario)
+
+    assert bot.sent == []
+    assert sorted(row['text'] for row in retries) == ["in flight", "queued"]
@@ -1,14 +1,10 @@
 # utils.py
 
-import random
-import string
 import re
 from datetime import datetime
 
-# Генерация ID заказа
-def generate_order_id():
-    """Генерация уникального ID для заказа"""
-    return f"ORD{''.join(random.choices(string.ascii_uppercase, k=6))}"
+# Генерация ID заказа (общий генератор ULID, см. app/shared/utils.py)
+from app.shared.utils import generate_order_id
 
 # Валидация телефона
 def validate_phone(phone: str) -> tuple[bool, str]:
@@ -22,13 +18,16 @@ def validate_phone(phone: str) -> tuple[bool, str]:
     return True, phone_clean
 
 # Форматирование даты
-def format_datetime(dt_str: str) -> str:
-    """Форматирование даты для отображения"""
+def format_datetime(value) -> str:
+    """Форматирование даты для отображения (ISO-строка или секунды Unix)"""
     try:
-        dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+        if isinstance(value, (int, float)):
+            dt = datetime.fromtimestamp(value)
+        else:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
         return dt.strftime("%d.%m.%Y %H:%M")
     except:
-        return dt_str[:16]
+        return str(value or '')[:16]
 
 # Проверка минимальной длины текста
 def validate_text_length(text: str, min_length: int = 10) -> bool:
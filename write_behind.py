@@ -0,0 +1,127 @@
+# write_behind.py
+"""
+Отложенная запись частых и неважных обновлений (live-геолокация и т.п.).
+
+Обработчик кладет значение в буфер (put) и сразу продолжает работу.
+Значения с одинаковым ключом схлопываются - в БД попадает последнее.
+Буфер сбрасывается одним executemany в одной транзакции раз в
+interval секунд или сразу при накоплении max_items ключей.
+При остановке бота (stop) несохраненное записывается в БД.
+Потеря последних значений при падении процесса допустима.
+"""
+
+import asyncio
+import logging
+
+from config import WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_ITEMS
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Буфер ключ -> последние параметры записи.
+
+    В одной пачке каждый ключ встречается один раз, поэтому
+    flush_method может писать ее одним executemany с UPSERT.
+    """
+
+    def __init__(self, name, flush_method, interval=1.0, max_items=1000):
+        """
+        Args:
+            name: Имя буфера (для метрик и логов)
+            flush_method: Метод Database, принимающий список кортежей
+                (key, *params) и записывающий их одной транзакцией
+            interval: Максимальная задержка записи (сек)
+            max_items: Число ключей, при котором сброс начинается сразу
+        """
+        self.name = name
+        self.flush_method = flush_method
+        self.interval = interval
+        self.max_items = max_items
+
+        self._pending = {}
+        self._database = None
+        self._task = None
+        self._wakeup = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    # ===== ПУБЛИЧНЫЙ ИНТЕРФЕЙС =====
+
+    def put(self, key, *params):
+        """Запомнить значение для ключа (предыдущее несохраненное заменяется)"""
+        if key in self._pending:
+            metrics.inc(f'write_behind_{self.name}_coalesced_total')
+        self._pending[key] = params
+        metrics.set(f'write_behind_{self.name}_depth', len(self._pending))
+
+        if len(self._pending) >= self.max_items and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self, database):
+        """Запуск периодического сброса"""
+        self._database = database
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить сброс по таймеру и записать остаток"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._pending and self._database:
+            written = await self.flush()
+            logger.info(f"💾 Буфер {self.name}: записано при остановке - {written}")
+
+    async def flush(self):
+        """Записать накопленное одной транзакцией; возвращает число строк"""
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        metrics.set(f'write_behind_{self.name}_depth', 0)
+        rows = [(key, *params) for key, params in batch.items()]
+
+        try:
+            await getattr(self._database, self.flush_method)(rows)
+        except BaseException:
+            # Возвращаем пачку в буфер, не затирая более свежие значения.
+            # BaseException - и при отмене _run в stop(), чтобы пачку
+            # дописал последний flush (UPSERT повторную запись выдержит)
+            for key, params in batch.items():
+                self._pending.setdefault(key, params)
+            metrics.set(f'write_behind_{self.name}_depth', len(self._pending))
+            raise
+
+        metrics.inc(f'write_behind_{self.name}_flushed_total', len(rows))
+        metrics.inc(f'write_behind_{self.name}_flushes_total')
+        return len(rows)
+
+    # ===== ФОНОВЫЙ СБРОС =====
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи буфера {self.name}: {e}")
+
+
+# Live-геолокация пользователей (запускается в main.py)
+location_writer = WriteBehindBuffer(
+    'user_locations',
+    'save_live_locations',
+    interval=WRITE_BEHIND_INTERVAL,
+    max_items=WRITE_BEHIND_MAX_ITEMS,
+)